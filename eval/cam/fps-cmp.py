@@ -1,74 +1,97 @@
 # Evaluate FPS performance degradation (Bao vs native)
 
+import argparse
+import os
+import sys
+
 import matplotlib.pyplot as plt
-import numpy as np
+import pandas as pd
 from scipy import stats
 
-def parse_file(filename):
-    """Parse log file and return list of all FPS values per run"""
-    runs = []
-    current_run = []
-    
-    with open(filename, 'r') as f:
-        for line in f:
-            if line.startswith(">> TEST ->"):
-                if current_run:
-                    runs.append(current_run)
-                    current_run = []
-                continue
-                
-            if 'current: ' in line:
-                fps = float(line.split('current: ')[1].split(',')[0])
-                current_run.append(fps)
-    
-    if current_run:
-        runs.append(current_run)
-    
-    return runs
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import bootstrap, figures, gstfps
 
-# Load raw FPS data
-bare_runs = parse_file("cam-fps-bare.txt") 
-bao_runs = parse_file("cam-fps-bao.txt")
+def plot_degradation(run_numbers, degradations, cis, overall):
+    """Bar chart of the per-run FPS degradation with its 95% CI, and the overall one"""
+    fig = plt.figure(figsize=(12, 6))
+    plt.bar(run_numbers, degradations, yerr=cis, capsize=10, color='orange', edgecolor='black')
+    plt.axhline(overall[0], color='black', linewidth=1, label=f'All runs: {overall[0]:.2f}%')
+    plt.axhspan(overall[1], overall[2], color='gray', alpha=0.3, label='All runs 95% CI')
+    plt.legend(loc='upper right')
+    # plt.axhline(0, color='red', linestyle='--')
 
-# Collect results for plotting
-run_numbers = []
-degradations = []
-cis = []
+    # Add labels and title
+    plt.title('FPS Performance Degradation: Bao vs Native execution', fontsize=12)
+    plt.xlabel('Run', fontsize=12)
+    plt.ylabel('FPS Performance Degradation (%)', fontsize=12)
+    plt.xticks(run_numbers)
+    plt.grid(axis='y', linestyle='--', alpha=0.7)
 
-for i, (bare_run, bao_run) in enumerate(zip(bare_runs, bao_runs), 1):
-    bare_mean = np.mean(bare_run)
-    bao_mean = np.mean(bao_run)
-    degradation = ((bare_mean - bao_mean) / bare_mean) * 100
-    
-    # Calculate 95% confidence interval
-    ci = 1.96 * np.sqrt(
-        (np.std(bare_run, ddof=1)**2/len(bare_run)) + 
-        (np.std(bao_run, ddof=1)**2/len(bao_run))
-    ) * 100 / bare_mean
-    
-    run_numbers.append(i)
-    degradations.append(degradation)
-    cis.append(ci)
+    # Add value labels
+    for i, (deg, ci_val) in enumerate(zip(degradations, cis.mean(axis=0))):
+        y = - 1.65
+        if i % 2:
+            y = 1.9
+        plt.text(run_numbers[i], y , f'{deg:.1f}% ± {ci_val:.1f}%', 
+                 ha='center', va='bottom', fontsize=8)
 
-# Create the plot
-plt.figure(figsize=(12, 6))
-plt.bar(run_numbers, degradations, yerr=cis, capsize=10, color='orange', edgecolor='black')
-# plt.axhline(0, color='red', linestyle='--')
+    plt.tight_layout()
+    return fig
+
+parser = argparse.ArgumentParser(description="FPS performance degradation: Bao vs native")
+parser.add_argument('--resamples', type=int, default=bootstrap.RESAMPLES,
+                    help=f"bootstrap resamples of the CIs (default: {bootstrap.RESAMPLES})")
+parser.add_argument('--seed', type=int, default=bootstrap.SEED,
+                    help=f"bootstrap seed (default: {bootstrap.SEED})")
+parser.add_argument('--block', type=int, default=bootstrap.FPS_BLOCK,
+                    help=f"consecutive FPS readings resampled together (default: {bootstrap.FPS_BLOCK})")
+parser.add_argument('--startup-frames', type=int, default=gstfps.STARTUP_FRAMES,
+                    help="readings up to this many rendered frames are pipeline start-up "
+                         f"and left out (default: {gstfps.STARTUP_FRAMES})")
+parser.add_argument('-o', '--output',
+                    help="per-run delivery table (default: fps_run_metrics.csv in --figure-dir)")
+figures.add_arguments(parser)
+args = parser.parse_args()
+plots = figures.from_args(args)
 
-# Add labels and title
-plt.title('FPS Performance Degradation: Bao vs Native execution', fontsize=12)
-plt.xlabel('Run', fontsize=12)
-plt.ylabel('FPS Performance Degradation (%)', fontsize=12)
-plt.xticks(run_numbers)
-plt.grid(axis='y', linestyle='--', alpha=0.7)
+# Load raw FPS data: steady-state TEST runs, paired by run number
+bare_samples = gstfps.parse_fps_log("cam-fps-bare.txt", args.startup_frames)
+bao_samples = gstfps.parse_fps_log("cam-fps-bao.txt", args.startup_frames)
+bare_readings = gstfps.phase_runs(bare_samples)
+bao_readings = gstfps.phase_runs(bao_samples)
+run_numbers = gstfps.paired_runs(bare_readings, bao_readings)
+bare_runs = [bare_readings[run]['current'] for run in run_numbers]
+bao_runs = [bao_readings[run]['current'] for run in run_numbers]
+
+# Degradation per run (block bootstrap within the run) and over all runs
+# (hierarchical bootstrap: runs, then blocks within runs)
+degradations, cis, overall = bootstrap.degradation(bare_runs, bao_runs, args.resamples, args.seed, args.block)
+print(f"FPS degradation over {len(degradations)} runs: {overall[0]:.2f}% "
+      f"(95% CI {overall[1]:.2f}% to {overall[2]:.2f}%)")
+
+# Create the plot
+plots.add('fps_degradation', plot_degradation, run_numbers, degradations, cis, overall)
 
-# Add value labels
-for i, (deg, ci_val) in enumerate(zip(degradations, cis)):
-    y = - 1.65
-    if i % 2:
-        y = 1.9
-    plt.text(i+1, y , f'{deg:.1f}% ± {ci_val:.1f}%', 
-             ha='center', va='bottom', fontsize=8)
+# Frames delivered and dropped, and frame-interval jitter, from all fpsdisplaysink fields
+metrics = pd.concat([gstfps.run_metrics({run: bare_readings[run] for run in run_numbers}, 'Native'),
+                     gstfps.run_metrics({run: bao_readings[run] for run in run_numbers}, 'Bao')],
+                    ignore_index=True)
+output = args.output or os.path.join(args.figure_dir, 'fps_run_metrics.csv')
+os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+metrics.to_csv(output, index=False)
+summary = gstfps.case_summary(metrics, 'Native')
+print(f"\nPer-run delivery saved to {output}")
+print("Frame delivery (delivered: rendered frames / time; drop ratio over all frames; jitter: SD of the frame interval):")
+with pd.option_context('display.width', 160):
+    print(summary.to_string(index=False, float_format=lambda v: f'{v:.4g}'))
+plots.add('fps_delivery', gstfps.plot_run_metrics, metrics, ['Native', 'Bao'])
 
-plt.tight_layout()
-plt.show()
+# Warm-up runs, kept out of the comparison
+warmup = pd.concat([gstfps.run_metrics(gstfps.phase_runs(samples, gstfps.WARMUP_PHASE), case)
+                    for case, samples in (('Native', bare_samples), ('Bao', bao_samples))],
+                   ignore_index=True)
+if len(warmup):
+    print("\nWarm-up runs (not compared):")
+    print(gstfps.case_summary(warmup)[['case', 'runs', 'delivered_fps', 'current_fps', 'drop_ratio', 'jitter_ms']]
+          .to_string(index=False, float_format=lambda v: f'{v:.4g}'))
+plots.render()
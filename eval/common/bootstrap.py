@@ -0,0 +1,167 @@
+# Hierarchical bootstrap of repeated benchmark runs
+#
+# Samples taken within one run (the queries of a PX4 run, the per-second FPS
+# of a camera run) are correlated: they share the boot, the placement and the
+# thermal state of that run. Treating them as independent gives standard
+# errors that shrink with the number of samples rather than with the number
+# of runs. The bootstrap here resamples at both levels instead: runs with
+# replacement first, then samples with replacement within each drawn run
+# (optionally in contiguous blocks, to keep the autocorrelation within a
+# run), and takes the pooled mean of every resample.
+#
+# Groups of runs are packed into NaN-padded arrays (..., runs, samples) so
+# that any number of groups (e.g. cases x tasks) are resampled at once: all
+# draws are index matrices applied with take_along_axis, the only loop being
+# over chunks of resamples that bound the memory used.
+
+import warnings
+
+import numpy as np
+
+# Resamples and seed of the bootstrap distributions
+RESAMPLES = 10000
+SEED = 0
+
+# Confidence level of the percentile intervals
+LEVEL = 0.95
+
+# FPS readings resampled together: consecutive fpsdisplaysink readings alternate
+# around the mean, so they are kept in blocks rather than drawn one by one
+FPS_BLOCK = 10
+
+# Upper bound on the elements of the index matrices of one chunk
+CHUNK_ELEMENTS = 1 << 23
+
+
+def pack(runs, shape=None):
+    """NaN-padded (..., runs, samples) array and run lengths of nested groups.
+
+    runs is a list of 1-D arrays (one group), or a nested list of such lists
+    with the given leading shape (e.g. [case][task] -> [[run, ...], ...]).
+    Missing or empty runs are left out, so the valid runs of every group come
+    first. Returns (values, lengths).
+    """
+    shape = tuple(shape or ())
+    groups = [runs]
+    for _ in shape:
+        groups = [group for nested in groups for group in nested]
+    groups = [[np.asarray(run, dtype=float) for run in group if len(run)] for group in groups]
+    max_runs = max((len(group) for group in groups), default=0)
+    max_len = max((len(run) for group in groups for run in group), default=0)
+    values = np.full((len(groups), max(max_runs, 1), max(max_len, 1)), np.nan)
+    lengths = np.zeros((len(groups), max(max_runs, 1)), dtype=np.int64)
+    for i, group in enumerate(groups):
+        for j, run in enumerate(group):
+            values[i, j, :len(run)] = run
+            lengths[i, j] = len(run)
+    return values.reshape(*shape, *values.shape[1:]), lengths.reshape(*shape, lengths.shape[1])
+
+
+def pack_frame(frame, groups, run='run', value='interval'):
+    """pack() the value column of a DataFrame, one group per entry of groups.
+
+    groups is a (Multi)Index whose names are columns of frame, e.g. the
+    index of a groupby over them; the runs of a group are its rows split by
+    the run column. Returns (values, lengths) with one leading dimension
+    over groups.
+    """
+    keys = list(groups.names)
+    frame = frame.sort_values([*keys, run], kind='stable')
+    split = {}
+    for key, rows in frame.groupby(keys[0] if len(keys) == 1 else keys, observed=True, sort=False):
+        bounds = np.flatnonzero(np.diff(rows[run].to_numpy())) + 1
+        split[key] = np.split(rows[value].to_numpy(dtype=float), bounds)
+    return pack([split.get(key, []) for key in groups], (len(groups),))
+
+
+def resample_means(values, lengths, resamples=RESAMPLES, seed=SEED, block=1):
+    """Bootstrap distribution of the pooled mean of every group.
+
+    values and lengths as from pack(). Each resample draws as many runs as
+    the group has, with replacement, then as many samples as each drawn run
+    has, with replacement, in blocks of block consecutive samples. Returns
+    an array (..., resamples); NaN for groups without samples.
+    """
+    rng = np.random.default_rng(seed)
+    batch = values.shape[:-2]
+    n_runs, max_len = values.shape[-2:]
+    values = values.reshape(-1, n_runs * max_len)
+    lengths = lengths.reshape(-1, n_runs)
+    valid = (lengths > 0).sum(axis=1)
+    block = max(1, min(int(block), max_len))
+    n_blocks = -(-max_len // block)
+    offsets = np.arange(block)
+    position = np.arange(max_len)
+    flat = np.nan_to_num(values.ravel()).astype(np.float32)
+    group_offset = (np.arange(len(values)) * n_runs * max_len)[:, None]
+    run_slots = np.arange(n_runs) < valid[:, None]
+    chunk = max(1, CHUNK_ELEMENTS // max(1, len(values) * n_runs * max_len))
+    means = np.empty((len(values), resamples))
+    for start in range(0, resamples, chunk):
+        b = min(chunk, resamples - start)
+        # Runs: (b, groups, runs) indices among the valid runs of each group
+        run = (rng.random((b, len(values), n_runs), dtype=np.float32) * valid[:, None]).astype(np.int64)
+        run = np.minimum(run, np.maximum(valid - 1, 0)[:, None])
+        length = np.take_along_axis(lengths[None], run, axis=2)
+        # Samples: block starts within each drawn run, then their offsets
+        starts = (rng.random((b, len(values), n_runs, n_blocks), dtype=np.float32)
+                  * np.maximum(length - block + 1, 1)[..., None]).astype(np.int64)
+        sample = (starts[..., None] + offsets).reshape(b, len(values), n_runs, -1)[..., :max_len]
+        sample = np.minimum(sample, np.maximum(length - 1, 0)[..., None])
+        # Flat index into values: group row, drawn run, sample within it
+        index = sample + (run * max_len + group_offset)[..., None]
+        drawn = flat.take(index)
+        # Padding (runs shorter than max_len, groups with fewer runs) is masked out
+        length = np.where(run_slots, length, 0)
+        total = np.where(position < length[..., None], drawn, 0).sum(axis=(2, 3), dtype=np.float64)
+        count = length.sum(axis=2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means[:, start:start + b] = (total / count).T
+    return means.reshape(*batch, resamples)
+
+
+def percentile_ci(distribution, level=LEVEL):
+    """Percentile interval (low, high) of bootstrap distributions along the last axis"""
+    alpha = (1 - level) / 2 * 100
+    with warnings.catch_warnings():
+        # Groups without samples give all-NaN distributions and a NaN interval
+        warnings.simplefilter('ignore', RuntimeWarning)
+        low, high = np.nanpercentile(distribution, [alpha, 100 - alpha], axis=-1)
+    return low, high
+
+
+def relative_change(base_runs, runs, resamples=RESAMPLES, seed=SEED, block=1, level=LEVEL):
+    """Mean of runs relative to base_runs (mean / base mean - 1, in %).
+
+    base_runs and runs are lists of 1-D arrays, paired by position. Returns
+    (per_run, overall): per_run holds (estimate, low, high) arrays for every
+    pair of runs, from a bootstrap within each run; overall the same three
+    values for all runs pooled, from the hierarchical bootstrap.
+    """
+    n = min(len(base_runs), len(runs))
+    seeds = np.random.default_rng(seed).integers(1 << 32, size=4)
+    dists = []
+    for i, group in enumerate((base_runs[:n], runs[:n])):
+        single = resample_means(*pack([[run] for run in group], (n,)), resamples, seeds[2 * i], block)
+        pooled = resample_means(*pack(group), resamples, seeds[2 * i + 1], block)
+        dists.append((single, pooled))
+    base_means = np.array([np.mean(run) for run in base_runs[:n]])
+    means = np.array([np.mean(run) for run in runs[:n]])
+    per_run = ((means / base_means - 1) * 100,
+               *percentile_ci((dists[1][0] / dists[0][0] - 1) * 100, level))
+    overall = ((np.mean(np.concatenate(runs[:n])) / np.mean(np.concatenate(base_runs[:n])) - 1) * 100,
+               *percentile_ci((dists[1][1] / dists[0][1] - 1) * 100, level))
+    return per_run, overall
+
+
+def degradation(base_runs, runs, resamples=RESAMPLES, seed=SEED, block=1, level=LEVEL):
+    """relative_change() of runs vs base_runs as a degradation (a drop is positive).
+
+    Returns (degradations, errors, overall): the per-run degradations, their
+    (2, runs) asymmetric CI errors as taken by yerr, and the overall
+    (degradation, low, high).
+    """
+    per_run, overall = relative_change(base_runs, runs, resamples, seed, block, level)
+    degradations = -per_run[0]
+    errors = np.array([degradations + per_run[2], -per_run[1] - degradations])
+    return degradations, errors, (-overall[0], -overall[2], -overall[1])
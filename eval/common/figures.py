@@ -0,0 +1,111 @@
+# Headless, parallel figure rendering for the evaluation scripts
+#
+# Scripts describe their figures instead of drawing them on the spot: a
+# figure is a builder (a module-level function returning a matplotlib
+# Figure), its arguments and an output name. A FigureSet collects them and
+# renders them all at the end in a process pool, saving each figure in every
+# configured format (pdf, png, svg) under the non-interactive Agg backend, so
+# the scripts run unattended and a full figure set scales with the cores.
+# The interactive mode (--show) builds the figures in this process instead
+# and opens them in windows once they are saved.
+#
+# Workers are forked, so builders defined in a script's __main__ resolve in
+# them; where fork is unavailable the figures are rendered one by one.
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+
+FORMATS = ('pdf', 'png', 'svg')
+DPI = 300
+
+
+def render_figure(spec, output_dir, formats, dpi, close=True):
+    """Build one (name, builder, args, kwargs) spec and save it; returns the paths"""
+    import matplotlib.pyplot as plt
+    name, builder, args, kwargs = spec
+    fig = builder(*args, **kwargs)
+    paths = []
+    for fmt in formats:
+        path = os.path.join(output_dir, f'{name}.{fmt}')
+        fig.savefig(path, dpi=dpi, bbox_inches='tight')
+        paths.append(path)
+    if close:
+        plt.close(fig)
+    return paths
+
+
+def _render(job):
+    return render_figure(*job)
+
+
+class FigureSet:
+    """Figures to render, each saved as output_dir/<name>.<format>"""
+
+    def __init__(self, output_dir='.', formats=('png',), dpi=DPI, workers=1, interactive=False):
+        self.output_dir = output_dir
+        self.formats = tuple(formats)
+        self.dpi = dpi
+        self.workers = workers
+        self.interactive = interactive
+        self.specs = []
+        if not interactive:
+            matplotlib.use('Agg')
+
+    def add(self, name, builder, *args, **kwargs):
+        """Queue builder(*args, **kwargs) to be saved as name"""
+        self.specs.append((name, builder, args, kwargs))
+
+    def render(self):
+        """Render and save the queued figures in order; returns the saved paths.
+
+        In interactive mode the figures are then shown, blocking until their
+        windows are closed.
+        """
+        specs, self.specs = self.specs, []
+        os.makedirs(self.output_dir, exist_ok=True)
+        jobs = [(spec, self.output_dir, self.formats, self.dpi, not self.interactive)
+                for spec in specs]
+        workers = min(self.workers, len(jobs))
+        if self.interactive or workers < 2 or 'fork' not in multiprocessing.get_all_start_methods():
+            results = map(_render, jobs)
+            pool = None
+        else:
+            pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork'))
+            results = pool.map(_render, jobs)
+        saved = []
+        try:
+            for paths in results:
+                print(f"Saved {', '.join(paths)}")
+                saved.extend(paths)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        if self.interactive:
+            import matplotlib.pyplot as plt
+            plt.show()
+        return saved
+
+
+def add_arguments(parser, formats=('png',), output_dir='.'):
+    """Add the figure output options to an argparse parser"""
+    group = parser.add_argument_group('figures')
+    group.add_argument('--formats', nargs='+', choices=FORMATS, default=list(formats),
+                       help=f"figure formats to save (default: {' '.join(formats)})")
+    group.add_argument('--figure-dir', default=output_dir,
+                       help=f"directory the figures are saved to (default: {output_dir})")
+    group.add_argument('--dpi', type=int, default=DPI,
+                       help=f"resolution of raster figures (default: {DPI})")
+    group.add_argument('--render-workers', type=int, default=0,
+                       help="processes rendering figures (0 = all cores; default: 0)")
+    group.add_argument('--show', action='store_true',
+                       help="also open the figures in windows (interactive backend)")
+    return group
+
+
+def from_args(args):
+    """FigureSet configured by the add_arguments() options"""
+    workers = args.render_workers if args.render_workers > 0 else os.cpu_count()
+    return FigureSet(args.figure_dir, args.formats, args.dpi, workers, args.show)
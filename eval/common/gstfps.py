@@ -0,0 +1,210 @@
+# Parser and per-run metrics of GStreamer fpsdisplaysink output
+#
+# cam_fps.sh runs gst-launch -v with an fpsdisplaysink, which prints every
+# fps-update-interval (500 ms by default):
+#
+#   /GstPipeline:pipeline0/GstFPSDisplaySink:fpsdisplaysink0: last-message = rendered: 40, dropped: 0, current: 34.04, average: 38.68
+#
+# rendered and dropped are frame counts since the pipeline started, current
+# the rate over the last update and average the rate since the first frame.
+# The lines carry no timestamps; the time of each reading follows from the
+# counters instead: the first is rendered / average seconds after the first
+# frame and every update lasts (rendered delta) / current seconds (current
+# has more significant digits than average late in a run).
+#
+# The harnesses print a header before every pipeline they start, for the
+# warm-up runs and the measured ones:
+#
+#   >> WARM_UP -> Run 2: Running GST for 30 seconds...
+#   >> TEST -> Run 1: Running GST for 120 seconds...
+#
+# parse_fps_log() tags every reading with the phase, run number and duration
+# of its section, so that TEST runs are paired by run number across
+# configurations and warm-up runs are left out of (or analysed apart from)
+# the comparison. The first update of a pipeline also counts the frames
+# queued while it started (about 43 FPS for a 30 FPS camera); readings up to
+# STARTUP_FRAMES rendered frames are flagged transient and left out of the
+# steady-state runs.
+
+import re
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+SECTION_LINE = re.compile(r'>> (\w+) -> Run (\d+)(?:: Running (?:\S+ )?for (\d+) seconds)?')
+FPS_LINE = re.compile(r'rendered: (\d+), dropped: (\d+), current: ([\d.]+), average: ([\d.]+)')
+TEST_PHASE = 'TEST'
+WARMUP_PHASE = 'WARM_UP'
+
+# Rendered frames counted as pipeline start-up (1 s at the camera's 30 FPS)
+STARTUP_FRAMES = 30
+
+FPS_DTYPE = np.dtype([
+    ('rendered', np.int64),   # frames rendered since the start
+    ('dropped', np.int64),    # frames dropped since the start
+    ('current', np.float64),  # FPS over the last update
+    ('average', np.float64),  # FPS since the first frame
+    ('time', np.float64),     # seconds since the first frame
+])
+
+
+def reading_times(rendered, current, average):
+    """Seconds since the first frame of every reading of one run"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        start = rendered[:1] / average[:1]
+        updates = np.diff(rendered) / current[1:]
+    return np.concatenate([start, start + np.cumsum(np.nan_to_num(updates))]) if len(rendered) else start
+
+
+def parse_fps_log(filename, startup_frames=STARTUP_FRAMES):
+    """Tagged fpsdisplaysink readings of a capture, one row per reading.
+
+    Columns: phase, run and duration [s] of the section header (empty, 0
+    and NaN before the first one), reading (position in the section), the
+    four fields, time (seconds since the section's first frame) and
+    transient (at most startup_frames rendered).
+    """
+    sections = []
+    header = ('', 0, np.nan)
+    rows = []
+
+    def close():
+        if rows:
+            values = np.array(rows, dtype=float)
+            section = pd.DataFrame(values, columns=['rendered', 'dropped', 'current', 'average'])
+            section = section.astype({'rendered': np.int64, 'dropped': np.int64})
+            section['time'] = reading_times(values[:, 0], values[:, 2], values[:, 3])
+            section.insert(0, 'reading', np.arange(len(section)))
+            sections.append(section.assign(phase=header[0], run=header[1], duration=header[2]))
+
+    with open(filename, 'r', errors='replace') as f:
+        for line in f:
+            if line.startswith('>>'):
+                match = SECTION_LINE.match(line)
+                if match:
+                    close()
+                    rows = []
+                    phase, run, duration = match.groups()
+                    header = (phase, int(run), float(duration) if duration else np.nan)
+                continue
+            if 'rendered: ' in line:
+                match = FPS_LINE.search(line)
+                if match:
+                    rows.append(match.groups())
+    close()
+    columns = ['phase', 'run', 'duration', 'reading', 'rendered', 'dropped', 'current', 'average', 'time']
+    if not sections:
+        return pd.DataFrame(columns=columns + ['transient'])
+    samples = pd.concat(sections, ignore_index=True)[columns]
+    samples['transient'] = samples['rendered'] <= startup_frames
+    return samples
+
+
+def phase_runs(samples, phase=TEST_PHASE, steady=True):
+    """FPS_DTYPE array of every run of a phase of parse_fps_log() rows, by run number.
+
+    Phases match by prefix (WARM_UP covers WARM_UP_FPS). With steady,
+    transient readings are left out. A run number seen in more than one
+    section of the phase keeps the last one.
+    """
+    samples = samples[samples['phase'].str.startswith(phase)]
+    if steady:
+        samples = samples[~samples['transient']]
+    runs = {}
+    for run, rows in samples.groupby('run', sort=True):
+        array = np.zeros(len(rows), dtype=FPS_DTYPE)
+        for field in FPS_DTYPE.names:
+            array[field] = rows[field].to_numpy()
+        runs[run] = array
+    return runs
+
+
+def parse_fps_file(filename, phase=TEST_PHASE, startup_frames=STARTUP_FRAMES):
+    """Steady-state readings of every run of a phase of a capture, by run number"""
+    return phase_runs(parse_fps_log(filename, startup_frames), phase)
+
+
+def paired_runs(*cases):
+    """Run numbers present in every one of cases ({run: readings} dicts), sorted"""
+    common = sorted(set.intersection(*(set(case) for case in cases)))
+    for i, case in enumerate(cases):
+        unpaired = sorted(set(case) - set(common))
+        if unpaired:
+            print(f"  runs {unpaired} of configuration {i + 1} have no counterpart and are left out")
+    return common
+
+
+def run_metrics(runs, case=None):
+    """Delivery, drops and frame-interval jitter of every run.
+
+    runs is a {run: FPS_DTYPE array} dict, as from parse_fps_file(). Per
+    run: frames rendered and dropped between the first and last reading,
+    their duration [s], the delivered FPS (rendered frames over that time),
+    the drop ratio (dropped over offered frames), the mean reported FPS,
+    and the mean, standard deviation (jitter) and p99 of the frame interval
+    of every update (1000 / current) [ms].
+    """
+    rows = []
+    for number, run in runs.items():
+        rendered = run['rendered'][-1] - run['rendered'][0]
+        dropped = run['dropped'][-1] - run['dropped'][0]
+        duration = run['time'][-1] - run['time'][0]
+        with np.errstate(divide='ignore'):
+            interval = 1000 / run['current']
+        interval = interval[np.isfinite(interval)]
+        rows.append({
+            'case': case, 'run': number, 'readings': len(run),
+            'rendered': rendered, 'dropped': dropped, 'duration': duration,
+            'delivered_fps': rendered / duration if duration > 0 else np.nan,
+            'drop_ratio': dropped / (rendered + dropped) if rendered + dropped else np.nan,
+            'current_fps': run['current'].mean(),
+            'interval_ms': interval.mean() if len(interval) else np.nan,
+            'jitter_ms': interval.std(ddof=1) if len(interval) > 1 else np.nan,
+            'interval_p99_ms': np.percentile(interval, 99) if len(interval) else np.nan,
+        })
+    return pd.DataFrame(rows)
+
+
+def case_summary(metrics, baseline=None):
+    """Per-configuration delivery, drop and jitter summary of run_metrics() rows.
+
+    Delivered FPS and jitter are averaged over the runs, the drop ratio is
+    pooled over all their frames. With baseline, delivered_change is the
+    relative change of the delivered FPS against it [%].
+    """
+    groups = metrics.groupby('case', sort=False)
+    summary = pd.DataFrame({
+        'runs': groups.size(),
+        'delivered_fps': groups['delivered_fps'].mean(),
+        'delivered_std': groups['delivered_fps'].std(),
+        'current_fps': groups['current_fps'].mean(),
+        'dropped': groups['dropped'].sum(),
+        'drop_ratio': groups['dropped'].sum() / (groups['rendered'].sum() + groups['dropped'].sum()),
+        'max_drop_ratio': groups['drop_ratio'].max(),
+        'jitter_ms': groups['jitter_ms'].mean(),
+        'interval_p99_ms': groups['interval_p99_ms'].mean(),
+    })
+    if baseline is not None:
+        summary['delivered_change'] = (summary['delivered_fps'] / summary.loc[baseline, 'delivered_fps'] - 1) * 100
+    return summary.reset_index()
+
+
+def plot_run_metrics(metrics, cases):
+    """Per-run delivered FPS, drop ratio and frame-interval jitter of every configuration"""
+    panels = (('delivered_fps', 'Delivered FPS', 1), ('drop_ratio', 'Dropped frames (%)', 100),
+              ('jitter_ms', 'Frame interval jitter (ms)', 1))
+    fig, axes = plt.subplots(1, len(panels), figsize=(5 * len(panels), 5))
+    for ax, (column, label, scale) in zip(axes, panels):
+        data = [metrics.loc[metrics['case'] == case, column].dropna().to_numpy() * scale for case in cases]
+        ax.boxplot(data, showmeans=True)
+        for i, values in enumerate(data, 1):
+            ax.scatter(np.full(len(values), i) + np.linspace(-0.1, 0.1, len(values)), values,
+                       s=10, alpha=0.6, color='tab:blue')
+        ax.set_xticks(range(1, len(cases) + 1))
+        ax.set_xticklabels(cases)
+        ax.set_ylabel(label)
+        ax.grid(axis='y', linestyle='--', alpha=0.7)
+    fig.suptitle('Frame delivery per run', fontsize=12)
+    fig.tight_layout()
+    return fig
@@ -0,0 +1,256 @@
+# Parsers for PX4 `top once` and `perf` output
+#
+# The work queue harnesses send `top once` and `perf` after `work_queue
+# status` in every query, so each capture has three views of the same
+# window: update intervals (common/workqueue.py), CPU share and stack use per
+# task (top) and the runtime of every module (perf counters):
+#
+#   PID COMMAND                   CPU(ms) CPU(%)  USED/STACK PRIO(BASE) STATE FD
+#    12 mc_rate_control              1523  3.212   1468/ 2016 250 (250) w:sig  4
+#
+#   control_allocator: cycle: 93829 events, 6574154us elapsed, 70.07us avg, min 40us max 2105us 51.386us rms
+#   icm42605: bad register: 0 events
+#
+# As for work_queue status, the capture is read once and every line is told
+# apart by a cheap test before the (single) regex that splits it. Rows are
+# typed NumPy structured arrays with names stored as indices into a shared
+# name list, so they load with workqueue.to_frame() and join the work queue
+# rows on (run, query, task). A perf counter "module: counter" is attributed
+# to task "module". Queries are numbered by the ">> Query I T" markers of the
+# harnesses, or else by the blocks of top/perf output of every run.
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from .workqueue import QUERY_MARKER, RUN_MARKER
+
+TOP_HEADER = 'PID COMMAND'
+TOP_LINE = re.compile(
+    r'\s*(\d+)\s+(.+?)\s+(\d+)\s+(\d+\.\d+)\s+(\d+)/\s*(\d+)\s+(\d+)\s+\(\s*(\d+)\)\s+(\S+)')
+PERF_LINE = re.compile(
+    r'(?:pxh> )*(\S.*?): (\d+) events'
+    r'(?:, (\d+)us elapsed)?'
+    r'(?:, ([\d.]+)us avg, min (\d+)us max (\d+)us\s+([\d.]+)us rms)?')
+
+# One row per task and query
+TOP_DTYPE = np.dtype([
+    ('run', np.int32),
+    ('query', np.int32),
+    ('time', np.float32),     # seconds since the run's first query; NaN if not stamped
+    ('pid', np.int32),
+    ('task', np.uint16),      # task name
+    ('cpu_ms', np.int64),     # CPU time since boot [ms]
+    ('cpu_pct', np.float32),  # CPU share over top's sampling window [%]
+    ('stack_used', np.int32), # [B]
+    ('stack_size', np.int32), # [B]
+    ('prio', np.int16),
+    ('state', np.uint16),     # scheduler state name, e.g. w:sig
+])
+
+# One row per perf counter and query; values are cumulative since boot
+PERF_DTYPE = np.dtype([
+    ('run', np.int32),
+    ('query', np.int32),
+    ('time', np.float32),
+    ('task', np.uint16),      # module, the counter name up to its first ':'
+    ('counter', np.uint16),   # rest of the counter name, e.g. cycle
+    ('events', np.int64),
+    ('elapsed', np.int64),    # [us]; -1 for counters without elapsed time
+    ('avg', np.float32),      # [us]; NaN for plain event counters
+    ('min', np.int64),
+    ('max', np.int64),
+    ('rms', np.float32),
+])
+
+
+class _Queries:
+    """Run, query and time bookkeeping shared by the parsers"""
+
+    def __init__(self):
+        self.run = self.query = 0
+        self.run_start = self.stamp = None
+        self.time = np.nan
+        self.marked = False
+
+    def line(self, line):
+        """Consume a run or query marker line; True if it was one"""
+        if line.startswith(RUN_MARKER):
+            self.run = int(line.split()[2])
+            self.query = 0
+            self.run_start = self.stamp = None
+            self.marked = False
+            return True
+        if line.startswith(QUERY_MARKER):
+            fields = line.split()
+            try:
+                self.query = int(fields[2])
+                self.stamp = float(fields[3])
+            except (IndexError, ValueError):
+                return True
+            if self.run_start is None:
+                self.run_start = self.stamp
+            self.time = self.stamp - self.run_start
+            self.marked = True
+            return True
+        return False
+
+    def block(self):
+        """Start of a block of output: next query unless the marker numbered it"""
+        if not self.marked:
+            self.query += 1
+            self.time = np.nan
+
+
+def iter_top(lines, index):
+    """Yield TOP_DTYPE tuples of every task line of `top once` output"""
+    queries = _Queries()
+    in_block = False
+    for line in lines:
+        if line.startswith('>'):
+            queries.line(line)
+            in_block = False
+            continue
+        if TOP_HEADER in line:
+            queries.block()
+            in_block = True
+            continue
+        if not in_block:
+            continue
+        match = TOP_LINE.match(line)
+        if match is None:
+            # "Processes: ..." summary, prompt or blank line: the block is over
+            in_block = bool(line.strip()) and not line.startswith(('Processes', 'pxh'))
+            continue
+        pid, name, cpu_ms, cpu_pct, used, size, prio, _, state = match.groups()
+        yield (queries.run, queries.query, queries.time, int(pid),
+               index.setdefault(name.strip(), len(index)), int(cpu_ms), float(cpu_pct),
+               int(used), int(size), int(prio), index.setdefault(state, len(index)))
+
+
+def iter_perf(lines, index):
+    """Yield PERF_DTYPE tuples of every counter line of `perf` output"""
+    queries = _Queries()
+    in_block = False
+    for line in lines:
+        if line.startswith('>'):
+            queries.line(line)
+            in_block = False
+            continue
+        match = PERF_LINE.match(line) if ' events' in line else None
+        if match is None:
+            in_block = False
+            continue
+        if not in_block:
+            queries.block()
+            in_block = True
+        name, events, elapsed, avg, low, high, rms = match.groups()
+        task, _, counter = name.partition(':')
+        yield (queries.run, queries.query, queries.time,
+               index.setdefault(task, len(index)), index.setdefault(counter.strip(), len(index)),
+               int(events), int(elapsed) if elapsed else -1,
+               float(avg) if avg else np.nan, int(low) if low else 0, int(high) if high else 0,
+               float(rms) if rms else np.nan)
+
+
+def parse_top_file(file_path):
+    """Parse the `top once` output of a capture into (rows, names)"""
+    index = {}
+    with open(file_path, 'r', errors='replace') as f:
+        rows = np.fromiter(iter_top(f, index), dtype=TOP_DTYPE)
+    return rows, list(index)
+
+
+def parse_perf_file(file_path):
+    """Parse the `perf` output of a capture into (rows, names)"""
+    index = {}
+    with open(file_path, 'r', errors='replace') as f:
+        rows = np.fromiter(iter_perf(f, index), dtype=PERF_DTYPE)
+    return rows, list(index)
+
+
+def to_frame(parsed):
+    """DataFrame of parse_top_file()/parse_perf_file() output, names as categoricals"""
+    rows, names = parsed
+    frame = pd.DataFrame(rows)
+    categories = pd.Index(names)
+    for column in ('task', 'counter', 'state'):
+        if column in frame:
+            frame[column] = pd.Categorical.from_codes(
+                frame[column].to_numpy(dtype=np.int64), categories=categories).remove_unused_categories()
+    return frame
+
+
+def load_cases(captures):
+    """top and perf to_frame() rows of (case, path) captures, with a case column"""
+    cases = [case for case, _ in captures]
+    frames = []
+    for parse in (parse_top_file, parse_perf_file):
+        frame = pd.concat([to_frame(parse(path)).assign(case=case) for case, path in captures],
+                          ignore_index=True)
+        frame['case'] = pd.Categorical(frame['case'], categories=cases)
+        frames.append(frame)
+    return tuple(frames)
+
+
+def perf_windows(perf):
+    """Runtime of every timed perf counter between consecutive queries.
+
+    perf is to_frame() rows (with a 'case' column). The cumulative events and
+    elapsed time are differenced within each run, giving per query the
+    activations and the mean runtime [us] over the window since the previous
+    query. The first query of a run, and counters without elapsed time, are
+    left out.
+    """
+    perf = perf[perf['elapsed'] >= 0].sort_values(['case', 'run', 'task', 'counter', 'query'], kind='stable')
+    keys = [perf['case'], perf['run'], perf['task'].astype(str), perf['counter'].astype(str)]
+    events = perf.groupby(keys, observed=True)['events'].diff()
+    elapsed = perf.groupby(keys, observed=True)['elapsed'].diff()
+    windows = perf[['case', 'run', 'query', 'time', 'task', 'counter']].assign(
+        events=events, runtime=elapsed / events)
+    return windows[windows['events'] > 0].reset_index(drop=True)
+
+
+def runtime_attribution(samples, windows, baseline, top=None):
+    """Whether a case's change against baseline is runtime or scheduling delay.
+
+    samples are work queue to_frame() rows, windows perf_windows() rows,
+    both with a 'case' column, and top optionally top to_frame() rows.
+    Per (case, task), with the module's main counter (its most frequent
+    one): the mean runtime, the interval jitter (p99 - p50 of the update
+    interval, the time activations are pushed back by) and, with top, the
+    mean CPU share of the task, or of its work queue thread. runtime_change
+    and delay_change are the differences to the baseline [us]; source
+    names the larger increase, or is 'none' if neither grew (a shorter
+    runtime or jitter does not explain an overhead).
+    """
+    samples = samples[samples['rate'] > 0]
+    keys = [samples['case'], samples['task'].astype(str)]
+    intervals = samples.groupby(keys, observed=True)['interval']
+    table = pd.DataFrame({'interval': intervals.mean(),
+                          'jitter': intervals.quantile(0.99) - intervals.median()})
+    table.index.names = ['case', 'task']
+    windows = windows.assign(task=windows['task'].astype(str), counter=windows['counter'].astype(str))
+    main = (windows.groupby(['case', 'task', 'counter'], observed=True)['events'].sum()
+            .groupby(['case', 'task'], observed=True).idxmax())
+    runtime = windows.set_index(['case', 'task', 'counter']).loc[list(main)]
+    table = table.join(runtime.groupby(['case', 'task'], observed=True)['runtime'].mean(), how='inner')
+    if top is not None and len(top):
+        # Work queue tasks share their thread, listed by top as e.g. wq:rate_ctrl
+        cpu = top.groupby([top['case'], top['task'].astype(str)], observed=True)['cpu_pct'].mean()
+        threads = samples.groupby(keys, observed=True)['wq'].first().astype(str)
+        own = cpu.reindex(table.index).to_numpy()
+        shared = cpu.reindex(pd.MultiIndex.from_arrays(
+            [table.index.get_level_values('case'), threads.reindex(table.index).to_numpy()])).to_numpy()
+        table['cpu_pct'] = np.where(np.isnan(own), shared, own)
+    base = table.xs(baseline, level='case')
+    tasks = table.index.get_level_values('task')
+    table['runtime_change'] = table['runtime'].to_numpy() - base['runtime'].reindex(tasks).to_numpy()
+    table['delay_change'] = table['jitter'].to_numpy() - base['jitter'].reindex(tasks).to_numpy()
+    runtime_up = table['runtime_change'].clip(lower=0).fillna(0).to_numpy()
+    delay_up = table['delay_change'].clip(lower=0).fillna(0).to_numpy()
+    table['source'] = np.select([(runtime_up <= 0) & (delay_up <= 0), runtime_up >= delay_up],
+                                ['none', 'runtime'], 'scheduling')
+    table = table.reset_index()
+    return table[table['case'] != baseline].reset_index(drop=True)
@@ -0,0 +1,261 @@
+# Asyncio driver of the PX4 shell (pxh)
+#
+# The shell harnesses pace `work_queue status` with `sleep` and pipe it into
+# ./bin/px4 through a FIFO, so queries drift by the time every command takes
+# and nothing tells when a block was actually printed. Here PX4 is a
+# subprocess: commands are written to its stdin on a monotonic-clock
+# schedule (query k is due at k * interval from the first one, whatever the
+# previous ones took), and stdout is read as it arrives. A response is
+# complete when pxh prints its prompt again after the echoed command line:
+#
+#   pxh> wpxh> wopxh> ... pxh> work_queue status     <- echo, one line
+#   Work Queue: 8  threads                          RATE        INTERVAL
+#   ...
+#   pxh>                                             <- next prompt: done
+#
+# or when it times out. Every response becomes one record with its send,
+# first and last receive times (seconds on the monotonic clock since the
+# process was started, plus the wall-clock time of the send) and its output
+# lines without the echo and prompts; output printed between commands (log
+# messages) is recorded with command None. Records are streamed to disk as
+# JSON lines, and the responses also to a text capture in the format of the
+# shell harnesses (">> Run N", ">> Query I T", "pxh> command", output), which
+# the parsers in common/workqueue.py and common/px4perf.py read unchanged.
+#
+# px4/mock_pxh.py stands in for PX4 when there is no RPi at hand.
+
+import asyncio
+import json
+import time
+
+PROMPT = 'pxh> '
+COMMANDS = ('work_queue status', 'top once', 'perf')
+
+# Seconds to wait for a response, for PX4 to come up and to shut down
+TIMEOUT = 5.0
+STARTUP = 2.0
+SHUTDOWN_TIMEOUT = 5.0
+
+READ_SIZE = 1 << 16
+
+
+def clean_lines(text, command=None):
+    """Output lines of text without prompts, the command echo and blank lines"""
+    lines = []
+    for line in text.splitlines():
+        line = line.rstrip('\r')
+        if PROMPT.rstrip() in line:
+            # Keep what follows the last prompt, less the echoed command
+            line = line[line.rfind(PROMPT.rstrip()) + len(PROMPT.rstrip()):].lstrip()
+            if command and line.startswith(command):
+                line = line[len(command):]
+        if line.strip():
+            lines.append(line)
+    return lines
+
+
+class Px4Shell:
+    """A PX4 process and its shell, driven through stdin/stdout"""
+
+    def __init__(self, argv, cwd=None):
+        self.argv = list(argv)
+        self.cwd = cwd
+        self.process = None
+        self.started = None
+        self._buffer = ''
+        self._data = asyncio.Event()
+        self._chunks = []
+        self._reader = None
+
+    def now(self):
+        """Monotonic seconds since the process was started"""
+        return time.monotonic() - self.started
+
+    @property
+    def running(self):
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self, startup=STARTUP, timeout=TIMEOUT):
+        """Start PX4 and give it startup seconds to come up; returns its output so far.
+
+        If the shell has not printed its prompt by then, it is waited for up
+        to timeout seconds more.
+        """
+        self.process = await asyncio.create_subprocess_exec(
+            *self.argv, cwd=self.cwd, stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+        self.started = time.monotonic()
+        self._reader = asyncio.create_task(self._read())
+        await asyncio.sleep(startup)
+        deadline = self.now() + timeout
+        while not self._buffer.rstrip(' ').endswith(PROMPT.rstrip()) and not self._reader.done():
+            self._data.clear()
+            try:
+                await asyncio.wait_for(self._data.wait(), max(deadline - self.now(), 0))
+            except asyncio.TimeoutError:
+                break
+        return self._take()
+
+    async def _read(self):
+        while True:
+            chunk = await self.process.stdout.read(READ_SIZE)
+            if not chunk:
+                break
+            self._buffer += chunk.decode(errors='replace')
+            self._chunks.append((len(self._buffer), self.now()))
+            self._data.set()
+        self._data.set()
+
+    def _take(self, end=None):
+        """Output received up to offset end (default: all), and when it started and ended"""
+        end = len(self._buffer) if end is None else end
+        text = self._buffer[:end]
+        # A chunk's time is when its last byte arrived; one cut by end counts for both sides
+        first = self._chunks[0][1] if text else None
+        last = next(t for offset, t in self._chunks if offset >= end) if text else None
+        self._buffer = self._buffer[end:]
+        self._chunks = [(offset - end, t) for offset, t in self._chunks if offset > end]
+        return text, first, last
+
+    def _echo(self, command):
+        """Offsets of the start and end of the echo line of command, or None"""
+        for ending in ('\n', '\r\n'):
+            end = self._buffer.find(command + ending)
+            if end >= 0:
+                return self._buffer.rfind('\n', 0, end) + 1, end + len(command) + len(ending)
+        return None
+
+    def _complete(self, command):
+        # The prompt printed after the echo line of command ends its response
+        echo = self._echo(command)
+        return echo is not None and self._buffer[echo[1]:].rstrip(' ').endswith(PROMPT.rstrip())
+
+    async def command(self, command, timeout=TIMEOUT):
+        """Send command and wait for its response.
+
+        Returns (pending, response): the output received before the command
+        was sent, as a (text, first, last) tuple, and a dict with the send,
+        first and last receive times, the wall-clock time of the send, the
+        output text and whether it timed out.
+        """
+        pending = self._take()
+        epoch = time.time()
+        sent = self.now()
+        self._data.clear()
+        self.process.stdin.write(f'{command}\n'.encode())
+        await self.process.stdin.drain()
+        deadline = sent + timeout
+        timed_out = False
+        while not self._complete(command):
+            if self._reader.done():
+                break
+            remaining = deadline - self.now()
+            if remaining <= 0:
+                timed_out = True
+                break
+            try:
+                await asyncio.wait_for(self._data.wait(), remaining)
+            except asyncio.TimeoutError:
+                timed_out = True
+                break
+            self._data.clear()
+        # Output before the echo line (log messages) belongs to pending
+        echo = self._echo(command)
+        if echo is not None:
+            before = self._take(echo[0])
+            pending = (pending[0] + before[0], pending[1] if pending[0] else before[1],
+                       before[2] if before[0] else pending[2])
+            self._take(echo[1] - echo[0])
+        text, first, last = self._take()
+        return pending, {'command': command, 'sent': sent, 'first': first, 'last': last,
+                         'epoch': epoch, 'timeout': timed_out, 'text': text}
+
+    async def close(self, timeout=SHUTDOWN_TIMEOUT):
+        """Shut PX4 down, killing it after timeout seconds; returns its last output"""
+        if self.running:
+            try:
+                self.process.stdin.write(b'shutdown\n')
+                await self.process.stdin.drain()
+                self.process.stdin.close()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+        await self._reader
+        return self._take()
+
+
+class Recorder:
+    """Streams records (JSON lines) and the text capture of a session to disk"""
+
+    def __init__(self, capture_path, records_path, mode='w'):
+        self.capture = open(capture_path, mode)
+        self.records = open(records_path, mode)
+
+    def run(self, run):
+        self.capture.write(f">> Run {run}\n")
+        self.capture.flush()
+
+    def query(self, query, epoch):
+        self.capture.write(f">> Query {query} {epoch:.9f}\n")
+
+    def record(self, run, query, command, text, first=None, last=None, **fields):
+        """Write one record; responses (with a command) also go to the capture"""
+        lines = clean_lines(text, command)
+        if command is None and not lines:
+            return
+        record = {'run': run, 'query': query, 'command': command, **fields,
+                  'first': first, 'last': last, 'lines': lines}
+        self.records.write(json.dumps(record) + '\n')
+        self.records.flush()
+        if command is not None and not fields.get('timeout'):
+            self.capture.write(PROMPT + command + '\n')
+            self.capture.writelines(line + '\n' for line in lines)
+        elif command is None:
+            self.capture.writelines(line + '\n' for line in lines)
+        self.capture.flush()
+
+    def close(self):
+        self.capture.close()
+        self.records.close()
+
+
+async def run_session(argv, recorder, run, queries, interval, commands=COMMANDS,
+                      timeout=TIMEOUT, startup=STARTUP, cwd=None):
+    """Start PX4, send commands every interval seconds for queries queries, shut it down.
+
+    Returns the number of responses that timed out; the run ends early if
+    PX4 exits.
+    """
+    shell = Px4Shell(argv, cwd)
+    recorder.run(run)
+    timeouts = 0
+    try:
+        text, first, last = await shell.start(startup, timeout)
+        recorder.record(run, 0, None, text, first, last)
+        origin = shell.now()
+        for query in range(1, queries + 1):
+            scheduled = origin + (query - 1) * interval
+            delay = scheduled - shell.now()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if not shell.running:
+                print(f"  run {run}: PX4 exited before query {query}")
+                break
+            for command in commands:
+                (text, first, last), response = await shell.command(command, timeout)
+                recorder.record(run, query, None, text, first, last)
+                if command == commands[0]:
+                    recorder.query(query, response['epoch'])
+                text = response.pop('text')
+                recorder.record(run, query, text=text, scheduled=scheduled, **response)
+                if response['timeout']:
+                    timeouts += 1
+                    print(f"  run {run} query {query}: {command!r} timed out after {timeout} s")
+    finally:
+        text, first, last = await shell.close()
+        recorder.record(run, queries + 1, None, text, first, last)
+    return timeouts
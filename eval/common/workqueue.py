@@ -0,0 +1,544 @@
+# Streaming parser for PX4 `work_queue status` output
+#
+# The px4_wq_*.sh harnesses start PX4 once per run (">> Run N") and query
+# `work_queue status` at a fixed interval; every query prints one block:
+#
+#   Work Queue: 8  threads                          RATE        INTERVAL
+#   |__ 1) wq:rate_ctrl
+#   |   |__ 1) control_allocator                400.0 Hz         2500 us
+#   |   \__10) vehicle_magnetometer              47.1 Hz        21252 us
+#   \__ 8) wq:lp_default
+#       \__ 2) send_event                        30.0 Hz        33306 us (33333 us)
+#
+# The console echoes the command as it is typed, leaving garbled lines such
+# as "pxh> wpxh> wopxh> ... work_queue status" (possibly run into the block
+# header) before each block, and log messages may interleave with it. The
+# file is read once, line by line: lines are told apart by their first
+# characters and only task lines are split into fields, so there is no
+# per-line regex matching and no intermediate nested structure. Each task of
+# each query becomes one typed row of a NumPy structured array; thread and
+# task names are stored as indices into a shared name list.
+#
+# The harnesses also print ">> Query I T" (T: epoch seconds) before sending
+# each query; the block that follows gets T minus the time of the run's first
+# query. Older captures have no such lines, their queries are assumed to be
+# QUERY_INTERVAL seconds apart (query_times()).
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from scipy import stats as sps
+
+from . import bootstrap
+
+HEADER = 'Work Queue:'
+RUN_MARKER = '>> Run'
+QUERY_MARKER = '>> Query'
+
+# Seconds between queries (UPDATE_INTERVAL of the harnesses)
+QUERY_INTERVAL = 10
+
+# Interval percentiles of the tail statistics
+TAIL_PERCENTILES = (50, 90, 99)
+
+# A task is stretched in a query when its interval exceeds its nominal
+# interval by more than STRETCH_TOLERANCE; a thread whose children are all
+# stretched together in more than CO_STRETCH_ALERT of the queries is flagged
+STRETCH_TOLERANCE = 0.05
+CO_STRETCH_ALERT = 0.1
+
+# Warm-up: a change point in a task's per-query median interval within the
+# first MAX_WARMUP queries, kept when the prefix is off the rest of the run by
+# more than WARMUP_TOLERANCE. Drift: Theil-Sen slope of the interval over the
+# run, flagged when its CI excludes 0 and it adds up to more than
+# DRIFT_TOLERANCE of the median interval over the run
+MAX_WARMUP = 6
+WARMUP_TOLERANCE = 0.01
+DRIFT_TOLERANCE = 0.01
+
+# Confidence level of the overhead intervals
+CI_LEVEL = 0.95
+
+# Plot colour of each partitioning case (USPFS/SSPFS as in cmpLogs.py)
+CASE_COLORS = {
+    'Baremetal': '#2ca02c',
+    'Bao': '#d62728',
+    'USPFS': '#1f77b4',
+    'SSPFS': '#ff7f0e',
+    'SSPFS+col': '#9467bd',
+}
+
+# One row per task and query; wq and task index the names list
+WQ_DTYPE = np.dtype([
+    ('run', np.int32),        # run number (">> Run N"), 0 before the first run
+    ('query', np.int32),      # query within the run, from 1
+    ('wq', np.uint16),        # work queue thread, e.g. wq:rate_ctrl
+    ('task', np.uint16),      # task (work item) name
+    ('rate', np.float32),     # RATE column [Hz]
+    ('interval', np.int32),   # INTERVAL column [us]
+    ('expected', np.int32),   # expected interval [us]; 0 if not reported
+    ('time', np.float32),     # seconds since the run's first query; NaN if not stamped
+])
+
+
+def iter_workqueue(lines, index=None):
+    """Yield (run, query, wq, task, rate, interval, expected, time) per task line.
+
+    With index (a dict), wq and task are given as the position of the name
+    in index instead, unseen names being appended to it.
+    """
+    run = query = 0
+    wq = None
+    in_block = False
+    run_start = stamp = None
+    time = np.nan
+    for line in lines:
+        first = line[:1]
+        if in_block and (first == '|' or first == '\\' or first == ' '):
+            if line[5:7] == '__':
+                # "|   |__ 1) name   RATE Hz   INTERVAL us (EXPECTED us)"
+                fields = line[7:].split()
+                n = len(fields)
+                if wq is None or n < 6 or fields[3] != 'Hz' or fields[5] != 'us':
+                    continue
+                task = fields[1]
+                if index is not None:
+                    task = index.setdefault(task, len(index))
+                try:
+                    interval = int(fields[4])
+                    yield (run, query, wq, task, float(fields[2]), interval,
+                           int(fields[6][1:]) if n >= 8 and fields[6][0] == '(' else 0, time)
+                except ValueError:
+                    pass
+            elif line[1:3] == '__':
+                # "|__ 1) wq:rate_ctrl"
+                start = line.find('wq:')
+                wq = line[start:].split()[0] if start >= 0 else None
+                if wq is not None and index is not None:
+                    wq = index.setdefault(wq, len(index))
+            continue
+        if HEADER in line:
+            query += 1
+            wq = None
+            in_block = True
+            time = np.nan if stamp is None else stamp - run_start
+            stamp = None
+        elif line.startswith(RUN_MARKER):
+            run = int(line.split()[2])
+            query = 0
+            in_block = False
+            run_start = stamp = None
+        elif line.startswith(QUERY_MARKER):
+            # ">> Query I T": T is when query I was sent
+            try:
+                stamp = float(line.split()[3])
+            except (IndexError, ValueError):
+                continue
+            if run_start is None:
+                run_start = stamp
+        elif in_block and (first == 'p' or not line.strip()):
+            # Prompt or blank line: the block is over
+            in_block = False
+
+
+def parse_workqueue_file(file_path):
+    """Parse a work_queue status capture into (rows, names).
+
+    rows is a WQ_DTYPE array in file order; rows['wq'] and rows['task'] index
+    names.
+    """
+    index = {}
+    with open(file_path, 'r', errors='replace') as f:
+        rows = np.fromiter(iter_workqueue(f, index), dtype=WQ_DTYPE)
+    return rows, list(index)
+
+
+def to_frame(parsed):
+    """DataFrame of parse_workqueue_file() output, names as categoricals"""
+    rows, names = parsed
+    frame = pd.DataFrame(rows)
+    categories = pd.Index(names)
+    for column in ('wq', 'task'):
+        frame[column] = pd.Categorical.from_codes(
+            frame[column].to_numpy(dtype=np.int64), categories=categories).remove_unused_categories()
+    return frame
+
+
+def query_times(samples, interval=QUERY_INTERVAL):
+    """Time of every sample's query since the run's first one [s].
+
+    The stamped time where the capture has one, else (query - 1) * interval.
+    """
+    nominal = (samples['query'].to_numpy() - 1) * float(interval)
+    return np.where(np.isnan(samples['time'].to_numpy(dtype=float)), nominal, samples['time'])
+
+
+def task_statistics(samples, keys=('case', 'wq', 'task')):
+    """Interval distribution of every task: percentiles, max, CV, deadline overruns.
+
+    samples are to_frame() rows with a 'case' column. Queries where a task
+    did not run (rate 0) are counted in idle and left out of the rest. The
+    overrun ratio is the share of samples longer than the expected interval;
+    it is NaN for tasks that report none.
+    """
+    keys = list(keys)
+    active = samples['rate'] > 0
+    idle = (~active).groupby([samples[k] for k in keys], observed=True, sort=False).sum()
+    samples = samples[active]
+    groups = samples.groupby(keys, observed=True, sort=False)
+    stats = groups['interval'].agg(n='count', mean='mean', std='std', max='max')
+    tail = groups['interval'].quantile([p / 100 for p in TAIL_PERCENTILES]).unstack()
+    tail.columns = [f'p{p}' for p in TAIL_PERCENTILES]
+    stats = stats.join(tail)
+    stats['cv'] = stats['std'] / stats['mean']
+    stats['rate_mean'] = groups['rate'].mean()
+    deadline = samples[samples['expected'] > 0]
+    deadline_groups = deadline.groupby(keys, observed=True, sort=False)
+    stats['expected'] = deadline_groups['expected'].median()
+    stats['overrun_ratio'] = (deadline['interval'] > deadline['expected']).groupby(
+        [deadline[k] for k in keys], observed=True, sort=False).mean()
+    stats['idle'] = idle
+    return stats.reset_index()
+
+
+def plot_task_ecdfs(samples, cases, ncols=4):
+    """ECDF of the update interval of every task, one panel per task and a line per case"""
+    samples = samples[samples['rate'] > 0]
+    tasks = samples[['wq', 'task']].drop_duplicates().astype(str).values.tolist()
+    nrows = -(-len(tasks) // ncols)
+    fig, axs = plt.subplots(nrows, ncols, figsize=(4 * ncols, 2.6 * nrows), squeeze=False)
+    colors = {case: CASE_COLORS.get(case, f'C{i}') for i, case in enumerate(cases)}
+    for ax, (wq, task) in zip(axs.flat, tasks):
+        rows = samples[(samples['wq'].astype(str) == wq) & (samples['task'].astype(str) == task)]
+        for case in cases:
+            values = np.sort(rows.loc[rows['case'] == case, 'interval'].to_numpy()) / 1000
+            if len(values) == 0:
+                continue
+            ecdf = np.arange(1, len(values) + 1) / len(values)
+            ax.step(values, ecdf, where='post', color=colors[case], label=case)
+        expected = rows.loc[rows['expected'] > 0, 'expected']
+        if len(expected):
+            ax.axvline(expected.median() / 1000, color='black', linestyle='--', linewidth=0.8)
+        ax.set_title(f'{task} ({wq})', fontsize=9)
+        ax.tick_params(labelsize=8)
+        ax.grid(True, alpha=0.3)
+    for ax in axs.flat[len(tasks):]:
+        ax.set_visible(False)
+    for ax in axs[:, 0]:
+        ax.set_ylabel('ECDF')
+    for ax in axs[-1]:
+        ax.set_xlabel('Interval [ms]')
+    axs.flat[0].legend(fontsize=8)
+    fig.suptitle('Task update interval distributions (dashed: expected interval)')
+    fig.tight_layout()
+    return fig
+
+
+def nominal_intervals(samples, baseline=None):
+    """Nominal interval [us] of every (wq, task).
+
+    The expected interval where the task reports one, else the median
+    interval of the baseline case (of all samples without a baseline).
+    """
+    samples = samples[samples['rate'] > 0]
+    keys = [samples['wq'].astype(str), samples['task'].astype(str)]
+    reference = samples if baseline is None else samples[samples['case'] == baseline]
+    nominal = reference.groupby([reference['wq'].astype(str), reference['task'].astype(str)])['interval'].median()
+    expected = samples['expected'].where(samples['expected'] > 0).groupby(keys).median()
+    nominal = expected.combine_first(nominal)
+    nominal.index.names = ['wq', 'task']
+    return nominal
+
+
+def thread_load(samples, baseline=None, tolerance=STRETCH_TOLERANCE):
+    """Scheduled load of every work queue thread in every query.
+
+    Per (case, run, query, wq): the active children, the sum of their rates
+    (activations/s) against the sum of their nominal rates (delivery is the
+    ratio of the two), the worst child stretch (interval / nominal interval),
+    how many children are stretched and whether all of them are (co_stretch,
+    threads with at least two active children): a thread that cannot keep up
+    with every one of its modules at once points to the thread being starved
+    rather than to a slow module.
+    """
+    nominal = nominal_intervals(samples, baseline)
+    samples = samples[samples['rate'] > 0]
+    wq = samples['wq'].astype(str)
+    task = samples['task'].astype(str)
+    nominal_us = nominal.reindex(pd.MultiIndex.from_arrays([wq, task])).to_numpy()
+    rows = pd.DataFrame({
+        'case': samples['case'].to_numpy(), 'run': samples['run'].to_numpy(),
+        'query': samples['query'].to_numpy(), 'wq': wq.to_numpy(),
+        'rate': samples['rate'].to_numpy(dtype=float),
+        'nominal_rate': 1e6 / nominal_us,
+        'stretch': samples['interval'].to_numpy() / nominal_us,
+    })
+    rows['stretched'] = rows['stretch'] > 1 + tolerance
+    load = rows.groupby(['case', 'run', 'query', 'wq'], sort=False).agg(
+        children=('rate', 'size'), rate=('rate', 'sum'), nominal_rate=('nominal_rate', 'sum'),
+        max_stretch=('stretch', 'max'), stretched=('stretched', 'sum')).reset_index()
+    load['delivery'] = load['rate'] / load['nominal_rate']
+    load['co_stretch'] = (load['children'] >= 2) & (load['stretched'] == load['children'])
+    return load
+
+
+def thread_summary(load, alert=CO_STRETCH_ALERT):
+    """Per case and thread: scheduled load, delivery and co-stretch ratio over the queries"""
+    summary = load.groupby(['case', 'wq'], sort=False).agg(
+        queries=('query', 'size'), children=('children', 'median'),
+        rate=('rate', 'mean'), nominal_rate=('nominal_rate', 'mean'),
+        delivery=('delivery', 'mean'), delivery_min=('delivery', 'min'),
+        max_stretch=('max_stretch', 'max'), co_stretch_ratio=('co_stretch', 'mean')).reset_index()
+    summary['starved'] = summary['co_stretch_ratio'] > alert
+    return summary
+
+
+def plot_thread_load(summary, cases):
+    """Delivered share of the scheduled load and co-stretch ratio per thread and case"""
+    threads = list(dict.fromkeys(summary['wq']))
+    x = np.arange(len(threads))
+    width = 0.8 / len(cases)
+    fig, axs = plt.subplots(2, 1, figsize=(14, 8), sharex=True)
+    for i, case in enumerate(cases):
+        rows = summary[summary['case'] == case].set_index('wq').reindex(threads)
+        offset = (i - (len(cases) - 1) / 2) * width
+        color = CASE_COLORS.get(case, f'C{i}')
+        axs[0].bar(x + offset, rows['delivery'] * 100, width, color=color, label=case,
+                   yerr=[(rows['delivery'] - rows['delivery_min']) * 100, np.zeros(len(threads))],
+                   capsize=3)
+        axs[1].bar(x + offset, rows['co_stretch_ratio'] * 100, width, color=color, label=case)
+    axs[0].axhline(100, color='black', linewidth=0.8)
+    axs[0].set_ylabel('Delivered / scheduled rate [%]\n(error bar: worst query)')
+    axs[0].set_title('Work queue thread load')
+    axs[0].legend()
+    axs[1].set_ylabel('Queries with all children\nstretched [%]')
+    axs[1].set_xticks(x)
+    axs[1].set_xticklabels(threads, fontsize=9)
+    for ax in axs:
+        ax.grid(True, axis='y', linestyle='--', alpha=0.5)
+    fig.tight_layout()
+    return fig
+
+
+def query_profiles(samples, keys=('case', 'wq', 'task')):
+    """Median interval of every task in every query, over the runs.
+
+    Rows are keys, columns the query number; queries where the task did not
+    run are NaN.
+    """
+    keys = list(keys)
+    samples = samples[samples['rate'] > 0]
+    return samples.groupby([*keys, 'query'], observed=True)['interval'].median().unstack()
+
+
+def change_point(values, max_prefix):
+    """Length of the prefix of values best split off as a mean shift.
+
+    Least-squares single change point: the k <= max_prefix minimising the
+    squared error of modelling values[:k] and values[k:] by their means
+    (0 when no split improves on a single mean). At least three values are
+    kept after the split.
+    """
+    n = len(values)
+    best, cost = 0, np.sum((values - values.mean()) ** 2)
+    for k in range(1, min(max_prefix, n - 3) + 1):
+        head, tail = values[:k], values[k:]
+        split = np.sum((head - head.mean()) ** 2) + np.sum((tail - tail.mean()) ** 2)
+        if split < cost:
+            best, cost = k, split
+    return best
+
+
+def detect_warmup(samples, max_warmup=MAX_WARMUP, tolerance=WARMUP_TOLERANCE):
+    """Warm-up prefix of every task in every case.
+
+    The change point of the task's per-query median interval (query_profiles())
+    within the first max_warmup queries; it is a warm-up when the prefix mean
+    is off the median of the rest by more than tolerance. Returns per
+    (case, wq, task) the last warm-up query (warmup, 0 if none) and the
+    relative offset of the prefix (shift).
+    """
+    profiles = query_profiles(samples)
+    rows = []
+    for key, profile in profiles.iterrows():
+        profile = profile.dropna()
+        values = profile.to_numpy(dtype=float)
+        k = change_point(values / np.median(values), max_warmup) if len(values) else 0
+        shift = values[:k].mean() / np.median(values[k:]) - 1 if k else 0.0
+        warm = k > 0 and abs(shift) > tolerance
+        rows.append((*key, int(profile.index[k - 1]) if warm else 0, shift if warm else 0.0))
+    return pd.DataFrame(rows, columns=['case', 'wq', 'task', 'warmup', 'shift'])
+
+
+def drop_warmup(samples, warmup):
+    """samples without the warm-up queries of their task.
+
+    A task's warm-up is the longest detect_warmup() found for it in any case,
+    so every case keeps the same queries.
+    """
+    last = warmup.groupby(['wq', 'task'])['warmup'].max()
+    keys = pd.MultiIndex.from_arrays([samples['wq'].astype(str), samples['task'].astype(str)])
+    cutoff = last.reindex(keys).fillna(0).to_numpy()
+    return samples[samples['query'].to_numpy() > cutoff]
+
+
+def task_drift(samples, interval=QUERY_INTERVAL, tolerance=DRIFT_TOLERANCE):
+    """Trend of every task's interval over the run (e.g. thermal throttling).
+
+    Theil-Sen slope of interval against query time, pooling the runs, with
+    its 95 % CI. drift is the change the slope adds up to over the run,
+    relative to the median interval; a task is drifting when the CI excludes
+    0 and |drift| exceeds tolerance.
+    """
+    samples = samples[samples['rate'] > 0]
+    times = pd.Series(query_times(samples, interval), index=samples.index)
+    rows = []
+    for key, group in samples.groupby(['case', 'wq', 'task'], observed=True, sort=False):
+        t = times[group.index].to_numpy(dtype=float)
+        y = group['interval'].to_numpy(dtype=float)
+        if np.ptp(t) == 0:
+            continue
+        slope, _, low, high = sps.theilslopes(y, t)
+        median = np.median(y)
+        drift = slope * np.ptp(t) / median
+        rows.append((*key, median, slope * 60, low * 60, high * 60, drift,
+                     (low > 0 or high < 0) and abs(drift) > tolerance))
+    return pd.DataFrame(rows, columns=['case', 'wq', 'task', 'median', 'slope', 'slope_low',
+                                       'slope_high', 'drift', 'drifting'])
+
+
+def plot_query_profiles(samples, warmup, cases):
+    """Per-query median interval of every task relative to its run median, per case"""
+    profiles = query_profiles(samples)
+    profiles = profiles.div(profiles.median(axis=1), axis=0) - 1
+    fig, axs = plt.subplots(1, len(cases), figsize=(6 * len(cases), 7), sharey=True, squeeze=False)
+    for ax, case in zip(axs[0], cases):
+        profile = profiles.loc[case]
+        labels = [f'{task} ({wq})' for wq, task in profile.index]
+        image = ax.imshow(profile.to_numpy(dtype=float) * 100, aspect='auto', cmap='RdBu_r',
+                          vmin=-5, vmax=5, interpolation='nearest')
+        last = warmup[warmup['case'] == case].set_index(['wq', 'task'])['warmup']
+        for i, key in enumerate(profile.index):
+            if last.get(key, 0):
+                ax.plot(last[key] - 0.5, i, marker='|', markersize=12, color='black')
+        ax.set_title(case)
+        ax.set_xticks(range(profile.shape[1]))
+        ax.set_xticklabels(profile.columns, fontsize=8)
+        ax.set_xlabel('Query')
+        ax.set_yticks(range(len(labels)))
+        ax.set_yticklabels(labels, fontsize=8)
+    fig.colorbar(image, ax=axs[0].tolist(), label='Median interval vs run median [%]')
+    fig.suptitle('Interval over the run (|: end of detected warm-up)')
+    return fig
+
+
+def case_statistics(samples, tasks=None):
+    """Count, mean and standard error of every task's interval in every case.
+
+    One groupby over to_frame() rows with a 'case' column; tasks restricts
+    the tasks (all by default). Indexed by (case, task): cases in order of
+    appearance, tasks in the given order or else as listed by work_queue
+    status.
+    """
+    samples = samples[samples['rate'] > 0]
+    if tasks is not None:
+        samples = samples[samples['task'].isin(tasks)]
+    task = samples['task'].astype(str)
+    stats = samples.groupby([samples['case'], task], observed=True, sort=False)['interval'].agg(
+        n='count', mean='mean', sem='sem')
+    stats.index.names = ['case', 'task']
+    if tasks is None:
+        # Position of every task in its query's listing
+        position = samples.groupby(['case', 'run', 'query'], observed=True, sort=False).cumcount()
+        tasks = position.groupby(task).median().sort_values(kind='stable').index
+    rank = pd.Series(np.arange(len(tasks)), index=list(tasks))
+    order = np.lexsort((rank.reindex(stats.index.get_level_values('task')).to_numpy(),
+                        pd.factorize(stats.index.get_level_values('case'))[0]))
+    return stats.iloc[order]
+
+
+def bootstrap_means(samples, stats, resamples=bootstrap.RESAMPLES, seed=bootstrap.SEED):
+    """Hierarchical bootstrap distribution of every mean in stats.
+
+    stats as from case_statistics(). Runs are resampled first and queries
+    within each drawn run (see common/bootstrap.py), all (case, task) cells
+    at once. Returns an array (len(stats), resamples).
+    """
+    samples = samples[samples['rate'] > 0]
+    samples = samples.assign(case=samples['case'].astype(str), task=samples['task'].astype(str))
+    groups = pd.MultiIndex.from_arrays([stats.index.get_level_values('case').astype(str),
+                                        stats.index.get_level_values('task')], names=['case', 'task'])
+    values, lengths = bootstrap.pack_frame(samples, groups)
+    return bootstrap.resample_means(values, lengths, resamples, seed)
+
+
+def overhead_matrix(stats, baseline, level=CI_LEVEL, means=None):
+    """Relative overhead of every case against baseline, for every task.
+
+    stats as from case_statistics(). The (cases x tasks) mean and standard
+    error matrices are compared with the baseline row at once: overhead is
+    mean / baseline mean - 1 in %, its standard error follows from first
+    order error propagation of the ratio, and ci_low/ci_high is the normal
+    interval at level. With means, the bootstrap_means() of stats, se and
+    the interval come from the bootstrap distribution of the ratio instead
+    (its standard deviation and percentile interval). significant is set
+    when the interval excludes 0. Returns one row per (case, task), baseline
+    excluded.
+    """
+    mean = stats['mean'].unstack('task')
+    sem = stats['sem'].unstack('task')
+    cases = list(dict.fromkeys(stats.index.get_level_values('case')))
+    tasks = list(dict.fromkeys(stats.index.get_level_values('task')))
+    mean, sem = mean.reindex(index=cases, columns=tasks), sem.reindex(index=cases, columns=tasks)
+    ratio = mean / mean.loc[baseline]
+    matrix = pd.DataFrame({'overhead': ((ratio - 1) * 100).stack()})
+    matrix.index.names = ['case', 'task']
+    if means is None:
+        ratio_se = ratio * np.sqrt((sem / mean) ** 2 + (sem.loc[baseline] / mean.loc[baseline]) ** 2)
+        matrix['se'] = (ratio_se * 100).stack()
+        z = sps.norm.ppf(0.5 + level / 2)
+        matrix['ci_low'] = matrix['overhead'] - z * matrix['se']
+        matrix['ci_high'] = matrix['overhead'] + z * matrix['se']
+    else:
+        # Row of every cell in stats and of its task's baseline cell
+        row = pd.Series(np.arange(len(stats)), index=stats.index)
+        cells = row.reindex(matrix.index).to_numpy()
+        base = row.reindex(pd.MultiIndex.from_arrays(
+            [np.full(len(matrix), baseline, dtype=object), matrix.index.get_level_values('task')])).to_numpy()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            overhead = (means[cells] / means[base] - 1) * 100
+        matrix['se'] = np.nanstd(overhead, axis=1, ddof=1)
+        matrix['ci_low'], matrix['ci_high'] = bootstrap.percentile_ci(overhead, level)
+    matrix['significant'] = (matrix['ci_low'] > 0) | (matrix['ci_high'] < 0)
+    matrix = matrix.drop(index=baseline, level='case').reset_index()
+    return stats.reset_index().merge(matrix, on=['case', 'task'])
+
+
+def plot_overhead_matrix(matrix, baseline):
+    """Heatmap of the overhead matrix: a row per case, a column per task"""
+    overhead = matrix.pivot(index='case', columns='task', values='overhead')
+    overhead = overhead.reindex(index=list(dict.fromkeys(matrix['case'])),
+                                columns=list(dict.fromkeys(matrix['task'])))
+    ci = matrix.assign(ci=(matrix['ci_high'] - matrix['ci_low']) / 2).pivot(
+        index='case', columns='task', values='ci').reindex_like(overhead)
+    significant = matrix.pivot(index='case', columns='task', values='significant').reindex_like(overhead)
+    ncases, ntasks = overhead.shape
+    fig, ax = plt.subplots(figsize=(max(8, 1.4 * ntasks), max(3, 0.5 * ncases + 2)))
+    limit = np.nanmax(np.abs(overhead.to_numpy(dtype=float))) if overhead.size else 1
+    image = ax.imshow(overhead.to_numpy(dtype=float), cmap='RdBu_r', vmin=-limit, vmax=limit, aspect='auto')
+    if ncases * ntasks <= 400:
+        for i in range(ncases):
+            for j in range(ntasks):
+                value = overhead.iat[i, j]
+                if np.isnan(value):
+                    continue
+                ax.text(j, i, f'{value:.2f}\n± {ci.iat[i, j]:.2f}', ha='center', va='center', fontsize=7,
+                        fontweight='bold' if significant.iat[i, j] else 'normal')
+    ax.set_xticks(range(ntasks))
+    ax.set_xticklabels(overhead.columns, rotation=45, ha='right', fontsize=8)
+    ax.set_yticks(range(ncases))
+    ax.set_yticklabels(overhead.index, fontsize=8)
+    fig.colorbar(image, ax=ax, label=f'Interval overhead vs {baseline} [%]')
+    ax.set_title(f'Task interval overhead vs {baseline} (bold: CI excludes 0)')
+    fig.tight_layout()
+    return fig
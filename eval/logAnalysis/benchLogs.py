@@ -0,0 +1,369 @@
+#!/usr/bin/python3
+# Benchmarks for the flight log analysis in cmpLogs.py
+#
+# Each benchmark is a subcommand; run from this directory, e.g.:
+#   python benchLogs.py projection
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import resource
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+
+import cmpLogs
+from plotDecimation import fill_between_lod, plot_lod
+from ulogCache import ULogCache
+from ulogReader import HEADER_MAGIC, SYNC_MAGIC, MappedULog
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import figures
+
+LOG_FILES = sorted(glob.glob('uspfs/*.ulg') + glob.glob('sspfs/*.ulg'))
+STREAMING_CACHE = '.ulog_cache'
+
+
+def peak_rss_mb():
+    """Peak resident set size of the current process in MB"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_child(bench, mode, extra=()):
+    """Run one benchmark mode in a fresh interpreter and return its result.
+
+    Peak RSS is a per-process high-water mark, so every mode gets its own
+    process to keep the measurements independent.
+    """
+    out = subprocess.run(
+        [sys.executable, __file__, bench, '--child', mode, *extra],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(out.splitlines()[-1])
+
+
+# ## Topic projection ##########################################################
+def projection_child(mode):
+    rss_before = peak_rss_mb()
+    topics = cmpLogs.required_topics(cmpLogs.METRICS)
+    start = time.perf_counter()
+    for log_file in LOG_FILES:
+        if mode == 'full':
+            # The logger pseudo-topics are not uORB topics: they come from
+            # ulogReader, as in load_topics
+            ulog = cmpLogs.pyulog.ULog(log_file)
+            data = {topic: ulog.get_dataset(topic).data for topic in topics
+                    if topic not in cmpLogs.LOGGER_TOPICS}
+            if any(topic in cmpLogs.LOGGER_TOPICS for topic in topics):
+                with MappedULog(log_file) as mapped:
+                    data.update(cmpLogs.logger_stats(mapped))
+        else:
+            data = cmpLogs.load_topics(log_file, topics)
+        del data
+    wall = time.perf_counter() - start
+    return {'wall_s': wall, 'rss_mb': peak_rss_mb() - rss_before}
+
+
+def projection(args):
+    print(f"Decoding {len(LOG_FILES)} logs, {args.repeat} repetition(s)")
+    print(f"Topics: {', '.join(cmpLogs.required_topics(cmpLogs.METRICS))}")
+    results = {}
+    for mode in ('full', 'projected'):
+        runs = [run_child('projection', mode) for _ in range(args.repeat)]
+        results[mode] = {
+            'wall_s': min(r['wall_s'] for r in runs),
+            'rss_mb': min(r['rss_mb'] for r in runs),
+        }
+        print(f"  {mode:<10} wall: {results[mode]['wall_s']:7.2f} s   "
+              f"peak RSS increase: {results[mode]['rss_mb']:7.1f} MB")
+    full, proj = results['full'], results['projected']
+    print(f"Speedup: {full['wall_s'] / proj['wall_s']:.1f}x, "
+          f"RSS saving: {full['rss_mb'] - proj['rss_mb']:.1f} MB")
+
+
+# ## Confidence intervals ######################################################
+def calculate_statistics_loop(data):
+    """Reference: the per-timepoint t.ppf loop calculate_statistics replaced"""
+    results = {}
+    for key, values in data.items():
+        arr = np.array(values)
+        mean = np.nanmean(arr, axis=0)
+        std = np.nanstd(arr, axis=0)
+        n = np.sum(~np.isnan(arr), axis=0)
+        ci = np.zeros_like(mean)
+        for i in range(len(mean)):
+            if n[i] > 1:
+                t_value = cmpLogs.stats.t.ppf(1 - (1 - cmpLogs.CONFIDENCE_LEVEL)/2, n[i]-1)
+                ci[i] = t_value * std[i] / np.sqrt(n[i])
+            else:
+                ci[i] = np.nan
+        results[key] = {'mean': mean, 'ci': ci}
+    return results
+
+
+def synthetic_flights(n_flights, n_points, nan_fraction=0.05, seed=0):
+    """Random per-flight metric arrays with NaN gaps, shaped like process_group"""
+    rng = np.random.default_rng(seed)
+    data = {}
+    for metric in cmpLogs.METRICS:
+        arr = rng.normal(size=(n_flights, n_points))
+        arr[rng.random(arr.shape) < nan_fraction] = np.nan
+        data[metric] = list(arr)
+    return data
+
+
+def statistics(args):
+    print(f"calculate_statistics: {len(cmpLogs.METRICS)} metrics x {args.flights} flights")
+    for n_points in args.points:
+        data = synthetic_flights(args.flights, n_points)
+        cmpLogs.t_critical.cache_clear()
+        timings = {}
+        results = {}
+        for name, func in (('loop', calculate_statistics_loop),
+                           ('vectorised', cmpLogs.calculate_statistics)):
+            best = np.inf
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                results[name] = func(data)
+                best = min(best, time.perf_counter() - start)
+            timings[name] = best
+        identical = all(
+            np.array_equal(results['loop'][m][k], results['vectorised'][m][k], equal_nan=True)
+            for m in cmpLogs.METRICS for k in ('mean', 'ci'))
+        print(f"  {n_points:>7} points  loop: {timings['loop']:8.3f} s  "
+              f"vectorised: {timings['vectorised']:8.4f} s  "
+              f"speedup: {timings['loop'] / timings['vectorised']:7.0f}x  "
+              f"identical: {identical}")
+
+
+# ## Streaming aggregation #####################################################
+def streaming_child(mode):
+    mode, copies = mode.split(':')
+    log_files = LOG_FILES * int(copies)
+    cache = ULogCache(STREAMING_CACHE)
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, data, _ = cmpLogs.process_group(log_files, mode, cache=cache, stream=(mode == 'stream'))
+        cmpLogs.calculate_statistics(data)
+    wall = time.perf_counter() - start
+    return {'wall_s': wall, 'rss_mb': peak_rss_mb() - rss_before}
+
+
+def streaming(args):
+    print(f"Batch vs streaming aggregation, {len(LOG_FILES)} logs replicated "
+          f"{', '.join(map(str, args.copies))} times (decoded topics cached in {STREAMING_CACHE})")
+    streaming_child('stream:1')  # warm the cache so decoding is out of the way
+    for copies in args.copies:
+        for mode in ('batch', 'stream'):
+            r = run_child('streaming', f'{mode}:{copies}')
+            print(f"  {len(LOG_FILES) * copies:>6} flights  {mode:<6} wall: {r['wall_s']:7.2f} s   "
+                  f"peak RSS increase: {r['rss_mb']:7.1f} MB")
+
+
+# ## Memory-mapped reader ######################################################
+# Synthetic topics: (fields, rate in Hz). battery_status ends in padding,
+# which is in the format but not in the data messages, like in PX4 logs.
+SYNTHETIC_TOPICS = {
+    'vehicle_angular_velocity': (['uint64_t timestamp', 'uint64_t timestamp_sample',
+                                  'float[3] xyz', 'float[3] xyz_derivative'], 400),
+    'vehicle_local_position': (['uint64_t timestamp', 'float x', 'float y', 'float z',
+                                'float vx', 'float vy', 'float vz'], 50),
+    'vehicle_local_position_setpoint': (['uint64_t timestamp', 'float x', 'float y',
+                                         'float z'], 50),
+    'battery_status': (['uint64_t timestamp', 'float voltage_v', 'float current_a',
+                        'float remaining', 'uint8_t[4] _padding0'], 10),
+    'cpuload': (['uint64_t timestamp', 'float load', 'float ram_usage'], 2),
+}
+SYNTHETIC_CHUNK_S = 10  # seconds of flight generated per write
+
+
+def ulog_message(msg_type, payload):
+    return struct.pack('<HB', len(payload), ord(msg_type)) + payload
+
+
+def synthetic_ulog(path, size_mb, seed=0):
+    """Write a ULog of about size_mb MB with SYNTHETIC_TOPICS at their rates.
+
+    Data messages are laid out with NumPy a chunk at a time (interleaved in
+    timestamp order), with a sync message per chunk and an occasional
+    dropout, so the writer itself is fast even for GB-sized files.
+    """
+    rng = np.random.default_rng(seed)
+    dtypes = {}
+    with open(path, 'wb') as f:
+        f.write(HEADER_MAGIC + b'\x01' + struct.pack('<Q', 0))
+        f.write(ulog_message('B', bytes(40)))
+        for name, (fields, _) in SYNTHETIC_TOPICS.items():
+            f.write(ulog_message('F', f"{name}:{';'.join(fields)};".encode()))
+        for msg_id, name in enumerate(SYNTHETIC_TOPICS):
+            f.write(ulog_message('A', struct.pack('<BH', 0, msg_id) + name.encode()))
+            layout = [('size', '<u2'), ('type', 'u1'), ('msg_id', '<u2')]
+            for field in SYNTHETIC_TOPICS[name][0]:
+                type_str, field_name = field.split(' ')
+                if field_name.startswith('_padding'):
+                    continue  # trailing padding is not written
+                base, _, count = type_str.rstrip(']').partition('[')
+                dtype = {'uint64_t': '<u8', 'float': '<f4', 'uint8_t': 'u1'}[base]
+                layout.append((field_name, dtype, (int(count),)) if count else (field_name, dtype))
+            dtypes[name] = np.dtype(layout)
+
+        chunk = 0
+        while f.tell() < size_mb << 20:
+            start_us = chunk * SYNTHETIC_CHUNK_S * 1_000_000
+            records = []
+            for msg_id, (name, (_, rate)) in enumerate(SYNTHETIC_TOPICS.items()):
+                n = SYNTHETIC_CHUNK_S * rate
+                rec = np.zeros(n, dtype=dtypes[name])
+                rec['size'] = rec.itemsize - 3
+                rec['type'] = ord('D')
+                rec['msg_id'] = msg_id
+                rec['timestamp'] = start_us + np.arange(n) * (1_000_000 // rate) + msg_id
+                for field in dtypes[name].names[4:]:
+                    rec[field] = rng.normal(size=rec[field].shape)
+                records.append(rec)
+            # Interleave all messages of the chunk by timestamp
+            stamps = np.concatenate([rec['timestamp'] for rec in records])
+            sizes = np.concatenate([np.full(len(rec), rec.itemsize) for rec in records])
+            order = np.argsort(stamps, kind='stable')
+            offsets = np.empty_like(sizes)
+            offsets[order] = np.cumsum(sizes[order]) - sizes[order]
+            out = np.empty(sizes.sum(), dtype=np.uint8)
+            first = 0
+            for rec in records:
+                dst = offsets[first:first + len(rec), None] + np.arange(rec.itemsize)
+                out[dst] = rec.view(np.uint8).reshape(len(rec), rec.itemsize)
+                first += len(rec)
+            f.write(ulog_message('S', SYNC_MAGIC))
+            f.write(out.tobytes())
+            if chunk % 10 == 9:
+                f.write(ulog_message('O', struct.pack('<H', 50)))
+            chunk += 1
+
+
+def reader_child(mode):
+    mode, path = mode.split(':', 1)
+    topics = cmpLogs.required_topics(cmpLogs.METRICS)
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    if mode == 'pyulog':
+        data = {(d.name, d.multi_id): d.data for d in cmpLogs.pyulog.ULog(path).data_list}
+    elif mode == 'mmap':
+        ulog = MappedULog(path)
+        data = {key: ulog.fields(*key) for key in ulog.topics}
+    elif mode == 'mmap-index':
+        data = MappedULog(path)
+    else:
+        data = cmpLogs.load_topics(path, topics, reader=mode.split('-')[0])
+    wall = time.perf_counter() - start
+    # The decoded data stays referenced until the peak RSS is read
+    rss = peak_rss_mb() - rss_before
+    del data
+    return {'wall_s': wall, 'rss_mb': rss}
+
+
+def reader(args):
+    print("pyulog.ULog vs MappedULog on synthetic logs: every topic decoded, only the "
+          "cmpLogs topics decoded (projected), or only the message index built")
+    for size_mb in args.sizes:
+        path = os.path.join(args.tmp_dir, f'synthetic_{size_mb}MB.ulg')
+        synthetic_ulog(path, size_mb)
+        print(f"  {os.path.getsize(path) / (1 << 20):.0f} MB log:")
+        try:
+            for mode in ('pyulog', 'mmap', 'pyulog-projected', 'mmap-projected', 'mmap-index'):
+                runs = [run_child('reader', f'{mode}:{path}') for _ in range(args.repeat)]
+                wall = min(r['wall_s'] for r in runs)
+                rss = min(r['rss_mb'] for r in runs)
+                print(f"    {mode:<17} wall: {wall:7.2f} s   peak RSS increase: {rss:7.1f} MB")
+        finally:
+            os.remove(path)
+
+
+# ## Plot decimation ##########################################################
+def render_figure(traces, decimated, dpi=figures.DPI):
+    """Render overlaid per-flight traces plus their mean and CI band to PNG bytes"""
+    fig, ax = plt.subplots(figsize=(14, 5))
+    x = np.linspace(0, 100, traces.shape[1])
+    mean = traces.mean(axis=0)
+    ci = cmpLogs.confidence_interval(traces.std(axis=0), np.full(len(x), len(traces)))
+    plot = plot_lod if decimated else (lambda ax, *a, **kw: ax.plot(*a, **kw))
+    fill = fill_between_lod if decimated else (lambda ax, *a, **kw: ax.fill_between(*a, **kw))
+    for trace in traces:
+        plot(ax, x, trace, color='gray', linewidth=0.5, alpha=0.3)
+    plot(ax, x, mean, color=cmpLogs.COLORS['USPFS'])
+    fill(ax, x, mean - ci, mean + ci, color=cmpLogs.COLORS['USPFS'], alpha=0.2)
+    ax.set_xlim(0, 100)
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=dpi)
+    plt.close(fig)
+    return buf.getvalue()
+
+
+def render(args):
+    print(f"Rendering {args.traces} overlaid flights + mean/CI at {figures.DPI} dpi, "
+          "full series vs M4 decimation")
+    rng = np.random.default_rng(0)
+    for n_points in args.points:
+        t = np.linspace(0, 1, n_points)
+        traces = (np.sin(2 * np.pi * 5 * t) + rng.normal(scale=0.2, size=(args.traces, n_points))
+                  + rng.normal(size=(args.traces, 1)))
+        timings = {}
+        images = {}
+        for mode in ('full', 'm4'):
+            best = np.inf
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                images[mode] = render_figure(traces, mode == 'm4')
+                best = min(best, time.perf_counter() - start)
+            timings[mode] = best
+        pixels = {mode: plt.imread(io.BytesIO(png)) for mode, png in images.items()}
+        diff = np.abs(pixels['full'] - pixels['m4']).max(axis=-1)
+        print(f"  {n_points:>7} points  full: {timings['full']:7.2f} s  m4: {timings['m4']:7.2f} s  "
+              f"speedup: {timings['full'] / timings['m4']:5.1f}x  "
+              f"PNG: {len(images['full']) >> 10} / {len(images['m4']) >> 10} KB  "
+              f"pixels differing: {np.mean(diff > 0):.3%} (by >10%: {np.mean(diff > 0.1):.3%})")
+
+
+BENCHMARKS = {
+    'projection': (projection, projection_child),
+    'statistics': (statistics, None),
+    'streaming': (streaming, streaming_child),
+    'reader': (reader, reader_child),
+    'render': (render, None),
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="cmpLogs benchmarks")
+    parser.add_argument('bench', choices=BENCHMARKS)
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help="repetitions per mode; the best one is reported")
+    parser.add_argument('--flights', type=int, default=33,
+                        help="synthetic flights per group (default: 33)")
+    parser.add_argument('--points', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help="timepoints per flight for synthetic data")
+    parser.add_argument('--traces', type=int, default=100,
+                        help="overlaid flights for the render benchmark (default: 100)")
+    parser.add_argument('--copies', type=int, nargs='+', default=[1, 10, 30],
+                        help="times the logs are replicated for the streaming benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000],
+                        help="synthetic log sizes in MB for the reader benchmark")
+    parser.add_argument('--tmp-dir', default=tempfile.gettempdir(),
+                        help="where the synthetic logs are written (removed afterwards)")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    run, child = BENCHMARKS[args.bench]
+    if args.child:
+        print(json.dumps(child(args.child)))
+    else:
+        run(args)
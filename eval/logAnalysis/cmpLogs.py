@@ -1,17 +1,28 @@
 import pyulog
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.interpolate import interp1d
 import os
 import pandas as pd
-from scipy import stats
+from scipy import stats, special
 import glob
+import argparse
+import sys
+import warnings
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from functools import lru_cache, partial
+from plotDecimation import fill_between_lod, plot_lod
+from ulogCache import ULogCache
+from ulogReader import MappedULog
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import figures
 
 # Configuration
 UNSUPERVISED_LOGS = glob.glob('uspfs/*.ulg')
 SUPERVISED_LOGS = glob.glob('sspfs/*.ulg')
-print(f"Found {len(UNSUPERVISED_LOGS)} unsupervised logs")
-print(f"Found {len(SUPERVISED_LOGS)} supervised logs")
 
 # Battery parameters for HoverGames 3S1P battery
 TOTAL_ENERGY_WH = 55.5  # 55.5 Wh total capacity
@@ -24,157 +35,711 @@ BATTERY_CHANGE_THRESHOLD = 0.01  # Minimum battery percentage change (1%)
 # We want to highlight different flight phases and normalize data with N points
 N_POINTS = 1000
 PHASES = {'Takeoff': (0, 15), 'Cruise': (15, 85), 'Landing': (85, 100)}
+# Spans the per-flight summaries are reported for: every phase and the whole mission
+PHASE_SPANS = {**PHASES, 'Total': (0, 100)}
 COLORS = {'USPFS': '#1f77b4', 'SSPFS': '#ff7f0e'}
 
+# Per-flight metrics, in the row order returned by process_log
+METRICS = (
+    'x_actual', 'x_setpoint',
+    'y_actual', 'y_setpoint',
+    'z_actual', 'z_setpoint',
+    'cpu', 'ram',
+    'energy_wh',  # Energy consumed in Watt-hours
+    'distance_m',  # Cumulative path length flown
+)
+# Opt-in (--logger) metrics, appended after METRICS. They need the timestamp
+# and offset of every message in the log, so asking for them gives up the
+# topic projection: every topic is indexed, and with pyulog the log is
+# scanned a second time by ulogReader.
+LOGGER_METRICS = (
+    'log_rate',  # Logged kB/s over a LOG_RATE_WINDOW
+    'dropouts', 'dropout_ms'  # Cumulative logger dropouts and dropped time
+)
+
+# Tracking error: an actual position is matched with the latest setpoint at
+# or before it, if that setpoint is at most MAX_SETPOINT_AGE_S old. A phase
+# has settled once the 3-D error stays within SETTLING_BAND_M.
+MAX_SETPOINT_AGE_S = 0.5
+SETTLING_BAND_M = 0.5
+
+# Logging throughput is averaged over this much mission progress (%)
+LOG_RATE_WINDOW = 2.0
+
 # Statistical parameters
 CONFIDENCE_LEVEL = 0.95
 ALPHA = 0.05
 
-def process_group(log_files, group_name):
-    """Process a group of logs and return normalized data"""
-    common_time = np.linspace(0, 100, N_POINTS)
-    data = {
-        'x_actual': [], 'x_setpoint': [],
-        'y_actual': [], 'y_setpoint': [],
-        'z_actual': [], 'z_setpoint': [],
-        'cpu': [], 'ram': [],
-        'energy_wh': []  # Energy consumed in Watt-hours
-    }
-    
-    print(f"\nProcessing {group_name} logs:")
-    for i, log_file in enumerate(log_files):
-        try:
-            print(f"  [{i+1}/{len(log_files)}] Processing {os.path.basename(log_file)}")
-            ulog = pyulog.ULog(log_file)
-            
-            # Get position data
-            pos_data = ulog.get_dataset('vehicle_local_position').data
-            t_raw = (pos_data['timestamp'] - pos_data['timestamp'][0]) / 1e6
-            if len(t_raw) == 0:
-                print("    - Skipping: No position data")
-                continue
-                
-            t_norm = t_raw / t_raw[-1] * 100
-            
-            # Get setpoints
-            try:
-                sp_data = ulog.get_dataset('vehicle_local_position_setpoint').data
-                t_sp = (sp_data['timestamp'] - pos_data['timestamp'][0]) / 1e6
-                t_sp_norm = t_sp / t_raw[-1] * 100
-            except:
-                sp_data = None
-                print("    - Warning: No setpoint data")
-                
-            # Get CPU/RAM data
-            try:
-                cpu_data = ulog.get_dataset('cpuload').data
-                t_cpu = (cpu_data['timestamp'] - pos_data['timestamp'][0]) / 1e6
-                t_cpu_norm = t_cpu / t_raw[-1] * 100
-            except:
-                cpu_data = None
-                print("    - Warning: No CPU/RAM data")
-            
-            # Energy analysis using battery percentage
-            energy_wh = None
+# ULog topics and fields each metric is computed from. Every metric is also
+# normalised against the vehicle_local_position timestamps.
+METRIC_SOURCES = {
+    'x_actual': {'vehicle_local_position': ('timestamp', 'x')},
+    'y_actual': {'vehicle_local_position': ('timestamp', 'y')},
+    'z_actual': {'vehicle_local_position': ('timestamp', 'z')},
+    'x_setpoint': {'vehicle_local_position_setpoint': ('timestamp', 'x')},
+    'y_setpoint': {'vehicle_local_position_setpoint': ('timestamp', 'y')},
+    'z_setpoint': {'vehicle_local_position_setpoint': ('timestamp', 'z')},
+    'cpu': {'cpuload': ('timestamp', 'load')},
+    'ram': {'cpuload': ('timestamp', 'ram_usage')},
+    'energy_wh': {'battery_status': ('timestamp', 'remaining', 'voltage_v', 'current_a')},
+    'distance_m': {'vehicle_local_position': ('timestamp', 'x', 'y', 'z')},
+    'log_rate': {'logger_writes': ('timestamp', 'offset')},
+    'dropouts': {'logger_dropouts': ('timestamp', 'duration')},
+    'dropout_ms': {'logger_dropouts': ('timestamp', 'duration')},
+}
+
+# Pseudo-topics describing the log file itself rather than a uORB topic:
+# the timestamp and file offset of every data message, and the logger
+# dropouts. pyulog does not expose message offsets, so these always come
+# from ulogReader, whichever reader decodes the real topics.
+LOGGER_TOPICS = {
+    'logger_writes': ('offset', 'timestamp'),
+    'logger_dropouts': ('duration', 'timestamp'),
+}
+
+# How each topic is resampled onto the common time base: (mode, extrapolation).
+# 'hold' extrapolation repeats the first/last sample instead of extending the
+# end segments, which made sparse topics such as cpuload drift past the end.
+RESAMPLE_MODES = ('linear', 'hold', 'nearest')
+EXTRAPOLATION_POLICIES = ('nan', 'hold', 'linear')
+RESAMPLING = {
+    'vehicle_local_position': ('linear', 'hold'),
+    'vehicle_local_position_setpoint': ('linear', 'hold'),
+    'cpuload': ('linear', 'hold'),
+    'battery_status': ('linear', 'hold'),
+}
+
+# ULog decoders: pyulog, or the memory-mapped reader in ulogReader.py, which
+# yields identical arrays without building per-message Python objects
+READERS = ('pyulog', 'mmap')
+
+def required_topics(metrics):
+    """Return {topic: fields} needed to compute the given metrics"""
+    topics = {'vehicle_local_position': {'timestamp'}}
+    for metric in metrics:
+        for topic, fields in METRIC_SOURCES[metric].items():
+            topics.setdefault(topic, set()).update(fields)
+    return {topic: tuple(sorted(fields)) for topic, fields in topics.items()}
+
+def logger_stats(ulog):
+    """The LOGGER_TOPICS pseudo-topics of an unfiltered MappedULog, as {topic: {field: array}}"""
+    timeline = ulog.timeline()
+    dropout_times, durations = ulog.dropout_timestamps(timeline)
+    return {'logger_writes': {'timestamp': timeline[0], 'offset': timeline[1]},
+            'logger_dropouts': {'timestamp': dropout_times, 'duration': durations}}
+
+def load_topics(log_file, topics, reader='pyulog'):
+    """Decode only the requested topics/fields of a log.
+
+    Returns {topic: {field: array}} for the first instance of each topic
+    present in the log; messages of any other topic are skipped by the
+    parser instead of being decoded. LOGGER_TOPICS are always present: the
+    mmap reader takes them from the same pass, which then indexes every
+    topic, while pyulog needs an extra ulogReader pass for the offsets.
+    """
+    logger = [topic for topic in topics if topic in LOGGER_TOPICS]
+    if reader == 'mmap':
+        with MappedULog(log_file, topic_names=None if logger else topics) as ulog:
+            data = {name: ulog.fields(name, field_names=topics[name])
+                    for (name, multi_id), topic in ulog.topics.items()
+                    if multi_id == 0 and name in topics and len(topic)}
+            if logger:
+                stats = logger_stats(ulog)
+                data.update({topic: stats[topic] for topic in logger})
+        return data
+    if reader != 'pyulog':
+        raise ValueError(f"Unknown ULog reader: {reader}")
+    ulog = pyulog.ULog(log_file, message_name_filter_list=[topic for topic in topics
+                                                           if topic not in LOGGER_TOPICS])
+    data = {}
+    for dataset in ulog.data_list:
+        if dataset.multi_id != 0 or dataset.name not in topics:
+            continue
+        data[dataset.name] = {field: dataset.data[field]
+                              for field in topics[dataset.name]
+                              if field in dataset.data}
+    if logger:
+        with MappedULog(log_file) as ulog:
+            stats = logger_stats(ulog)
+        data.update({topic: stats[topic] for topic in logger})
+    return data
+
+def integrate_energy(t, voltage, current):
+    """Cumulative energy (Wh) drawn from a battery, by the trapezoid rule.
+
+    voltage * current is integrated over t (s). Samples without a valid
+    current are left out (PX4 reports -1 when current is not measured).
+    Returns (t, energy) of the valid samples, or None if the log has no
+    current measurement at all.
+    """
+    valid = np.isfinite(voltage) & np.isfinite(current) & (current >= 0)
+    if np.count_nonzero(valid) < 2 or not np.any(current[valid] > 0):
+        return None
+    t = t[valid]
+    power = voltage[valid].astype(float) * current[valid]
+    steps = np.diff(t) * (power[1:] + power[:-1]) / 2
+    return t, np.concatenate(([0], np.cumsum(steps))) / 3600
+
+def path_length(x, y, z):
+    """Cumulative 3-D distance (m) along a sampled trajectory"""
+    steps = np.sqrt(np.diff(x)**2 + np.diff(y)**2 + np.diff(z)**2)
+    return np.concatenate(([0], np.cumsum(np.nan_to_num(steps))))
+
+def resample(t, values, common_time, mode='linear', extrapolate='hold'):
+    """Resample a block of channels sharing timestamps onto common_time.
+
+    t holds the (ascending) sample times and values is an (n,) or (n, k)
+    array; all k channels are resampled in one pass from a single
+    searchsorted. mode is 'linear', 'hold' (last sample at or before each
+    point) or 'nearest'. extrapolate sets what happens outside [t[0], t[-1]]:
+    'nan' leaves gaps, 'hold' repeats the first/last sample and 'linear'
+    extends the end segments (linear mode only).
+    """
+    if mode not in RESAMPLE_MODES:
+        raise ValueError(f"Unknown resampling mode: {mode}")
+    if extrapolate not in EXTRAPOLATION_POLICIES:
+        raise ValueError(f"Unknown extrapolation policy: {extrapolate}")
+    if extrapolate == 'linear' and mode != 'linear':
+        raise ValueError("Linear extrapolation needs linear resampling")
+
+    t = np.asarray(t, dtype=float)
+    values = np.asarray(values, dtype=float)
+    squeeze = values.ndim == 1
+    if squeeze:
+        values = values[:, None]
+    if np.any(np.diff(t) < 0):
+        order = np.argsort(t, kind='stable')
+        t, values = t[order], values[order]
+
+    n = len(t)
+    x = np.asarray(common_time, dtype=float)
+    # Index of the last sample at or before each point
+    right = np.searchsorted(t, x, side='right')
+    lo = np.clip(right - 1, 0, max(n - 2, 0))
+    hi = np.minimum(lo + 1, n - 1)
+    if mode == 'linear':
+        dt = t[hi] - t[lo]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            w = np.where(dt > 0, (x - t[lo]) / dt, 0.0)
+        out = values[lo] + w[:, None] * (values[hi] - values[lo])
+    elif mode == 'hold':
+        out = values[np.clip(right - 1, 0, n - 1)]
+    else:
+        nearest = np.where(np.abs(x - t[lo]) <= np.abs(t[hi] - x), lo, hi)
+        out = values[nearest]
+
+    before = x < t[0]
+    after = x > t[-1]
+    if extrapolate == 'nan':
+        out[before | after] = np.nan
+    elif extrapolate == 'hold':
+        out[before] = values[0]
+        out[after] = values[-1]
+    return out[:, 0] if squeeze else out
+
+def process_log(log_file, common_time, metrics=METRICS, cache=None, resampling=RESAMPLING,
+                reader='pyulog'):
+    """Decode a single log and resample it onto common_time.
+
+    Only the topics needed for metrics are decoded with the given reader, or
+    read back from cache when one is given; resampling maps each topic to its
+    (mode, extrapolation) policy. Returns (result, messages): result is
+    None if the log could not be processed, else (rows, summary), where rows
+    is a (len(metrics), N_POINTS) array and summary the flight's per-phase
+    {column: value} scalars (phase_energy, tracking_error); messages holds
+    the log lines so the caller can print them in order.
+    """
+    messages = []
+    rows = np.full((len(metrics), len(common_time)), np.nan)
+    row = {metric: rows[i] for i, metric in enumerate(metrics)}
+    try:
+        if cache is not None:
+            topics = cache.load(log_file, required_topics(metrics),
+                                partial(load_topics, reader=reader))
+        else:
+            topics = load_topics(log_file, required_topics(metrics), reader)
+
+        # Get position data
+        pos_data = topics.get('vehicle_local_position')
+        if pos_data is None or len(pos_data['timestamp']) == 0:
+            messages.append("    - Skipping: No position data")
+            return None, messages
+        t_raw = (pos_data['timestamp'] - pos_data['timestamp'][0]) / 1e6
+
+        t_norm = t_raw / t_raw[-1] * 100
+
+        # Get setpoints
+        sp_data = topics.get('vehicle_local_position_setpoint')
+        if sp_data is not None:
+            t_sp = (sp_data['timestamp'] - pos_data['timestamp'][0]) / 1e6
+            t_sp_norm = t_sp / t_raw[-1] * 100
+        elif any(m.endswith('_setpoint') for m in metrics):
+            messages.append("    - Warning: No setpoint data")
+
+        # Get CPU/RAM data
+        cpu_data = topics.get('cpuload')
+        if cpu_data is not None:
+            t_cpu = (cpu_data['timestamp'] - pos_data['timestamp'][0]) / 1e6
+            t_cpu_norm = t_cpu / t_raw[-1] * 100
+        elif 'cpu' in metrics or 'ram' in metrics:
+            messages.append("    - Warning: No CPU/RAM data")
+
+        # Energy analysis: integrate battery power at full rate, or fall back
+        # to the battery percentage when the log has no current measurement
+        energy_wh = None
+        energy_source = None
+        battery_data = topics.get('battery_status')
+        if battery_data is None:
+            if 'energy_wh' in metrics:
+                messages.append("    - Warning: No battery data")
+        else:
             try:
-                battery_data = ulog.get_dataset('battery_status').data
-                t_bat = (battery_data['timestamp'] - pos_data['timestamp'][0]) / 1e6
-                t_bat_norm = t_bat / t_raw[-1] * 100
-                
-                if 'remaining' not in battery_data or len(t_bat) < 2:
-                    print("    - Warning: Insufficient battery data")
-                    energy_wh = None
+                # As floats: battery_status may start before the first position sample
+                t_bat = (battery_data['timestamp'].astype(float) - pos_data['timestamp'][0]) / 1e6
+                integrated = None
+                if 'voltage_v' in battery_data and 'current_a' in battery_data:
+                    integrated = integrate_energy(t_bat, battery_data['voltage_v'],
+                                                  battery_data['current_a'])
+
+                if integrated is not None:
+                    t_bat, energy_wh = integrated
+                    energy_source = 'vi'
+                elif 'remaining' not in battery_data or len(t_bat) < 2:
+                    messages.append("    - Warning: Insufficient battery data")
                 else:
                     remaining = battery_data['remaining']
-                    
+
                     # Check if battery percentage actually changes
                     battery_range = np.max(remaining) - np.min(remaining)
                     if battery_range < BATTERY_CHANGE_THRESHOLD:
-                        print("    - Warning: Battery percentage unchanged (delta: {:.3f})".format(battery_range))
-                        energy_wh = None
+                        messages.append("    - Warning: Battery percentage unchanged (delta: {:.3f})".format(battery_range))
                     else:
-                        # Calculate energy consumed
                         energy_wh = (1 - remaining) * TOTAL_ENERGY_WH
-                        
-                        # Validate minimum energy consumption
-                        if energy_wh[-1] < MIN_ENERGY_THRESHOLD:
-                            print(f"    - Warning: Low energy consumption ({energy_wh[-1]:.4f}Wh)")
-                            energy_wh = None
-                        else:
-                            print(f"    - Energy consumed: {energy_wh[-1]:.2f} Wh")
+                        energy_source = 'remaining'
+
+                if energy_wh is not None:
+                    if not energy_wh[-1] >= MIN_ENERGY_THRESHOLD:
+                        messages.append(f"    - Warning: Low energy consumption ({energy_wh[-1]:.4f}Wh)")
+                        energy_wh = None
+                        energy_source = None
+                    else:
+                        t_bat_norm = t_bat / t_raw[-1] * 100
+                        label = 'V*I' if energy_source == 'vi' else 'battery %'
+                        messages.append(f"    - Energy consumed: {energy_wh[-1]:.2f} Wh ({label})")
             except Exception as e:
-                print(f"    - Battery processing error: {str(e)}")
+                messages.append(f"    - Battery processing error: {str(e)}")
                 energy_wh = None
-            
-            # Interpolate to common time base
-            for axis in ['x', 'y', 'z']:
-                # Actual position
-                if len(t_norm) > 1:
-                    f_actual = interp1d(t_norm, pos_data[axis], bounds_error=False, fill_value="extrapolate")
-                    data[f'{axis}_actual'].append(f_actual(common_time))
-                else:
-                    data[f'{axis}_actual'].append(np.full(N_POINTS, np.nan))
-                
-                # Setpoints
-                if sp_data is not None and len(t_sp) > 1:
-                    f_setpoint = interp1d(t_sp_norm, sp_data[axis], bounds_error=False, fill_value="extrapolate")
-                    data[f'{axis}_setpoint'].append(f_setpoint(common_time))
-                else:
-                    data[f'{axis}_setpoint'].append(np.full(N_POINTS, np.nan))
-            
-            # CPU and RAM
-            if cpu_data is not None and len(t_cpu) > 1:
-                f_cpu = interp1d(t_cpu_norm, cpu_data['load'] * 100, bounds_error=False, fill_value="extrapolate")
-                f_ram = interp1d(t_cpu_norm, cpu_data['ram_usage'], bounds_error=False, fill_value="extrapolate")
-                data['cpu'].append(f_cpu(common_time))
-                data['ram'].append(f_ram(common_time))
+                energy_source = None
+
+        # Logger throughput: bytes logged up to each message, as a function
+        # of its timestamp, differenced over a window of mission progress
+        writes = topics.get('logger_writes')
+        if writes is not None and len(writes['timestamp']) > 1 and 'log_rate' in row:
+            order = np.argsort(writes['timestamp'], kind='stable')
+            t_log = (writes['timestamp'][order].astype(float) - pos_data['timestamp'][0]) / 1e6
+            logged = np.maximum.accumulate(writes['offset'][order])
+            lo = np.maximum(common_time - LOG_RATE_WINDOW / 2, 0)
+            hi = np.minimum(common_time + LOG_RATE_WINDOW / 2, 100)
+            t_lo, t_hi = lo / 100 * t_raw[-1], hi / 100 * t_raw[-1]
+            row['log_rate'][:] = ((np.interp(t_hi, t_log, logged) - np.interp(t_lo, t_log, logged))
+                                  / (t_hi - t_lo) / 1024)
+
+        # Logger dropouts: cumulative count and duration up to each point
+        dropouts = topics.get('logger_dropouts')
+        if dropouts is not None:
+            t_drop = (dropouts['timestamp'].astype(float) - pos_data['timestamp'][0]) / 1e6
+            order = np.argsort(t_drop, kind='stable')
+            t_drop_norm = t_drop[order] / t_raw[-1] * 100
+            count = np.searchsorted(t_drop_norm, common_time, side='right')
+            if 'dropouts' in row:
+                row['dropouts'][:] = count
+            if 'dropout_ms' in row:
+                dropped = np.concatenate(([0], np.cumsum(dropouts['duration'][order], dtype=float)))
+                row['dropout_ms'][:] = dropped[count]
+            if len(t_drop):
+                messages.append(f"    - Logger dropouts: {len(t_drop)} "
+                                f"({int(dropouts['duration'].sum())} ms)")
+
+        # Resample every topic onto the common time base in one call each
+        def resample_topic(t, columns, topic):
+            wanted = [(name, values) for name, values in columns if name in row]
+            if not wanted or len(t) < 2:
+                return
+            mode, extrapolate = resampling[topic]
+            block = np.column_stack([values for _, values in wanted])
+            out = resample(t, block, common_time, mode, extrapolate)
+            for k, (name, _) in enumerate(wanted):
+                row[name][:] = out[:, k]
+
+        position = [(f'{axis}_actual', pos_data[axis]) for axis in 'xyz']
+        distance_m = path_length(*(pos_data[axis] for axis in 'xyz'))
+        if 'distance_m' in row:
+            position.append(('distance_m', distance_m))
+        resample_topic(t_norm, position, 'vehicle_local_position')
+        if sp_data is not None:
+            resample_topic(t_sp_norm, [(f'{axis}_setpoint', sp_data[axis]) for axis in 'xyz'],
+                           'vehicle_local_position_setpoint')
+        if cpu_data is not None:
+            resample_topic(t_cpu_norm, [('cpu', cpu_data['load'] * 100),
+                                        ('ram', cpu_data['ram_usage'])], 'cpuload')
+        # Energy: only resampled if we have valid data
+        if energy_wh is not None:
+            resample_topic(t_bat_norm, [('energy_wh', energy_wh)], 'battery_status')
+
+        # Per-flight scalars, per phase, from the full-rate series. Only
+        # energy integrated from V*I is split: the battery percentage lags
+        # the load and is not monotonic, so its share of a phase is not the
+        # energy the phase consumed
+        summary = {}
+        if 'energy_wh' in row and 'distance_m' in row:
+            summary['energy_source'] = energy_source
+            if energy_source == 'vi':
+                summary.update(phase_energy(t_norm, distance_m, t_bat_norm, energy_wh))
             else:
-                data['cpu'].append(np.full(N_POINTS, np.nan))
-                data['ram'].append(np.full(N_POINTS, np.nan))
-                
-            # Energy
-            if energy_wh is not None and len(t_bat) > 1:
-                # Only interpolate if we have valid data
-                f_energy = interp1d(t_bat_norm, energy_wh, bounds_error=False, fill_value="extrapolate")
-                data['energy_wh'].append(f_energy(common_time))
+                summary.update(phase_energy(t_norm, distance_m))
+        if sp_data is not None and any(m.endswith('_setpoint') for m in metrics):
+            summary.update(tracking_error(
+                t_raw, np.column_stack([pos_data[axis] for axis in 'xyz']),
+                t_sp, np.column_stack([sp_data[axis] for axis in 'xyz']), t_raw[-1]))
+
+    except Exception as e:
+        messages.append(f"    - Error processing: {str(e)}")
+        return None, messages
+
+    return (rows, summary), messages
+
+class RunningStats:
+    """Per-timepoint running count, mean and sum of squared deviations.
+
+    Flights are folded in one at a time with Welford's update, so means,
+    variances and CIs come out without keeping every flight in memory. NaN
+    samples are skipped, like the nan* reductions used in batch mode.
+    """
+
+    def __init__(self, metrics, n_points):
+        self.metrics = tuple(metrics)
+        shape = (len(self.metrics), n_points)
+        self.flights = 0
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+        self.valid_flights = {metric: 0 for metric in self.metrics}
+
+    def update(self, rows):
+        """Fold one flight's (metrics x timepoints) rows into the accumulators"""
+        valid = ~np.isnan(rows)
+        self.flights += 1
+        for i, metric in enumerate(self.metrics):
+            self.valid_flights[metric] += bool(valid[i].any())
+        self.count += valid
+        delta = np.where(valid, rows - self.mean, 0)
+        self.mean += np.where(valid, delta / np.maximum(self.count, 1), 0)
+        self.m2 += np.where(valid, delta * (rows - self.mean), 0)
+
+    def moments(self, metric):
+        """(count, mean, unbiased variance) per timepoint, like nan_moments"""
+        i = self.metrics.index(metric)
+        n = self.count[i]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(n > 0, self.mean[i], np.nan)
+            var = self.m2[i] / (n - 1)
+        return n, mean, var
+
+    def std(self, metric):
+        """Per-timepoint population std (ddof=0), like np.nanstd"""
+        i = self.metrics.index(metric)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(self.m2[i] / self.count[i])
+
+def imap_ordered(func, items, args=(), workers=1):
+    """Yield func(item, *args) for every item, in order.
+
+    With workers > 1 the calls run in a process pool that keeps at most
+    two items per worker in flight, so finished results are not piled up
+    in memory ahead of the consumer. A call that raises, serially or in the
+    pool, yields (None, ["    - Error processing: ..."]) instead, so one bad
+    log does not abort the others. A worker that dies breaks the whole pool
+    and fails every call in flight, so the pool is recreated: the item
+    waited on is rerun alone, and reported as an error only if it kills its
+    worker again or raises, then the other lost calls are resubmitted.
+    """
+    def failed(e):
+        return None, [f"    - Error processing: {str(e)}"]
+
+    if workers <= 1 or len(items) <= 1:
+        for item in items:
+            try:
+                result = func(item, *args)
+            except Exception as e:
+                result = failed(e)
+            yield result
+        return
+
+    def start():
+        return ProcessPoolExecutor(max_workers=min(workers, len(items)))
+
+    def submit(item):
+        try:
+            return item, pool.submit(func, item, *args)
+        except RuntimeError as e:
+            # The pool broke since the last result: recovered when this item is waited on
+            future = Future()
+            future.set_exception(e)
+            return item, future
+
+    def lost(future):
+        return future.cancelled() or isinstance(future.exception(), BrokenProcessPool)
+
+    pool = start()
+    try:
+        pending = deque(submit(item) for item in items[:2 * workers])
+        queued = iter(items[2 * workers:])
+        while pending:
+            item, future = pending.popleft()
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                pool.shutdown(cancel_futures=True)
+                pool = start()
+                try:
+                    result = pool.submit(func, item, *args).result()
+                except BrokenProcessPool as e:
+                    pool.shutdown(cancel_futures=True)
+                    pool = start()
+                    result = failed(e)
+                except Exception as e:
+                    result = failed(e)
+                pending = deque(submit(other) if lost(other_future) else (other, other_future)
+                                for other, other_future in pending)
+            except Exception as e:
+                result = failed(e)
+            for item in islice(queued, 1):
+                pending.append(submit(item))
+            yield result
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+def iter_processed(log_files, common_time, workers=1, metrics=METRICS, cache=None,
+                   resampling=RESAMPLING, reader='pyulog'):
+    """Yield process_log results for log_files, in order (see imap_ordered)"""
+    return imap_ordered(process_log, log_files,
+                        (common_time, metrics, cache, resampling, reader), workers)
+
+def phase_energy(t_distance, distance_m, t_energy=None, energy_wh=None):
+    """Energy, distance and energy per metre of one flight in every phase.
+
+    distance_m and energy_wh are the flight's cumulative series at full
+    rate, sampled at t_distance and t_energy (mission progress, %); each
+    PHASE_SPANS span is the difference of their values at its ends,
+    interpolated between the samples around them. Without energy_wh the
+    energy columns are NaN. Returns {column: value}.
+    """
+    edges = np.array(list(PHASE_SPANS.values()), dtype=float).ravel()
+
+    def spans(t, values):
+        at_edges = resample(t, values, edges).reshape(len(PHASE_SPANS), 2)
+        return at_edges[:, 1] - at_edges[:, 0]
+
+    distance = spans(t_distance, distance_m)
+    if energy_wh is None:
+        energy = np.full(len(PHASE_SPANS), np.nan)
+    else:
+        energy = spans(t_energy, energy_wh)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        per_metre = np.where(distance > 0, energy / distance, np.nan)
+    result = {}
+    for i, phase in enumerate(PHASE_SPANS):
+        result[f'{phase}_energy_wh'] = energy[i]
+        result[f'{phase}_distance_m'] = distance[i]
+        result[f'{phase}_wh_per_m'] = per_metre[i]
+    return result
+
+def tracking_error(t, actual, t_sp, setpoint, duration):
+    """Per-phase tracking error of one flight, matched by real timestamp.
+
+    t/actual and t_sp/setpoint are the position and setpoint samples (s,
+    (n, 3) arrays). Every actual sample is paired with the latest setpoint
+    at or before it through one searchsorted (an as-of join); pairs whose
+    setpoint is older than MAX_SETPOINT_AGE_S or NaN are left out. For each
+    PHASE_SPANS span (by share of duration) returns the per-axis RMSE and
+    max deviation, and the settling time: seconds from the span's start
+    until the 3-D error stays within SETTLING_BAND_M (NaN if it never
+    does). Returns {column: value}.
+    """
+    order = np.argsort(t_sp, kind='stable')
+    t_sp, setpoint = t_sp[order], setpoint[order]
+    latest = np.searchsorted(t_sp, t, side='right') - 1
+    matched = latest >= 0
+    latest = np.maximum(latest, 0)
+    error = actual - setpoint[latest]
+    matched &= (t - t_sp[latest] <= MAX_SETPOINT_AGE_S) & ~np.isnan(error).any(axis=1)
+    t, error = t[matched], error[matched]
+    outside = np.sqrt(np.sum(error**2, axis=1)) > SETTLING_BAND_M
+    progress = t / duration * 100
+
+    result = {}
+    for phase, (start, end) in PHASE_SPANS.items():
+        in_phase = (progress >= start) & (progress <= end)
+        e = error[in_phase]
+        with np.errstate(invalid='ignore'):
+            rmse = np.sqrt(np.mean(e**2, axis=0)) if len(e) else np.full(3, np.nan)
+        max_dev = np.max(np.abs(e), axis=0) if len(e) else np.full(3, np.nan)
+        for k, axis in enumerate('xyz'):
+            result[f'{phase}_{axis}_rmse'] = rmse[k]
+            result[f'{phase}_{axis}_max'] = max_dev[k]
+        # Settled at the first sample after the last one outside the band
+        t_phase = t[in_phase]
+        last_out = np.flatnonzero(outside[in_phase])
+        if len(t_phase) == 0 or (len(last_out) and last_out[-1] == len(t_phase) - 1):
+            settling = np.nan
+        elif len(last_out) == 0:
+            settling = 0.0
+        else:
+            settling = t_phase[last_out[-1] + 1] - start / 100 * duration
+        result[f'{phase}_settling_s'] = settling
+    return result
+
+def compare_flights(unsupervised_flights, supervised_flights, correction=None):
+    """Group means with CIs and Welch's t-test of every per-flight summary column.
+
+    Only columns both groups have are compared. Flights whose energy is not
+    integrated from V*I have NaN phase energies and are left out of those
+    tests like any other missing value; columns with no value in either
+    group are dropped. Columns with the same value in every flight (e.g. a
+    settling time that is always 0) are not tested and get a NaN p-value.
+    """
+    columns = [c for c in unsupervised_flights.columns.intersection(supervised_flights.columns)
+               if c not in ('flight', 'energy_source')]
+    a = unsupervised_flights[columns].to_numpy(dtype=float)
+    b = supervised_flights[columns].to_numpy(dtype=float)
+    present = ~(np.all(np.isnan(a), axis=0) & np.all(np.isnan(b), axis=0))
+    columns = [c for c, keep in zip(columns, present) if keep]
+    a, b = a[:, present], b[:, present]
+    both = np.vstack((a, b))
+    constant = np.nanmin(both, axis=0) == np.nanmax(both, axis=0)
+    test = welch_ttest(a, b)
+    test['p_value'] = np.where(constant, np.nan, test['p_value'])
+    summary = pd.DataFrame({'quantity': columns})
+    for group, values in (('USPFS', a), ('SSPFS', b)):
+        n = np.sum(~np.isnan(values), axis=0)
+        with warnings.catch_warnings():
+            # Columns without values in this group (no V*I energy) stay NaN
+            warnings.simplefilter('ignore', RuntimeWarning)
+            summary[f'{group}_mean'] = np.nanmean(values, axis=0)
+            summary[f'{group}_ci'] = confidence_interval(np.nanstd(values, axis=0), n)
+    summary['mean_diff'] = test['mean_diff']
+    summary['p_value'] = test['p_value']
+    p_value = test['p_value']
+    if correction:
+        p_value = adjust_pvalues(p_value, correction)
+        summary['p_adjusted'] = p_value
+    with np.errstate(invalid='ignore'):
+        summary['significant'] = p_value < ALPHA
+    return summary
+
+def process_group(log_files, group_name, workers=1, metrics=METRICS, cache=None,
+                  resampling=RESAMPLING, stream=False, reader='pyulog'):
+    """Process a group of logs and return normalized data.
+
+    With workers > 1 the logs are decoded in a process pool; results are
+    collected in submission order, so the output matches the serial path.
+    With stream=True every flight is folded into a RunningStats as soon as
+    it is decoded and that accumulator is returned instead of the
+    per-flight arrays, keeping memory flat in the number of logs.
+    Returns (common_time, data, flights): flights is the DataFrame of the
+    per-flight summaries (see process_log).
+    """
+    common_time = np.linspace(0, 100, N_POINTS)
+    if stream:
+        data = RunningStats(metrics, N_POINTS)
+    else:
+        data = {metric: [] for metric in metrics}
+    flights = []
+
+    print(f"\nProcessing {group_name} logs:")
+    results = iter_processed(log_files, common_time, workers, metrics, cache, resampling,
+                             reader)
+    try:
+        for i, (log_file, (result, messages)) in enumerate(zip(log_files, results)):
+            print(f"  [{i+1}/{len(log_files)}] Processing {os.path.basename(log_file)}")
+            for message in messages:
+                print(message)
+            if result is None:
+                continue
+            rows, summary = result
+            flights.append({'flight': os.path.basename(log_file), **summary})
+            if stream:
+                data.update(rows)
             else:
-                data['energy_wh'].append(np.full(N_POINTS, np.nan))
-            
-        except Exception as e:
-            print(f"    - Error processing: {str(e)}")
-    
+                for metric, values in zip(metrics, rows):
+                    data[metric].append(values)
+    finally:
+        results.close()
+        if cache is not None:
+            cache.evict()
+
     # Check data availability
-    valid_energy_logs = sum(1 for e in data['energy_wh'] if not np.all(np.isnan(e)))
-    print(f"  Valid energy data in {valid_energy_logs}/{len(log_files)} logs")
-    
-    return common_time, data
+    if 'energy_wh' in metrics:
+        if stream:
+            valid_energy_logs = data.valid_flights['energy_wh']
+        else:
+            valid_energy_logs = sum(1 for e in data['energy_wh'] if not np.all(np.isnan(e)))
+        sources = pd.Series([flight.get('energy_source') for flight in flights]).value_counts()
+        print(f"  Valid energy data in {valid_energy_logs}/{len(log_files)} logs"
+              + "".join(f", {count} from {source}" for source, count in sources.items()))
+
+    return common_time, data, pd.DataFrame(flights)
+
+@lru_cache(maxsize=None)
+def t_critical(dof):
+    """Two-sided critical t value at CONFIDENCE_LEVEL (cached per dof)"""
+    return stats.t.ppf(1 - (1 - CONFIDENCE_LEVEL)/2, dof)
+
+def confidence_interval(std, n):
+    """Half-width of the t-based CI for per-timepoint std and sample counts.
+
+    t_critical is evaluated once per distinct sample count; timepoints with
+    fewer than two samples get NaN.
+    """
+    counts, inverse = np.unique(n, return_inverse=True)
+    t_values = np.array([t_critical(int(c) - 1) if c > 1 else np.nan for c in counts])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return t_values[inverse.reshape(np.shape(n))] * std / np.sqrt(n)
 
 def calculate_statistics(data):
-    """Calculate mean and confidence intervals"""
-    results = {}
-    for key, values in data.items():
-        arr = np.array(values)
-        mean = np.nanmean(arr, axis=0)
-        std = np.nanstd(arr, axis=0)
-        n = np.sum(~np.isnan(arr), axis=0)
-        
-        # Calculate 95% confidence intervals
-        ci = np.zeros_like(mean)
-        for i in range(len(mean)):
-            if n[i] > 1:
-                # Use t-distribution for CI
-                t_value = stats.t.ppf(1 - (1 - CONFIDENCE_LEVEL)/2, n[i]-1)
-                ci[i] = t_value * std[i] / np.sqrt(n[i])
-            else:
-                ci[i] = np.nan
-                
-        results[key] = {'mean': mean, 'ci': ci}
-    
-    return results
+    """Calculate mean and confidence intervals.
+
+    All metrics are stacked into one (metrics x flights x timepoints) array
+    and reduced in a single vectorised pass. data may also be the
+    RunningStats of a streamed group.
+    """
+    if isinstance(data, RunningStats):
+        results = {}
+        for metric in data.metrics:
+            n, mean, _ = data.moments(metric)
+            std = data.std(metric)
+            results[metric] = {'mean': mean, 'std': std, 'n': n,
+                               'ci': confidence_interval(std, n)}
+        return results
 
-def plot_comparison(common_time, unsupervised_stats, supervised_stats, significance_results):
-    """Create comparison plots for position tracking, resources, and energy"""
-    # Create figure for position tracking
+    keys = list(data)
+    arr = np.array([data[key] for key in keys], dtype=float)
+    with warnings.catch_warnings():
+        # Timepoints no flight has data for (e.g. before the first battery
+        # sample) stay NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean = np.nanmean(arr, axis=1)
+        std = np.nanstd(arr, axis=1)
+    n = np.sum(~np.isnan(arr), axis=1)
+
+    # Calculate 95% confidence intervals
+    ci = confidence_interval(std, n)
+
+    return {key: {'mean': mean[i], 'std': std[i], 'n': n[i], 'ci': ci[i]}
+            for i, key in enumerate(keys)}
+
+def plot_position(common_time, unsupervised_stats, supervised_stats):
+    """Position tracking comparison, one panel per axis"""
     fig_pos, axs_pos = plt.subplots(3, 1, figsize=(14, 12))
     axes = ['x', 'y', 'z']
     
@@ -189,25 +754,25 @@ def plot_comparison(common_time, unsupervised_stats, supervised_stats, significa
             ax.set_xlabel('Mission Progress [%]')
         
         # USPFS actual position
-        ax.plot(common_time, unsupervised_stats[f'{axis}_actual']['mean'], 
+        plot_lod(ax, common_time, unsupervised_stats[f'{axis}_actual']['mean'], 
                 color=COLORS['USPFS'], label='USPFS Actual')
-        ax.fill_between(common_time, 
+        fill_between_lod(ax, common_time, 
                        unsupervised_stats[f'{axis}_actual']['mean'] - unsupervised_stats[f'{axis}_actual']['ci'],
                        unsupervised_stats[f'{axis}_actual']['mean'] + unsupervised_stats[f'{axis}_actual']['ci'],
                        color=COLORS['USPFS'], alpha=0.2)
         
         # SSPFS actual position
-        ax.plot(common_time, supervised_stats[f'{axis}_actual']['mean'], 
+        plot_lod(ax, common_time, supervised_stats[f'{axis}_actual']['mean'], 
                 color=COLORS['SSPFS'], label='SSPFS Actual')
-        ax.fill_between(common_time, 
+        fill_between_lod(ax, common_time, 
                        supervised_stats[f'{axis}_actual']['mean'] - supervised_stats[f'{axis}_actual']['ci'],
                        supervised_stats[f'{axis}_actual']['mean'] + supervised_stats[f'{axis}_actual']['ci'],
                        color=COLORS['SSPFS'], alpha=0.2)
         
         # Setpoints
-        ax.plot(common_time, unsupervised_stats[f'{axis}_setpoint']['mean'], 
+        plot_lod(ax, common_time, unsupervised_stats[f'{axis}_setpoint']['mean'], 
                 color=COLORS['USPFS'], linestyle='--', alpha=0.7, label='USPFS Setpoint')
-        ax.plot(common_time, supervised_stats[f'{axis}_setpoint']['mean'], 
+        plot_lod(ax, common_time, supervised_stats[f'{axis}_setpoint']['mean'], 
                 color=COLORS['SSPFS'], linestyle='--', alpha=0.7, label='SSPFS Setpoint')
         
         # Add phase markers
@@ -221,24 +786,26 @@ def plot_comparison(common_time, unsupervised_stats, supervised_stats, significa
     
     axs_pos[0].set_title('Position Tracking Comparison')
     axs_pos[-1].set_xlabel('Mission Progress [%]')
-    
-    # Create figure for system resources (CPU and RAM)
+    return fig_pos
+
+def plot_resources(common_time, unsupervised_stats, supervised_stats):
+    """System resource usage (CPU and RAM) comparison"""
     fig_res, axs_res = plt.subplots(2, 1, figsize=(14, 8))
     
     # CPU plot
     ax = axs_res[0]
     ax.set_xlim(0, 100)
     ax.tick_params(axis='x', which='both', bottom=False, labelbottom=False)  # Hide x-ticks
-    ax.plot(common_time, unsupervised_stats['cpu']['mean'], 
+    plot_lod(ax, common_time, unsupervised_stats['cpu']['mean'], 
             color=COLORS['USPFS'], label='USPFS CPU')
-    ax.fill_between(common_time, 
+    fill_between_lod(ax, common_time, 
                    unsupervised_stats['cpu']['mean'] - unsupervised_stats['cpu']['ci'],
                    unsupervised_stats['cpu']['mean'] + unsupervised_stats['cpu']['ci'],
                    color=COLORS['USPFS'], alpha=0.2)
     
-    ax.plot(common_time, supervised_stats['cpu']['mean'], 
+    plot_lod(ax, common_time, supervised_stats['cpu']['mean'], 
             color=COLORS['SSPFS'], label='SSPFS CPU')
-    ax.fill_between(common_time, 
+    fill_between_lod(ax, common_time, 
                    supervised_stats['cpu']['mean'] - supervised_stats['cpu']['ci'],
                    supervised_stats['cpu']['mean'] + supervised_stats['cpu']['ci'],
                    color=COLORS['SSPFS'], alpha=0.2)
@@ -251,16 +818,16 @@ def plot_comparison(common_time, unsupervised_stats, supervised_stats, significa
     # RAM plot
     ax = axs_res[1]
     ax.set_xlim(0, 100)
-    ax.plot(common_time, unsupervised_stats['ram']['mean'], 
+    plot_lod(ax, common_time, unsupervised_stats['ram']['mean'], 
             color=COLORS['USPFS'], label='USPFS RAM')
-    ax.fill_between(common_time, 
+    fill_between_lod(ax, common_time, 
                    unsupervised_stats['ram']['mean'] - unsupervised_stats['ram']['ci'],
                    unsupervised_stats['ram']['mean'] + unsupervised_stats['ram']['ci'],
                    color=COLORS['USPFS'], alpha=0.2)
     
-    ax.plot(common_time, supervised_stats['ram']['mean'], 
+    plot_lod(ax, common_time, supervised_stats['ram']['mean'], 
             color=COLORS['SSPFS'], label='SSPFS RAM')
-    ax.fill_between(common_time, 
+    fill_between_lod(ax, common_time, 
                    supervised_stats['ram']['mean'] - supervised_stats['ram']['ci'],
                    supervised_stats['ram']['mean'] + supervised_stats['ram']['ci'],
                    color=COLORS['SSPFS'], alpha=0.2)
@@ -271,21 +838,23 @@ def plot_comparison(common_time, unsupervised_stats, supervised_stats, significa
     ax.legend()
     
     axs_res[0].set_title('System Resource Usage Comparison')
-    
-    # Create figure for energy consumption only
+    return fig_res
+
+def plot_energy(common_time, unsupervised_stats, supervised_stats):
+    """Energy consumption comparison"""
     fig_energy, ax_energy = plt.subplots(figsize=(14, 5))
     
     # Energy consumption plot
-    ax_energy.plot(common_time, unsupervised_stats['energy_wh']['mean'], 
+    plot_lod(ax_energy, common_time, unsupervised_stats['energy_wh']['mean'], 
             color=COLORS['USPFS'], label='USPFS Energy')
-    ax_energy.fill_between(common_time, 
+    fill_between_lod(ax_energy, common_time, 
                    unsupervised_stats['energy_wh']['mean'] - unsupervised_stats['energy_wh']['ci'],
                    unsupervised_stats['energy_wh']['mean'] + unsupervised_stats['energy_wh']['ci'],
                    color=COLORS['USPFS'], alpha=0.2)
     
-    ax_energy.plot(common_time, supervised_stats['energy_wh']['mean'], 
+    plot_lod(ax_energy, common_time, supervised_stats['energy_wh']['mean'], 
             color=COLORS['SSPFS'], label='SSPFS Energy')
-    ax_energy.fill_between(common_time, 
+    fill_between_lod(ax_energy, common_time, 
                    supervised_stats['energy_wh']['mean'] - supervised_stats['energy_wh']['ci'],
                    supervised_stats['energy_wh']['mean'] + supervised_stats['energy_wh']['ci'],
                    color=COLORS['SSPFS'], alpha=0.2)
@@ -296,55 +865,151 @@ def plot_comparison(common_time, unsupervised_stats, supervised_stats, significa
     ax_energy.grid(True)
     ax_energy.legend()
     ax_energy.set_title('Energy Consumption Comparison')
-    
-    plt.tight_layout()
-    
-    return fig_pos, fig_res, fig_energy
+    fig_energy.tight_layout()
+    return fig_energy
+
+def plot_logger(common_time, unsupervised_stats, supervised_stats):
+    """Plot logging throughput and cumulative logger dropouts"""
+    panels = (
+        ('log_rate', 'Logged [kB/s]'),
+        ('dropouts', 'Dropouts'),
+        ('dropout_ms', 'Dropped [ms]'),
+    )
+    fig, axs = plt.subplots(len(panels), 1, figsize=(14, 10))
+    for ax, (metric, label) in zip(axs, panels):
+        ax.set_xlim(0, 100)
+        for group, group_stats in (('USPFS', unsupervised_stats), ('SSPFS', supervised_stats)):
+            mean = group_stats[metric]['mean']
+            ci = group_stats[metric]['ci']
+            plot_lod(ax, common_time, mean, color=COLORS[group], label=group)
+            fill_between_lod(ax, common_time, mean - ci, mean + ci, color=COLORS[group], alpha=0.2)
+        for phase, (start, end) in PHASES.items():
+            ax.axvspan(start, end, alpha=0.1, color='gray')
+        ax.set_ylabel(label)
+        ax.grid(True)
+    for ax in axs[:-1]:
+        ax.tick_params(axis='x', which='both', bottom=False, labelbottom=False)
+    axs[0].legend()
+    axs[0].set_title('Logger Throughput and Dropouts Comparison')
+    axs[-1].set_xlabel('Mission Progress [%]')
+    fig.tight_layout()
+    return fig
+
+def nan_moments(arr):
+    """Per-column sample count, mean and unbiased variance, ignoring NaNs.
+
+    arr is a (flights x timepoints) matrix. Reductions run along contiguous
+    rows of the transposed matrix, mirroring the 1-D reductions scipy does
+    for a single timepoint.
+    """
+    arr_t = np.ascontiguousarray(np.asarray(arr, dtype=float).T)
+    valid = ~np.isnan(arr_t)
+    n = valid.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(valid, arr_t, 0).sum(axis=1) / n
+        dev = np.where(valid, arr_t - mean[:, None], 0)
+        var = (dev**2).sum(axis=1) / n * (n / (n - 1))
+    return n, mean, var
+
+def metric_moments(data, metric):
+    """(count, mean, unbiased variance) per timepoint of one metric.
+
+    data is either the per-flight arrays of a group or its RunningStats.
+    """
+    if isinstance(data, RunningStats):
+        return data.moments(metric)
+    return nan_moments(data[metric])
+
+def welch_from_moments(n_a, mean_a, var_a, n_b, mean_b, var_b):
+    """Welch's t-test from per-timepoint counts, means and variances.
+
+    Returns a dict of per-timepoint arrays with the mean difference, t
+    statistic, degrees of freedom and two-sided p-value; timepoints where
+    either group has fewer than two samples get NaN.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        vn_a = var_a / n_a
+        vn_b = var_b / n_b
+        df = (vn_a + vn_b)**2 / (vn_a**2 / (n_a - 1) + vn_b**2 / (n_b - 1))
+        # Undefined df means both variances are zero; any finite df will do
+        df = np.where(np.isnan(df), 1., df)
+        t_stat = (mean_a - mean_b) / np.sqrt(vn_a + vn_b)
+    p_value = 2 * special.stdtr(df, -np.abs(t_stat))
+
+    valid = (n_a > 1) & (n_b > 1)
+    return {'mean_diff': np.where(valid, mean_a - mean_b, np.nan),
+            't_stat': np.where(valid, t_stat, np.nan),
+            'df': np.where(valid, df, np.nan),
+            'p_value': np.where(valid, p_value, np.nan)}
+
+def welch_ttest(a, b):
+    """Welch's t-test at every timepoint of two (flights x timepoints) matrices.
 
-def calculate_significance(unsupervised_data, supervised_data):
-    """Calculate statistical significance between groups"""
+    NaN samples are ignored. Returns a dict of per-timepoint arrays with the
+    mean difference, t statistic, degrees of freedom and p-value.
+    """
+    return welch_from_moments(*nan_moments(a), *nan_moments(b))
+
+def adjust_pvalues(p_values, method):
+    """Correct p-values for multiple comparisons across timepoints.
+
+    method is 'bh' (Benjamini-Hochberg false discovery rate) or 'holm'
+    (Holm-Bonferroni family-wise error rate). NaN p-values are left out of
+    the family and stay NaN.
+    """
+    p_values = np.asarray(p_values, dtype=float)
+    adjusted = np.full_like(p_values, np.nan)
+    valid = ~np.isnan(p_values)
+    p = p_values[valid]
+    m = len(p)
+    if m == 0:
+        return adjusted
+    order = np.argsort(p)
+    ranked = p[order]
+    rank = np.arange(1, m + 1)
+    if method == 'bh':
+        # Step-up: running minimum from the largest p-value down
+        scaled = np.minimum.accumulate((ranked * m / rank)[::-1])[::-1]
+    elif method == 'holm':
+        # Step-down: running maximum from the smallest p-value up
+        scaled = np.maximum.accumulate(ranked * (m - rank + 1))
+    else:
+        raise ValueError(f"Unknown p-value correction: {method}")
+    out = np.empty(m)
+    out[order] = np.minimum(scaled, 1.0)
+    adjusted[valid] = out
+    return adjusted
+
+def calculate_significance(unsupervised_data, supervised_data, correction=None):
+    """Calculate statistical significance between groups.
+
+    Runs Welch's t-test at every timepoint of each metric in one vectorised
+    pass, from per-flight arrays or streamed RunningStats. With correction
+    ('bh' or 'holm') the p-values are also adjusted across timepoints and
+    the adjusted ones decide significance.
+    """
     results = {}
     
-    # Metrics list (power_w removed)
-    metrics = ['x_actual', 'y_actual', 'z_actual', 'cpu', 'ram', 'energy_wh']
+    # Metrics list (power_w removed); the logger ones only if they were computed
+    metrics = ['x_actual', 'y_actual', 'z_actual', 'cpu', 'ram', 'energy_wh',
+               'log_rate', 'dropouts', 'dropout_ms']
+    available = (unsupervised_data.metrics if isinstance(unsupervised_data, RunningStats)
+                 else unsupervised_data)
     
-    for metric in metrics:
-        # Extract metric data
-        unsup = np.array(unsupervised_data[metric])
-        sup = np.array(supervised_data[metric])
-        
-        # Initialize result storage
+    for metric in (m for m in metrics if m in available):
+        test = welch_from_moments(*metric_moments(unsupervised_data, metric),
+                                  *metric_moments(supervised_data, metric))
         metric_results = {
-            'mean_diff': [],
-            'p_value': [],
-            'significant': []
+            'mean_diff': test['mean_diff'],
+            'p_value': test['p_value'],
         }
-        
-        # Calculate for each time point
-        for t in range(unsup.shape[1]):
-            unsup_vals = unsup[:, t]
-            sup_vals = sup[:, t]
-            
-            # Remove NaN values
-            unsup_vals = unsup_vals[~np.isnan(unsup_vals)]
-            sup_vals = sup_vals[~np.isnan(sup_vals)]
-            
-            if len(unsup_vals) > 1 and len(sup_vals) > 1:
-                # Independent t-test
-                t_stat, p_value = stats.ttest_ind(unsup_vals, sup_vals, 
-                                                 equal_var=False,
-                                                 nan_policy='omit')
-                
-                mean_diff = np.mean(unsup_vals) - np.mean(sup_vals)
-                significant = p_value < ALPHA
-                
-                metric_results['mean_diff'].append(mean_diff)
-                metric_results['p_value'].append(p_value)
-                metric_results['significant'].append(significant)
-            else:
-                metric_results['mean_diff'].append(np.nan)
-                metric_results['p_value'].append(np.nan)
-                metric_results['significant'].append(False)
+        p_value = test['p_value']
+        if correction:
+            p_value = adjust_pvalues(p_value, correction)
+            metric_results['p_adjusted'] = p_value
+        # NaN p-values compare False, i.e. not significant
+        with np.errstate(invalid='ignore'):
+            metric_results['significant'] = p_value < ALPHA
         
         results[metric] = metric_results
     
@@ -355,10 +1020,57 @@ if __name__ == "__main__":
     print("\n" + "="*50)
     print("Starting comparative analysis")
     print("="*50)
-    
+
+    parser = argparse.ArgumentParser(description="Compare USPFS and SSPFS flight logs")
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help="processes used to decode logs (0 = all cores; default: 1)")
+    parser.add_argument('--reader', choices=READERS, default='pyulog',
+                        help="ULog decoder; mmap is faster and lighter on large logs "
+                             "(default: pyulog)")
+    parser.add_argument('--cache-dir', default='.ulog_cache',
+                        help="cache of decoded topics (default: .ulog_cache)")
+    parser.add_argument('--cache-size', type=int, default=1024,
+                        help="cache size cap in MB, LRU evicted (default: 1024)")
+    parser.add_argument('--cache-compress', action='store_true',
+                        help="compress cache entries (disables memory-mapped reads)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="always decode the .ulg files")
+    parser.add_argument('--resample', choices=RESAMPLE_MODES,
+                        help="resampling mode for every topic (default: per-topic RESAMPLING)")
+    parser.add_argument('--extrapolate', choices=EXTRAPOLATION_POLICIES,
+                        help="extrapolation past each topic's first/last sample "
+                             "(default: per-topic RESAMPLING)")
+    parser.add_argument('--stream', action='store_true',
+                        help="fold flights into running per-timepoint statistics as they are "
+                             "decoded (bounded memory) instead of keeping every flight")
+    parser.add_argument('--correction', choices=['bh', 'holm'],
+                        help="correct p-values across timepoints (Benjamini-Hochberg or Holm)")
+    parser.add_argument('--logger', action='store_true',
+                        help="also report logger throughput and dropouts (indexes every "
+                             "message of each log, so decoding is slower)")
+    figures.add_arguments(parser)
+    args = parser.parse_args()
+    plots = figures.from_args(args)
+    workers = args.workers if args.workers > 0 else os.cpu_count()
+    metrics = METRICS + LOGGER_METRICS if args.logger else METRICS
+    resampling = {topic: (args.resample or mode, args.extrapolate or extrapolate)
+                  for topic, (mode, extrapolate) in RESAMPLING.items()}
+    if any(extrapolate == 'linear' and mode != 'linear' for mode, extrapolate in resampling.values()):
+        parser.error("--extrapolate linear needs linear resampling (--resample linear)")
+    cache = None
+    if not args.no_cache:
+        cache = ULogCache(args.cache_dir, args.cache_size << 20, args.cache_compress)
+
+    print(f"Found {len(UNSUPERVISED_LOGS)} unsupervised logs")
+    print(f"Found {len(SUPERVISED_LOGS)} supervised logs")
+
     # Process both groups
-    common_time, unsupervised_data = process_group(UNSUPERVISED_LOGS, "USPFS")
-    _, supervised_data = process_group(SUPERVISED_LOGS, "SSPFS")
+    common_time, unsupervised_data, unsupervised_flights = process_group(UNSUPERVISED_LOGS, "USPFS", workers, metrics, cache,
+                                                   resampling=resampling, stream=args.stream,
+                                                   reader=args.reader)
+    _, supervised_data, supervised_flights = process_group(SUPERVISED_LOGS, "SSPFS", workers, metrics, cache,
+                                     resampling=resampling, stream=args.stream,
+                                     reader=args.reader)
     
     # Calculate statistics
     print("\nCalculating statistics...")
@@ -374,13 +1086,27 @@ if __name__ == "__main__":
           f"Max: {np.nanmax(supervised_stats['energy_wh']['mean']):.2f}Wh, " +
           f"Mean: {np.nanmean(supervised_stats['energy_wh']['mean']):.2f}Wh")
     
+    if args.logger:
+        print("\nLogger statistics:")
+        for group, group_stats in (('USPFS', unsupervised_stats), ('SSPFS', supervised_stats)):
+            print(f"{group} Logger - Rate: {np.nanmean(group_stats['log_rate']['mean']):.2f}kB/s, " +
+                  f"Dropouts: {group_stats['dropouts']['mean'][-1]:.2f}/flight, " +
+                  f"Dropped: {group_stats['dropout_ms']['mean'][-1]:.2f}ms/flight")
+
+    # Per-flight summaries: energy and tracking error per phase
+    flight_summary = compare_flights(unsupervised_flights, supervised_flights, args.correction)
+    print("\nPer-flight summary per phase (mean +/- CI):")
+    if not flight_summary['quantity'].str.endswith('_energy_wh').any():
+        print("  Per-phase energy unavailable: no flight has energy integrated from V*I")
+    for _, r in flight_summary.iterrows():
+        print(f"  {r['quantity']:<20} USPFS {r['USPFS_mean']:9.4f} +/- {r['USPFS_ci']:.4f}  "
+              f"SSPFS {r['SSPFS_mean']:9.4f} +/- {r['SSPFS_ci']:.4f}  "
+              + (f"p={r['p_value']:.3g}" if not np.isnan(r['p_value']) else "p=n/a")
+              + ("  *" if r['significant'] else ""))
+
     # Significance testing
     print("Performing significance testing...")
-    significance_results = calculate_significance(unsupervised_data, supervised_data)
-    
-    # Generate plots
-    print("Generating comparison plots...")
-    fig_pos, fig_res, fig_energy = plot_comparison(common_time, unsupervised_stats, supervised_stats, significance_results)
+    significance_results = calculate_significance(unsupervised_data, supervised_data, args.correction)
     
     # Save results
     print("\nSaving results...")
@@ -390,14 +1116,25 @@ if __name__ == "__main__":
            for metric, stats_dict in significance_results.items()
            for stat, vals in stats_dict.items()}
     })
-    results_df.to_csv('significance_results.csv', index=False)
-    print("Significance results saved to significance_results.csv")
-    
-    # Save plots
-    fig_pos.savefig('position_comparison.png', dpi=300, bbox_inches='tight')
-    fig_res.savefig('resource_comparison.png', dpi=300, bbox_inches='tight')
-    fig_energy.savefig('energy_consumption_comparison.png', dpi=300, bbox_inches='tight')
-    print("Plots saved as position_comparison.png, resource_comparison.png, and energy_consumption_comparison.png")
+    os.makedirs(args.figure_dir, exist_ok=True)
+    significance_csv = os.path.join(args.figure_dir, 'significance_results.csv')
+    results_df.to_csv(significance_csv, index=False)
+    print(f"Significance results saved to {significance_csv}")
+    metrics_csv = os.path.join(args.figure_dir, 'flight_metrics.csv')
+    comparison_csv = os.path.join(args.figure_dir, 'flight_comparison.csv')
+    pd.concat([unsupervised_flights.assign(group='USPFS'), supervised_flights.assign(group='SSPFS')],
+              ignore_index=True).to_csv(metrics_csv, index=False)
+    flight_summary.to_csv(comparison_csv, index=False)
+    print(f"Per-flight summaries saved to {metrics_csv} and {comparison_csv}")
     
-    print("\nAnalysis complete. Showing plots...")
-    plt.show()
+    # Render plots
+    print("\nRendering comparison plots...")
+    comparisons = [('position_comparison', plot_position),
+                   ('resource_comparison', plot_resources),
+                   ('energy_consumption_comparison', plot_energy)]
+    if args.logger:
+        comparisons.append(('logger_comparison', plot_logger))
+    for name, plot in comparisons:
+        plots.add(name, plot, common_time, unsupervised_stats, supervised_stats)
+    plots.render()
+    print("\nAnalysis complete.")
@@ -0,0 +1,324 @@
+#!/usr/bin/python3
+# Control-loop timing and jitter of USPFS vs SSPFS flights
+#
+# For control-critical topics two timing series are taken from the ULog
+# timestamps of every flight:
+#   - interval: time between consecutive logged samples (publication jitter)
+#   - latency:  timestamp - timestamp_sample, i.e. how long the sample took
+#               from the sensor/estimator to being published
+# Each flight gets p50/p99/p99.9/max and a deadline-miss rate per topic, and
+# the per-flight values are compared between groups with Welch's t-test.
+# The logged intervals follow the logger's subscription rate for each topic
+# (about 20, 50 and 100 ms in these logs), not the control-loop period: they
+# show delays in publishing and logging, not the rate the loops run at.
+# Run from this directory, next to the uspfs/ and sspfs/ log folders.
+
+import argparse
+import os
+import sys
+from functools import partial
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+import cmpLogs
+from cmpLogs import ALPHA, COLORS, SUPERVISED_LOGS, UNSUPERVISED_LOGS
+from plotDecimation import plot_lod
+from ulogCache import ULogCache
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import figures
+
+TIMING_TOPICS = (
+    'vehicle_angular_velocity',
+    'vehicle_attitude',
+    'actuator_motors',
+    'vehicle_local_position',
+)
+KINDS = ('interval', 'latency')
+PERCENTILES = {'p50': 50, 'p99': 99, 'p99.9': 99.9}
+STATS = (*PERCENTILES, 'max', 'miss_rate')
+
+# Deadlines: an interval misses when it is longer than the topic's nominal
+# period by more than INTERVAL_TOLERANCE; a sample misses when its latency
+# exceeds LATENCY_DEADLINE_US. The nominal period is fixed per topic for all
+# flights of both groups (--period, else the baseline group's pooled median
+# interval), so a uniform slowdown of one group counts as misses.
+INTERVAL_TOLERANCE = 0.2
+LATENCY_DEADLINE_US = 1000
+BASELINE_GROUP = 'USPFS'
+
+
+def timing_samples(data):
+    """Intervals and latencies (us) of one topic's {field: array}"""
+    t = data['timestamp'].astype(np.int64)
+    intervals = np.diff(t)
+    if 'timestamp_sample' in data:
+        latencies = t - data['timestamp_sample'].astype(np.int64)
+    else:
+        latencies = np.empty(0, dtype=np.int64)
+    return {'interval': intervals, 'latency': latencies}
+
+
+def summarize(samples, deadline=np.nan):
+    """Percentiles, max and deadline-miss rate of a timing series.
+
+    The miss rate is NaN without a deadline.
+    """
+    row = {'n': len(samples)}
+    if len(samples) == 0:
+        row.update({stat: np.nan for stat in STATS})
+        return row
+    values = np.percentile(samples, list(PERCENTILES.values()))
+    row.update(zip(PERCENTILES, values))
+    row['max'] = samples.max()
+    row['miss_rate'] = np.mean(samples > deadline) if np.isfinite(deadline) else np.nan
+    return row
+
+
+def process_timing(log_file, cache=None, reader='pyulog'):
+    """Timing statistics of one log.
+
+    Returns (result, messages); result is None if the log could not be
+    decoded, else (rows, samples): one row per topic and kind for the
+    per-flight table, without deadlines yet (see apply_deadlines), and the
+    raw {(topic, kind): samples}.
+    """
+    messages = []
+    topics = {topic: ('timestamp', 'timestamp_sample') for topic in TIMING_TOPICS}
+    loader = partial(cmpLogs.load_topics, reader=reader)
+    try:
+        data = cache.load(log_file, topics, loader) if cache is not None else loader(log_file, topics)
+    except Exception as e:
+        return None, [f"    - Error processing: {str(e)}"]
+
+    rows = []
+    samples = {}
+    for topic in TIMING_TOPICS:
+        if topic not in data or len(data[topic]['timestamp']) < 2:
+            messages.append(f"    - Warning: No {topic} data")
+            continue
+        series = timing_samples(data[topic])
+        for kind in KINDS:
+            if len(series[kind]) == 0:
+                continue
+            rows.append({'flight': os.path.basename(log_file), 'topic': topic, 'kind': kind,
+                         'deadline_us': np.nan, **summarize(series[kind])})
+            samples[(topic, kind)] = series[kind]
+    return (rows, samples), messages
+
+
+def process_timing_group(log_files, group_name, workers=1, **kwargs):
+    """Timing statistics of a group of logs.
+
+    Returns (flights, samples): the per-flight DataFrame and
+    {flight: {(topic, kind): samples}}.
+    """
+    rows = []
+    samples = {}
+    print(f"\nProcessing {group_name} logs:")
+    results = cmpLogs.imap_ordered(partial(process_timing, **kwargs), log_files, workers=workers)
+    for i, (log_file, (result, messages)) in enumerate(zip(log_files, results)):
+        print(f"  [{i+1}/{len(log_files)}] Processing {os.path.basename(log_file)}")
+        for message in messages:
+            print(message)
+        if result is None:
+            continue
+        flight_rows, samples[os.path.basename(log_file)] = result
+        rows.extend(flight_rows)
+    flights = pd.DataFrame(rows, columns=['flight', 'topic', 'kind', 'deadline_us', 'n', *STATS])
+    flights.insert(0, 'group', group_name)
+    return flights, samples
+
+
+def pool_samples(flight_samples):
+    """{(topic, kind): samples} of all the flights of a group"""
+    pooled = {}
+    for series in flight_samples.values():
+        for key, values in series.items():
+            pooled.setdefault(key, []).append(values)
+    return {key: np.concatenate(values) for key, values in pooled.items()}
+
+
+def nominal_periods(baseline_samples, periods=None):
+    """Nominal interval (us) of every timing topic.
+
+    periods holds the ones given explicitly; the others are the pooled
+    median interval of the baseline group's samples.
+    """
+    periods = dict(periods or {})
+    for topic in TIMING_TOPICS:
+        intervals = baseline_samples.get((topic, 'interval'), np.empty(0))
+        if topic not in periods and len(intervals):
+            periods[topic] = float(np.median(intervals))
+    return periods
+
+
+def apply_deadlines(flights, samples, periods, interval_tolerance=INTERVAL_TOLERANCE,
+                    latency_deadline=LATENCY_DEADLINE_US):
+    """Fill the deadline_us and miss_rate of every per-flight row, in place.
+
+    samples maps each group to its {flight: {(topic, kind): samples}}.
+    Topics without a nominal period keep a NaN interval miss rate.
+    """
+    for i, row in flights.iterrows():
+        if row['kind'] == 'interval':
+            deadline = periods.get(row['topic'], np.nan) * (1 + interval_tolerance)
+        else:
+            deadline = latency_deadline
+        values = samples[row['group']][row['flight']][(row['topic'], row['kind'])]
+        flights.at[i, 'deadline_us'] = deadline
+        flights.at[i, 'miss_rate'] = summarize(values, deadline)['miss_rate']
+    return flights
+
+
+def compare_groups(flights, samples, groups=('USPFS', 'SSPFS'), correction=None):
+    """Per topic, kind and statistic: group means with CIs, pooled values and Welch's t-test.
+
+    The per-flight values are the samples of the test; the pooled columns
+    summarise all intervals/latencies of a group at once. With correction
+    the p-values are adjusted across the whole table.
+    """
+    rows = []
+    for topic in TIMING_TOPICS:
+        for kind in KINDS:
+            per_group = {}
+            for group in groups:
+                sel = flights[(flights['group'] == group) & (flights['topic'] == topic)
+                              & (flights['kind'] == kind)]
+                per_group[group] = sel[list(STATS)].to_numpy(dtype=float)
+            if any(len(values) == 0 for values in per_group.values()):
+                continue
+            test = cmpLogs.welch_ttest(per_group[groups[0]], per_group[groups[1]])
+            pooled = {}
+            for group in groups:
+                pool = samples[group].get((topic, kind), np.empty(0))
+                deadline = flights[(flights['group'] == group) & (flights['topic'] == topic)
+                                   & (flights['kind'] == kind)]['deadline_us'].median()
+                pooled[group] = summarize(pool, deadline)
+            for j, stat in enumerate(STATS):
+                row = {'topic': topic, 'kind': kind, 'stat': stat}
+                for group in groups:
+                    values = per_group[group][:, j]
+                    n = np.sum(~np.isnan(values))
+                    row[f'{group}_mean'] = np.nanmean(values)
+                    row[f'{group}_ci'] = cmpLogs.confidence_interval(np.nanstd(values), n)
+                    row[f'{group}_pooled'] = pooled[group][stat]
+                row['mean_diff'] = test['mean_diff'][j]
+                row['p_value'] = test['p_value'][j]
+                rows.append(row)
+    summary = pd.DataFrame(rows)
+    p_value = summary['p_value'].to_numpy()
+    if correction:
+        p_value = cmpLogs.adjust_pvalues(p_value, correction)
+        summary['p_adjusted'] = p_value
+    with np.errstate(invalid='ignore'):
+        summary['significant'] = p_value < ALPHA
+    return summary
+
+
+def plot_timing(samples, flights, groups=('USPFS', 'SSPFS')):
+    """Tail (complementary CDF) of the pooled intervals and latencies per topic"""
+    fig, axs = plt.subplots(len(TIMING_TOPICS), len(KINDS), figsize=(14, 3.2 * len(TIMING_TOPICS)))
+    for i, topic in enumerate(TIMING_TOPICS):
+        for j, kind in enumerate(KINDS):
+            ax = axs[i, j]
+            for group in groups:
+                values = np.sort(samples[group].get((topic, kind), np.empty(0))) / 1000
+                if len(values) == 0:
+                    continue
+                ccdf = 1 - np.arange(len(values)) / len(values)
+                plot_lod(ax, values, ccdf, drawstyle='steps-post', color=COLORS[group], label=group)
+                deadline = flights[(flights['group'] == group) & (flights['topic'] == topic)
+                                   & (flights['kind'] == kind)]['deadline_us'].median()
+                ax.axvline(deadline / 1000, color=COLORS[group], linestyle='--', alpha=0.7)
+            ax.set_yscale('log')
+            ax.set_title(f'{topic} {kind}', fontsize=10)
+            ax.grid(True, which='both', alpha=0.3)
+            if j == 0:
+                ax.set_ylabel('P(X > x)')
+            if i == len(TIMING_TOPICS) - 1:
+                ax.set_xlabel(f'{kind.capitalize()} [ms]')
+            if i == 0 and j == 0:
+                ax.legend()
+    fig.suptitle('Control-loop timing: tail distributions (dashed: deadlines)')
+    fig.tight_layout()
+    return fig
+
+
+# Main execution
+if __name__ == "__main__":
+    print("\n" + "="*50)
+    print("Starting control-loop timing analysis")
+    print("="*50)
+
+    parser = argparse.ArgumentParser(description="Control-loop timing and jitter of USPFS vs SSPFS flights")
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help="processes used to decode logs (0 = all cores; default: 1)")
+    parser.add_argument('--reader', choices=cmpLogs.READERS, default='pyulog',
+                        help="ULog decoder (default: pyulog)")
+    parser.add_argument('--cache-dir', default='.ulog_cache',
+                        help="cache of decoded topics (default: .ulog_cache)")
+    parser.add_argument('--cache-size', type=int, default=1024,
+                        help="cache size cap in MB, LRU evicted (default: 1024)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="always decode the .ulg files")
+    parser.add_argument('--period', action='append', default=[], metavar='TOPIC=MS',
+                        help="nominal interval of a topic in ms (repeatable; default: the "
+                             f"{BASELINE_GROUP} pooled median interval)")
+    parser.add_argument('--interval-tolerance', type=float, default=INTERVAL_TOLERANCE,
+                        help="interval deadline as a fraction above the topic's nominal period "
+                             f"(default: {INTERVAL_TOLERANCE})")
+    parser.add_argument('--latency-deadline', type=float, default=LATENCY_DEADLINE_US,
+                        help=f"latency deadline in us (default: {LATENCY_DEADLINE_US})")
+    parser.add_argument('--correction', choices=['bh', 'holm'],
+                        help="correct p-values across the summary (Benjamini-Hochberg or Holm)")
+    figures.add_arguments(parser)
+    args = parser.parse_args()
+    plots = figures.from_args(args)
+    workers = args.workers if args.workers > 0 else os.cpu_count()
+    cache = None
+    if not args.no_cache:
+        cache = ULogCache(args.cache_dir, args.cache_size << 20)
+    periods = {}
+    for spec in args.period:
+        topic, _, period = spec.partition('=')
+        if topic not in TIMING_TOPICS:
+            parser.error(f"--period: unknown topic {topic!r} (one of {', '.join(TIMING_TOPICS)})")
+        try:
+            periods[topic] = float(period) * 1000
+        except ValueError:
+            parser.error(f"--period: expected TOPIC=MS, got {spec!r}")
+
+    flights = {}
+    flight_samples = {}
+    for group, log_files in (('USPFS', UNSUPERVISED_LOGS), ('SSPFS', SUPERVISED_LOGS)):
+        flights[group], flight_samples[group] = process_timing_group(
+            log_files, group, workers, cache=cache, reader=args.reader)
+    if cache is not None:
+        cache.evict()
+    samples = {group: pool_samples(group_samples) for group, group_samples in flight_samples.items()}
+    periods = nominal_periods(samples[BASELINE_GROUP], periods)
+    print("\nNominal periods: " + ", ".join(f"{topic} {period / 1000:.1f} ms"
+                                            for topic, period in periods.items()))
+    flights = apply_deadlines(pd.concat(flights.values(), ignore_index=True), flight_samples,
+                              periods, args.interval_tolerance, args.latency_deadline)
+    summary = compare_groups(flights, samples, correction=args.correction)
+
+    os.makedirs(args.figure_dir, exist_ok=True)
+    flights_csv = os.path.join(args.figure_dir, 'loop_timing_flights.csv')
+    summary_csv = os.path.join(args.figure_dir, 'loop_timing_summary.csv')
+    flights.to_csv(flights_csv, index=False)
+    summary.to_csv(summary_csv, index=False)
+    print(f"\nSaved per-flight timing to {flights_csv}")
+    print(f"Saved group comparison to {summary_csv}")
+
+    print("\nTiming summary (mean of per-flight values, us; miss rate as fraction):")
+    shown = summary[summary['stat'].isin(['p99', 'max', 'miss_rate'])]
+    with pd.option_context('display.width', 160, 'display.max_rows', None):
+        print(shown[['topic', 'kind', 'stat', 'USPFS_mean', 'SSPFS_mean', 'p_value', 'significant']]
+              .to_string(index=False, float_format=lambda v: f'{v:.4g}'))
+
+    plots.add('loop_timing_comparison', plot_timing, samples, flights)
+    plots.render()
@@ -0,0 +1,123 @@
+# Level-of-detail decimation for line plots
+#
+# A line plot can never show more than one vertical stroke per pixel
+# column, so a series with many more samples than the figure has pixels
+# only costs render time and file size. M4 decimation keeps, per pixel
+# column, the first, last, minimum and maximum sample, so the polyline
+# through those reaches the same extremes in every column as the full
+# series. It is not pixel-exact: antialiased strokes of the skipped
+# segments fall at slightly different sub-pixel positions, which changes
+# the shade of some edge pixels. How many depends on the data, the dpi and
+# the matplotlib version: `benchLogs.py render` (100 noisy traces of 100k
+# points at 300 dpi) has measured 1.4-2.3 % of the pixels; on the bundled logs
+# the CCDFs of loopTiming.py differ in 0.3 % and the 1000-point cmpLogs
+# figures not at all (they are within the budget). Decimation happens at draw
+# time, against the pixel grid the artist is actually rendered to, so it
+# holds for any dpi, layout or zoom. Bands (fill_between) keep the union of
+# both edges' samples so the envelope is preserved as well, and NaN gaps
+# survive: the first NaN of each column is kept, so lines still break where
+# the data does. Series within PIXEL_BUDGET samples per pixel column of
+# the axes are drawn as they are.
+
+import numpy as np
+from matplotlib.collections import FillBetweenPolyCollection
+from matplotlib.lines import Line2D
+
+# M4 keeps at most 4 samples per pixel column
+PIXEL_BUDGET = 4
+
+
+def m4_indices(columns, ys):
+    """Sorted indices of the samples M4 keeps.
+
+    columns holds the pixel column of every sample (monotonic, as x is);
+    ys is a sequence of series sharing it. Each run of equal columns keeps
+    its first and last sample and, for every series, its (NaN-ignoring)
+    minimum, maximum and first NaN.
+    """
+    n = len(columns)
+    starts = np.flatnonzero(np.diff(columns, prepend=columns[0] - 1) if n else [])
+    if n <= PIXEL_BUDGET * len(starts):
+        return np.arange(n)
+    ends = np.append(starts[1:], n) - 1
+    # Rank of each sample's column
+    column = np.repeat(np.arange(len(starts)), ends - starts + 1)
+    keep = [starts, ends]
+    for y in ys:
+        lo = np.fmin.reduceat(y, starts)
+        hi = np.fmax.reduceat(y, starts)
+        # First sample of each column equal to its min/max, and its first NaN
+        for hit in (y == lo[column], y == hi[column], np.isnan(y)):
+            idx = np.flatnonzero(hit)
+            keep.append(idx[np.unique(column[idx], return_index=True)[1]])
+    return np.unique(np.concatenate(keep))
+
+
+def within_budget(ax, n):
+    """Whether n samples fit the pixel budget of ax's width, so M4 would keep them all"""
+    return n <= PIXEL_BUDGET * ax.bbox.width
+
+
+def pixel_columns(ax, x):
+    """Display pixel column of every x on ax"""
+    y = np.full(len(x), ax.get_ylim()[0])
+    return np.floor(ax.transData.transform(np.column_stack((x, y)))[:, 0]).astype(np.int64)
+
+
+class DecimatedLine(Line2D):
+    """Line2D that draws only the M4 samples of its data for the current pixel grid"""
+
+    def __init__(self, x, y, **kwargs):
+        self._full = (np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+        super().__init__(*self._full, **kwargs)
+
+    def draw(self, renderer):
+        x, y = self._full
+        if within_budget(self.axes, len(x)):
+            self.set_data(x, y)
+        else:
+            idx = m4_indices(pixel_columns(self.axes, x), [y])
+            self.set_data(x[idx], y[idx])
+        super().draw(renderer)
+        self.stale = False
+
+
+class DecimatedBand(FillBetweenPolyCollection):
+    """fill_between band drawn from the M4 samples of both edges"""
+
+    def __init__(self, x, y1, y2, **kwargs):
+        self._full = tuple(np.asarray(v, dtype=float) for v in (x, y1, y2))
+        super().__init__('x', *self._full, **kwargs)
+
+    def draw(self, renderer):
+        x, y1, y2 = self._full
+        if within_budget(self.axes, len(x)):
+            self.set_data(x, y1, y2)
+        else:
+            idx = m4_indices(pixel_columns(self.axes, x), [y1, y2])
+            self.set_data(x[idx], y1[idx], y2[idx])
+        super().draw(renderer)
+        self.stale = False
+
+
+def plot_lod(ax, x, y, **kwargs):
+    """Decimated ax.plot(x, y, **kwargs) of one series; pass color explicitly.
+
+    Series within the pixel budget of the axes are plotted as they are.
+    """
+    if within_budget(ax, len(x)):
+        return ax.plot(x, y, **kwargs)[0]
+    line = DecimatedLine(x, y, **kwargs)
+    ax.add_line(line)
+    ax.autoscale_view()
+    return line
+
+
+def fill_between_lod(ax, x, y1, y2, **kwargs):
+    """Decimated ax.fill_between(x, y1, y2, **kwargs), plain within the pixel budget"""
+    if within_budget(ax, len(x)):
+        return ax.fill_between(x, y1, y2, **kwargs)
+    band = DecimatedBand(x, y1, y2, **kwargs)
+    ax.add_collection(band)
+    ax.autoscale_view()
+    return band
@@ -0,0 +1,248 @@
+#!/usr/bin/python3
+# Replay a .ulg as a live stream and analyse it online
+#
+# The replay source streams the messages of a recorded flight in timestamp
+# order, paced at a configurable speed (1x, 10x, ... or as fast as
+# possible), over an asyncio queue or a local TCP socket. It stands in for
+# the live MAVLink/ULog stream, so the online analyzer can be exercised
+# offline: the analyzer keeps rolling windows of CPU load, RAM and
+# position tracking error (the metrics cmpLogs.py computes after the
+# flight) and raises an alert whenever a rolling mean crosses its
+# threshold. For every message both the analyzer's processing time and the
+# end-to-end latency, from the moment the message was due to be published
+# until the analyzer is done with it, are measured.
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+
+import numpy as np
+
+import cmpLogs
+
+# Metrics the replay carries (see cmpLogs.METRIC_SOURCES)
+REPLAY_METRICS = ('x_actual', 'y_actual', 'z_actual',
+                  'x_setpoint', 'y_setpoint', 'z_setpoint', 'cpu', 'ram')
+TRANSPORTS = ('queue', 'socket')
+
+# Rolling windows span this much flight time; an alert is raised when the
+# window mean crosses a threshold and cleared when it falls back below it
+ROLLING_WINDOW_S = 5.0
+CPU_ALERT_PERCENT = 80.0
+POSITION_ERROR_ALERT_M = 1.0
+
+QUEUE_SIZE = 1024
+SOCKET_HOST = '127.0.0.1'
+
+
+def replay_messages(log_file, reader='pyulog'):
+    """Yield (timestamp, topic, {field: value}) of a log in timestamp order"""
+    data = cmpLogs.load_topics(log_file, cmpLogs.required_topics(REPLAY_METRICS), reader)
+    topics = list(data)
+    timestamps = [data[topic]['timestamp'].astype(np.int64) for topic in topics]
+    if not timestamps:
+        return
+    which = np.concatenate([np.full(len(t), i) for i, t in enumerate(timestamps)])
+    index = np.concatenate([np.arange(len(t)) for t in timestamps])
+    order = np.argsort(np.concatenate(timestamps), kind='stable')
+    columns = [{field: values.tolist() for field, values in data[topic].items()}
+               for topic in topics]
+    for i, j in zip(which[order].tolist(), index[order].tolist()):
+        yield (columns[i]['timestamp'][j], topics[i],
+               {field: values[j] for field, values in columns[i].items()})
+
+
+async def replay(messages, send, speed=1.0):
+    """Publish messages through send(message, due) at speed x real time.
+
+    due is the time.perf_counter() at which the message was due to be
+    published. With speed None messages are published as fast as the
+    consumer takes them.
+    """
+    start = None
+    for message in messages:
+        now = time.perf_counter()
+        due = now
+        if speed is not None:
+            if start is None:
+                start = (message[0], now)
+            due = start[1] + (message[0] - start[0]) / 1e6 / speed
+            if due > now:
+                await asyncio.sleep(due - now)
+        await send(message, due)
+
+
+class RollingMean:
+    """Mean of the samples in the last window seconds of flight time"""
+
+    def __init__(self, window):
+        self.window = window
+        self.samples = deque()
+        self.total = 0.0
+
+    def add(self, t, value):
+        self.samples.append((t, value))
+        self.total += value
+        while self.samples and self.samples[0][0] < t - self.window:
+            self.total -= self.samples.popleft()[1]
+        return self.total / len(self.samples)
+
+
+class OnlineAnalyzer:
+    """Rolling CPU/RAM/tracking-error windows with threshold alerts.
+
+    Feed messages to update(); alerts are collected in alerts as
+    (flight time in s, metric, rolling mean, 'raised' or 'cleared'); the
+    per-message processing times and end-to-end latencies (s) in
+    processing and latencies.
+    """
+
+    def __init__(self, window=ROLLING_WINDOW_S, cpu_alert=CPU_ALERT_PERCENT,
+                 error_alert=POSITION_ERROR_ALERT_M, on_alert=None):
+        self.rolling = {metric: RollingMean(window) for metric in ('cpu', 'ram', 'error')}
+        self.thresholds = {'cpu': cpu_alert, 'error': error_alert}
+        self.active = {metric: False for metric in self.thresholds}
+        self.current = {}
+        self.setpoint = None
+        self.start = None
+        self.alerts = []
+        self.processing = []
+        self.latencies = []
+        self.on_alert = on_alert
+
+    def update(self, message, due):
+        received = time.perf_counter()
+        timestamp, topic, fields = message
+        if self.start is None:
+            self.start = timestamp
+        t = (timestamp - self.start) / 1e6
+        if topic == 'cpuload':
+            self._observe(t, 'cpu', fields['load'] * 100)
+            self._observe(t, 'ram', fields['ram_usage'])
+        elif topic == 'vehicle_local_position_setpoint':
+            self.setpoint = (fields['x'], fields['y'], fields['z'])
+        elif topic == 'vehicle_local_position' and self.setpoint is not None:
+            # Error against the latest setpoint, as a live controller sees it
+            error = math.dist((fields['x'], fields['y'], fields['z']), self.setpoint)
+            if not math.isnan(error):
+                self._observe(t, 'error', error)
+        done = time.perf_counter()
+        self.processing.append(done - received)
+        self.latencies.append(done - due)
+
+    def _observe(self, t, metric, value):
+        mean = self.rolling[metric].add(t, value)
+        self.current[metric] = mean
+        if metric not in self.thresholds:
+            return
+        above = mean > self.thresholds[metric]
+        if above != self.active[metric]:
+            self.active[metric] = above
+            alert = (t, metric, mean, 'raised' if above else 'cleared')
+            self.alerts.append(alert)
+            if self.on_alert is not None:
+                self.on_alert(alert)
+
+
+async def run_queue(messages, analyzer, speed):
+    """Replay into an asyncio queue consumed by the analyzer"""
+    queue = asyncio.Queue(QUEUE_SIZE)
+
+    async def consume():
+        while (item := await queue.get()) is not None:
+            analyzer.update(*item)
+
+    consumer = asyncio.create_task(consume())
+    await replay(messages, lambda message, due: queue.put((message, due)), speed)
+    await queue.put(None)
+    await consumer
+
+
+async def run_socket(messages, analyzer, speed):
+    """Replay as JSON lines over a local TCP socket read by the analyzer.
+
+    The due time travels with each message, so the measured latency covers
+    serialisation and the socket round trip.
+    """
+    async def publish(reader, writer):
+        async def send(message, due):
+            writer.write(json.dumps((message, due)).encode() + b'\n')
+            await writer.drain()
+
+        await replay(messages, send, speed)
+        writer.close()
+        await writer.wait_closed()
+
+    server = await asyncio.start_server(publish, SOCKET_HOST, 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        reader, writer = await asyncio.open_connection(SOCKET_HOST, port)
+        async for line in reader:
+            message, due = json.loads(line)
+            analyzer.update(tuple(message), due)
+        writer.close()
+        await writer.wait_closed()
+
+
+def print_alert(alert):
+    t, metric, mean, state = alert
+    unit = {'cpu': '%', 'error': 'm'}[metric]
+    print(f"  [{t:7.1f}s] {metric} alert {state}: rolling mean {mean:.2f}{unit}")
+
+
+def parse_speed(text):
+    """Multiplier of real time in a --speed value (2, 10x, 0.5x), None for max"""
+    if text == 'max':
+        return None
+    speed = float(text.removesuffix('x'))
+    if not (speed > 0 and math.isfinite(speed)):
+        raise ValueError(text)
+    return speed
+
+
+# Main execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a .ulg as a live stream with rolling analysis")
+    parser.add_argument('log_file', help="flight log to replay")
+    parser.add_argument('--speed', default='1x',
+                        help="replay speed as a multiplier of the flight's real time "
+                             "(e.g. 1x, 2.5, 10x), or max for as fast as possible (default: 1x)")
+    parser.add_argument('--transport', choices=TRANSPORTS, default='queue',
+                        help="asyncio queue or local TCP socket (default: queue)")
+    parser.add_argument('--reader', choices=cmpLogs.READERS, default='pyulog',
+                        help="ULog decoder (default: pyulog)")
+    parser.add_argument('--window', type=float, default=ROLLING_WINDOW_S,
+                        help=f"rolling window in seconds of flight time (default: {ROLLING_WINDOW_S})")
+    parser.add_argument('--cpu-alert', type=float, default=CPU_ALERT_PERCENT,
+                        help=f"CPU load alert threshold in %% (default: {CPU_ALERT_PERCENT})")
+    parser.add_argument('--error-alert', type=float, default=POSITION_ERROR_ALERT_M,
+                        help=f"position error alert threshold in m (default: {POSITION_ERROR_ALERT_M})")
+    args = parser.parse_args()
+    try:
+        speed = parse_speed(args.speed)
+    except ValueError:
+        parser.error(f"--speed: expected a positive multiplier or max, got {args.speed!r}")
+
+    print(f"Replaying {os.path.basename(args.log_file)} at {args.speed} over {args.transport}")
+    analyzer = OnlineAnalyzer(args.window, args.cpu_alert, args.error_alert, on_alert=print_alert)
+    messages = replay_messages(args.log_file, args.reader)
+    run = run_queue if args.transport == 'queue' else run_socket
+    start = time.perf_counter()
+    asyncio.run(run(messages, analyzer, speed))
+    elapsed = time.perf_counter() - start
+
+    print(f"\nReplayed {len(analyzer.latencies)} messages in {elapsed:.2f}s "
+          f"({len(analyzer.latencies) / elapsed:.0f} msg/s)")
+    for label, values in (('Processing time', analyzer.processing),
+                          ('End-to-end latency', analyzer.latencies)):
+        if values:
+            values = np.array(values) * 1e6
+            p50, p99 = np.percentile(values, [50, 99])
+            print(f"{label}: p50 {p50:.1f}us, p99 {p99:.1f}us, max {values.max():.1f}us")
+    print("Final rolling means: " + ", ".join(f"{metric} {value:.2f}"
+                                              for metric, value in analyzer.current.items()))
+    print(f"Alerts: {len(analyzer.alerts)}")
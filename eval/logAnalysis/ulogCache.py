@@ -0,0 +1,181 @@
+# Persistent on-disk cache of decoded ULog topics
+#
+# Every log gets one .npz file holding its decoded {topic: {field: array}}
+# columns. The entry key is derived from the log's content hash, the pyulog
+# version and the requested topics/fields, so renamed or copied logs still
+# hit while a re-recorded log, a pyulog upgrade or a different projection
+# miss. Uncompressed entries are memory-mapped on read; compressed entries
+# trade that for size and are decompressed eagerly.
+
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import time
+import warnings
+import zipfile
+from importlib.metadata import version
+
+import numpy as np
+
+PYULOG_VERSION = version('pyulog')
+# Bump when the on-disk layout changes; older entries are treated as stale
+CACHE_FORMAT = 1
+META_KEY = '__meta__'
+# Temp files older than this are leftovers of interrupted writes
+STALE_TMP_AGE = 3600  # 1 hour (in secs)
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_npz(path, mmap=True):
+    """Load every array of an .npz, memory-mapping the stored members"""
+    arrays = {}
+    with zipfile.ZipFile(path) as zf, open(path, 'rb') as f:
+        for info in zf.infolist():
+            name = info.filename[:-len('.npy')]
+            if not mmap or info.compress_type != zipfile.ZIP_STORED:
+                with zf.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member)
+                continue
+            # Skip the zip local file header to reach the .npy payload
+            f.seek(info.header_offset)
+            header = f.read(30)
+            name_len, extra_len = struct.unpack('<HH', header[26:30])
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject:
+                raise ValueError(f"object array in cache entry: {name}")
+            if int(np.prod(shape)) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(),
+                                         shape=shape, order='F' if fortran else 'C')
+    return arrays
+
+
+class ULogCache:
+    """Content-addressed cache of decoded topic columns with LRU eviction"""
+
+    def __init__(self, cache_dir, max_bytes=1 << 30, compress=False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.compress = compress
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, log_file, topics):
+        """Cache key of a log for the given {topic: fields} projection"""
+        spec = {
+            'format': CACHE_FORMAT,
+            'source': file_hash(log_file),
+            'pyulog': PYULOG_VERSION,
+            'topics': {topic: sorted(fields) for topic, fields in sorted(topics.items())},
+        }
+        blob = json.dumps(spec, sort_keys=True).encode()
+        return hashlib.sha256(blob).hexdigest()[:32], spec
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.npz')
+
+    def get(self, key, spec):
+        """Return cached {topic: {field: array}} or None on a miss.
+
+        Entries that cannot be read or whose metadata does not match the
+        expected spec are stale and get removed.
+        """
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            arrays = _read_npz(path, mmap=not self.compress)
+            meta = json.loads(str(arrays.pop(META_KEY)))
+            if meta['spec'] != spec:
+                raise ValueError("metadata mismatch")
+            data = {topic: {field: arrays[f'{topic}/{field}'] for field in fields}
+                    for topic, fields in meta['present'].items()}
+        except Exception:
+            self._remove(path)
+            return None
+        # Touch the entry so eviction sees it as recently used
+        os.utime(path)
+        return data
+
+    def put(self, key, spec, data):
+        """Store decoded topics atomically (write to a temp file, then rename)"""
+        arrays = {f'{topic}/{field}': np.asarray(values)
+                  for topic, fields in data.items()
+                  for field, values in fields.items()}
+        meta = {'spec': spec,
+                'present': {topic: list(fields) for topic, fields in data.items()}}
+        arrays[META_KEY] = np.array(json.dumps(meta))
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                if self.compress:
+                    np.savez_compressed(f, **arrays)
+                else:
+                    np.savez(f, **arrays)
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            self._remove(tmp)
+            raise
+
+    def load(self, log_file, topics, loader):
+        """Return the decoded topics of log_file, calling loader on a miss.
+
+        A failed cache write (disk full, read-only cache_dir) is only
+        warned about: the decoded data is returned uncached.
+        """
+        key, spec = self.key(log_file, topics)
+        data = self.get(key, spec)
+        if data is None:
+            data = loader(log_file, topics)
+            try:
+                self.put(key, spec, data)
+            except OSError as e:
+                warnings.warn(f"not caching {log_file}: {e}")
+        return data
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits max_bytes.
+
+        Leftover temp files from interrupted writes are removed as well.
+        Returns the number of entries removed.
+        """
+        entries = []
+        removed = 0
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith('.tmp'):
+                if time.time() - os.stat(path).st_mtime > STALE_TMP_AGE:
+                    self._remove(path)
+            elif name.endswith('.npz'):
+                st = os.stat(path)
+                entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+            removed += 1
+        return removed
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,351 @@
+# Memory-mapped ULog reader
+#
+# pyulog turns every message of a log into Python objects before a single
+# field can be used, which makes multi-hundred-MB logs slow and memory
+# hungry. MappedULog instead memory-maps the file, walks the message headers
+# once to index the offset of every message, and decodes the few definition
+# messages (formats, subscriptions, dropouts). Data messages are never
+# touched until a topic is requested; a topic is then gathered with one
+# fancy-indexing pass over the mapped bytes and viewed as a NumPy structured
+# array, so the only memory used is the output itself.
+#
+# Field names and dtypes follow pyulog (nested types and arrays are
+# flattened to 'a.b[0]', bool/char are int8, trailing padding is dropped),
+# so the result of fields() can be used in place of ULog.Data.data.
+
+import mmap
+import struct
+from array import array
+
+import numpy as np
+
+HEADER_MAGIC = b'ULog\x01\x12\x35'
+HEADER_SIZE = 16
+SYNC_MAGIC = b'\x2F\x73\x13\x20\x25\x0C\xBB\x12'
+
+# Message header: uint16 msg_size, uint8 msg_type; data messages start with
+# a uint16 msg_id
+DATA_HEADER = struct.Struct('<HBH')
+MSG_TYPES = frozenset(b'BFIMPQADRLCSO')
+MSG_TYPE_DATA = ord('D')
+
+# Scanned/gathered pages are released every WINDOW bytes so the mapping never
+# keeps the whole file resident; gathers also copy at most TAKE_CHUNK
+# messages at a time
+WINDOW = 16 << 20  # 16 MB
+TAKE_CHUNK = 1 << 18
+
+# ULog field types, decoded like pyulog does
+FIELD_TYPES = {
+    'int8_t': np.int8, 'uint8_t': np.uint8,
+    'int16_t': np.int16, 'uint16_t': np.uint16,
+    'int32_t': np.int32, 'uint32_t': np.uint32,
+    'int64_t': np.int64, 'uint64_t': np.uint64,
+    'float': np.float32, 'double': np.float64,
+    'bool': np.int8, 'char': np.int8,
+}
+
+
+def _skip(pos):
+    """Appender for the data messages of topics that are not indexed"""
+
+
+def _parse_field(field):
+    """Split 'type[n] name' into (type, array size or 0, name)"""
+    type_str, name = field.split(' ')
+    if type_str.endswith(']'):
+        type_str, size = type_str[:-1].split('[')
+        return type_str, int(size), name
+    return type_str, 0, name
+
+
+class Topic:
+    """Layout and message offsets of one subscription (msg_id)"""
+
+    def __init__(self, name, multi_id, msg_id, fields, max_size):
+        self.name = name
+        self.multi_id = multi_id
+        self.msg_id = msg_id
+        # Flattened (name, dtype, offset); trailing padding is not logged
+        while fields and fields[-1][0].startswith('_padding'):
+            fields.pop()
+        self.dtype = np.dtype({
+            'names': [f[0] for f in fields],
+            'formats': [f[1] for f in fields],
+            'offsets': [f[2] for f in fields],
+        })
+        self.max_size = max_size
+        self.offsets = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.offsets)
+
+
+class MappedULog:
+    """Zero-copy, index-on-open ULog reader.
+
+    topics maps (name, multi_id) to a Topic; dropouts holds (file offset,
+    duration in ms) of every logger dropout (see dropout_timestamps()).
+    Use fields() for a pyulog-like {field: array} dict, gather() for a
+    structured-array copy or view() for a zero-copy view when the messages
+    of a topic are evenly spaced.
+    With topic_names only those topics are indexed, like pyulog's
+    message_name_filter_list.
+    """
+
+    def __init__(self, path, topic_names=None):
+        self.path = path
+        self.topic_names = None if topic_names is None else set(topic_names)
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buf = np.frombuffer(self._mm, dtype=np.uint8)
+        if self._mm[:len(HEADER_MAGIC)] != HEADER_MAGIC:
+            raise ValueError(f"Not a ULog file: {path}")
+        self.start_timestamp, = struct.unpack_from('<Q', self._mm, 8)
+        self.corrupt = False
+        self.formats = {}
+        self.topics = {}
+        self.dropouts = []
+        self._build_index()
+
+    def close(self):
+        # Views handed out keep the buffer alive; only drop our references
+        self._buf = None
+        self._mm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ## Indexing ##############################################################
+    def _scan(self):
+        """Index the file in one pass over the message headers.
+
+        Definition messages are decoded on the way (while their page is
+        mapped in). Returns ({msg_id: offsets of its data messages},
+        {msg_id: (name, multi_id)}); offsets point at the message header.
+        """
+        mm = self._mm
+        end = len(mm)
+        typecode = 'i' if end < 1 << 31 else 'q'
+        appenders = {}
+        data = {}
+        subscriptions = {}
+        unpack = DATA_HEADER.unpack_from
+        pos = released = HEADER_SIZE
+        # Messages are at least 5 bytes, apart from payload-less ones that
+        # carry nothing to index
+        while pos + 5 <= end:
+            window_end = min(pos + WINDOW, end)
+            while pos + 5 <= window_end:
+                size, msg_type, msg_id = unpack(mm, pos)
+                if msg_type == MSG_TYPE_DATA and size >= 2 and pos + 3 + size <= end:
+                    try:
+                        appenders[msg_id](pos)
+                    except KeyError:
+                        if (self.topic_names is None or msg_id not in subscriptions
+                                or subscriptions[msg_id][0] in self.topic_names):
+                            data[msg_id] = array(typecode, [pos])
+                            appenders[msg_id] = data[msg_id].append
+                        else:
+                            appenders[msg_id] = _skip
+                elif msg_type not in MSG_TYPES or pos + 3 + size > end:
+                    # Corrupt (or truncated) message: resync on the next sync message
+                    self.corrupt = True
+                    pos = mm.find(SYNC_MAGIC, pos + 4)
+                    if pos < 0:
+                        pos = end
+                        break
+                    pos -= 3
+                    continue
+                else:
+                    self._decode(pos, msg_type, size, subscriptions)
+                pos += 3 + size
+            self._release(released, pos)
+            released = pos
+        dtype = np.int32 if typecode == 'i' else np.int64
+        return ({msg_id: np.frombuffer(offsets, dtype=dtype) for msg_id, offsets in data.items()},
+                subscriptions)
+
+    def _decode(self, pos, msg_type, size, subscriptions):
+        """Decode a format, subscription or dropout message"""
+        payload = bytes(self._mm[pos + 3:pos + 3 + size])
+        try:
+            if msg_type == ord('F'):
+                name, fields = payload.decode('utf-8', 'replace').split(':', 1)
+                self.formats[name] = [_parse_field(f) for f in fields.split(';') if f]
+            elif msg_type == ord('A'):
+                multi_id, msg_id = struct.unpack_from('<BH', payload)
+                name = payload[3:].decode('utf-8', 'replace')
+                subscriptions[msg_id] = (name, multi_id)
+            elif msg_type == ord('O'):
+                duration, = struct.unpack_from('<H', payload)
+                self.dropouts.append((pos, duration))
+        except (struct.error, ValueError):
+            self.corrupt = True
+
+    def _build_index(self):
+        data, subscriptions = self._scan()
+        for msg_id, (name, multi_id) in subscriptions.items():
+            if self.topic_names is not None and name not in self.topic_names:
+                continue
+            if name not in self.formats:
+                self.corrupt = True
+                continue
+            fields, max_size = self._flatten(name)
+            topic = Topic(name, multi_id, msg_id, fields, max_size)
+            offsets = data.pop(msg_id, None)
+            if offsets is not None:
+                sizes = np.empty(len(offsets), dtype='<u2')
+                for start, rows in self._take(offsets, 2):
+                    sizes[start:start + len(rows)] = rows.view('<u2')[:, 0]
+                # Messages too short or too long for the format are corrupt.
+                # Unlike pyulog, trailing padding that was logged is accepted.
+                ok = (sizes >= topic.dtype.itemsize + 2) & (sizes <= max_size + 2)
+                if not np.all(ok):
+                    self.corrupt = True
+                    offsets = offsets[ok]
+                # Point at the payload (in place, the index is the big allocation)
+                offsets += 5
+                topic.offsets = offsets
+            self.topics[(name, multi_id)] = topic
+        if data:
+            # Data for msg_ids that were never subscribed
+            self.corrupt = True
+
+    def _flatten(self, type_name, prefix='', offset=0):
+        """Flatten a (nested) format into [(name, dtype, offset)] and its size"""
+        fields = []
+        for type_str, array_size, name in self.formats[type_name]:
+            count = max(array_size, 1)
+            for i in range(count):
+                field_name = prefix + name + (f'[{i}]' if array_size else '')
+                if type_str in FIELD_TYPES:
+                    dtype = np.dtype(FIELD_TYPES[type_str]).newbyteorder('<')
+                    fields.append((field_name, dtype, offset))
+                    offset += dtype.itemsize
+                else:
+                    nested, offset = self._flatten(type_str, field_name + '.', offset)
+                    fields.extend(nested)
+        return fields, offset
+
+    # ## Access ################################################################
+    def topic(self, name, multi_id=0):
+        return self.topics[(name, multi_id)]
+
+    def gather(self, name, multi_id=0, field_names=None):
+        """Copy the messages of a topic into a structured array.
+
+        With field_names the result only holds those fields, packed.
+        """
+        topic = self.topic(name, multi_id)
+        if field_names is None:
+            records = np.empty(len(topic), dtype=topic.dtype)
+            for start, rows in self._take(topic.offsets, topic.dtype.itemsize):
+                records[start:start + len(rows)] = rows.view(topic.dtype)[:, 0]
+            return records
+        columns = self.fields(name, multi_id, field_names)
+        records = np.empty(len(topic), dtype=[(f, v.dtype) for f, v in columns.items()])
+        for f, values in columns.items():
+            records[f] = values
+        return records
+
+    def view(self, name, multi_id=0):
+        """Zero-copy structured view of a topic, if its messages are evenly spaced.
+
+        Raises ValueError otherwise; gather() works for any layout.
+        """
+        topic = self.topic(name, multi_id)
+        offsets = topic.offsets
+        if len(offsets) == 0:
+            return np.empty(0, dtype=topic.dtype)
+        stride = offsets[1] - offsets[0] if len(offsets) > 1 else topic.dtype.itemsize
+        if len(offsets) > 2 and np.any(np.diff(offsets) != stride):
+            raise ValueError(f"{name} messages are not evenly spaced; use gather()")
+        return np.ndarray(len(offsets), dtype=topic.dtype, buffer=self._mm,
+                          offset=int(offsets[0]), strides=(int(stride),))
+
+    def fields(self, name, multi_id=0, field_names=None):
+        """{field: array} of a topic, like pyulog's ULog.Data.data"""
+        topic = self.topic(name, multi_id)
+        if field_names is None:
+            field_names = topic.dtype.names
+        columns = {f: np.empty(len(topic), dtype=topic.dtype.fields[f][0])
+                   for f in field_names if f in topic.dtype.fields}
+        for start, rows in self._take(topic.offsets, topic.dtype.itemsize):
+            records = rows.view(topic.dtype)[:, 0]
+            for f, values in columns.items():
+                values[start:start + len(rows)] = records[f]
+        return columns
+
+    def timeline(self):
+        """(timestamps, offsets) of every indexed data message, in file order.
+
+        Offsets point at the message payloads, so the difference of two
+        offsets is the number of bytes logged in between.
+        """
+        timestamps = []
+        offsets = []
+        for topic in self.topics.values():
+            if len(topic) == 0 or 'timestamp' not in topic.dtype.fields:
+                continue
+            dtype, shift = topic.dtype.fields['timestamp']
+            values = np.empty(len(topic), dtype=dtype)
+            for start, rows in self._take(topic.offsets, dtype.itemsize, shift):
+                values[start:start + len(rows)] = rows.view(dtype)[:, 0]
+            timestamps.append(values)
+            offsets.append(topic.offsets)
+        if not offsets:
+            return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+        offsets = np.concatenate(offsets).astype(np.int64)
+        order = np.argsort(offsets, kind='stable')
+        return np.concatenate(timestamps).astype(np.uint64)[order], offsets[order]
+
+    def dropout_timestamps(self, timeline=None):
+        """(timestamps, durations in ms) of the logger dropouts.
+
+        Like pyulog, each dropout is stamped with the latest data timestamp
+        logged before it (the log's start timestamp if there is none).
+        timeline is the result of timeline(), if already computed.
+        """
+        timestamps, offsets = self.timeline() if timeline is None else timeline
+        latest = np.maximum.accumulate(
+            np.concatenate(([self.start_timestamp], timestamps)).astype(np.uint64))
+        positions = np.array([pos for pos, _ in self.dropouts], dtype=np.int64)
+        durations = np.array([duration for _, duration in self.dropouts], dtype=np.uint16)
+        return latest[np.searchsorted(offsets, positions)], durations
+
+    def _take(self, offsets, nbytes, shift=0):
+        """Yield (start, rows): nbytes at each offset (+ shift) as (n, nbytes) uint8 arrays.
+
+        Ascending offsets are gathered at most TAKE_CHUNK at a time and a
+        WINDOW of the file at a time; on large files the pages each chunk
+        touched are released again, so only the output stays resident.
+        """
+        if len(offsets) == 0:
+            return
+        windows = np.lib.stride_tricks.sliding_window_view(self._buf, nbytes)
+        # Same dtype as offsets, or searchsorted would cast a copy of them
+        edges = np.arange(int(offsets[0]) + WINDOW, int(offsets[-1]) + 1, WINDOW,
+                          dtype=offsets.dtype)
+        starts = np.union1d(np.arange(0, len(offsets), TAKE_CHUNK),
+                            np.searchsorted(offsets, edges))
+        for start, stop in zip(starts.tolist(), np.append(starts[1:], len(offsets)).tolist()):
+            chunk = offsets[start:stop] + shift
+            yield start, windows[chunk]
+            self._release(int(chunk[0]), int(chunk[-1]))
+
+    def _release(self, start, stop):
+        """Drop the mapped pages in [start, stop) from the resident set.
+
+        They stay in the page cache and are faulted back in if read again.
+        Files that fit in one WINDOW are left alone.
+        """
+        if not hasattr(mmap, 'MADV_DONTNEED') or len(self._mm) <= WINDOW:
+            return
+        start -= start % mmap.PAGESIZE
+        stop -= stop % mmap.PAGESIZE
+        if stop > start:
+            self._mm.madvise(mmap.MADV_DONTNEED, start, stop - start)
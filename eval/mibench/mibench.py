@@ -1,5 +1,6 @@
 #!/usr/bin/python3
 
+import argparse
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 import pandas as pd
@@ -12,9 +13,8 @@ import sys
 from functools import *
 import colorsys
 
-# Create output directory if it doesn't exist
-output_dir = "plots"
-os.makedirs(output_dir, exist_ok=True)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import figures
 
 # Define color codes
 RED = "\033[1;31m"
@@ -116,6 +116,151 @@ event_map = {
 }
 
 
+def plot_base_degradation(frames, base, colors, analysis):
+    """Performance degradation per benchmark, base configurations"""
+    fig = plt.figure(figsize=(12,3))
+    fig.canvas.manager.set_window_title('mibench-base')
+    bp = sns.barplot(data=frames,x='bench', y='val', hue='hyp', edgecolor='black', palette=colors, errwidth = 1, capsize=0.1)
+
+    # Add mean values as text annotations
+    for i, bench in enumerate(frames['bench'].unique()):
+        #mean_val = mean_values[bench]
+        mean_val = base[bench] * 1000 # ms
+        bp.text(
+            x=i,  # X position (bar index)
+            y=-11.5,  # Y position (below the bars)
+            #y=5,  # Y position (below the bars)
+            # s=f"{mean_val:.2f}\nms",  # Text to display (mean value)
+            s=f"{mean_val:.2f} ms",  # Text to display (mean value)
+            ha='center',  # Horizontal alignment
+            va='top',  # Vertical alignment
+            fontsize=9,
+            color='black'
+        )
+
+
+    plt.xlabel(None)
+    plt.ylabel(None)
+    # plt.ylabel('% Performance Degradation')
+    _, labels = plt.xticks()
+    labels = [l.get_text().replace('-','\n') for l in labels]
+    plt.xticks(np.arange(len(labels)), labels)
+    plt.legend(loc = 'upper right').set_title(None)
+    plt.grid(which='both', axis='y', linestyle='--')
+    plt.yticks(np.arange(-3,9,1))
+    # plt.tight_layout()
+
+    plt.title(f"Performance Degradation (%) across benchmarks: {analysis} config")
+    # plt.get_current_fig_manager().window.showMaximized()
+
+    return fig
+
+def plot_events(frames, colors, g):
+    """Event analysis figure of one graph (base configurations)"""
+    # Create figure
+    fig = plt.figure(figsize=(12,3))
+
+    # Plotting
+    # sns.barplot(data=tmp, x='bench', y='value', hue='hyp', 
+    #             edgecolor='black', palette=colors)
+
+    sns.barplot(data=frames,x='bench', y='val', hue='hyp', edgecolor='black', palette=colors, errwidth = 1, capsize=0.1)
+        # sns.barplot(data=tmp,x='bench', y='value', hue='hyp', edgecolor='black', palette=colors, errwidth = 1, capsize=0.1) # WRONG
+
+
+    # Formatting
+    plt.legend().set_title(None)
+    #plt.legend(loc = 'upper right').set_title(None)
+    plt.ylabel(None)
+    plt.xlabel(None)
+    plt.xticks(None)
+    plt.grid(which='both', axis='y', linestyle='--')
+    _, labels = plt.xticks()
+    labels = [l.get_text().replace('-','\n') for l in labels]
+    plt.xticks(np.arange(len(labels)), labels)
+    plt.yticks(np.arange(0,9,1))
+    plt.tight_layout()
+    plt.subplots_adjust(left=0.2, right=0.995, top=0.995, bottom=0.05)
+
+    # Set window title
+    fig.canvas.manager.set_window_title(g['ylabel'])
+
+
+    #plt.title(f"Event analysis: {e.replace(':', '-')}")
+    plt.title(f"Event analysis: {g['ylabel']}")
+    return fig
+
+def plot_interf_degradation(frames, base, colors, analysis):
+    """Performance degradation per benchmark, interference configurations"""
+    fig = plt.figure(figsize=(12,3))
+    fig.canvas.manager.set_window_title('mibench-base')
+
+    # print("-- Data frames")
+    # print(frames)
+
+    bp = sns.barplot(data=frames,x='bench', y='val', hue='hyp', edgecolor='black', palette=colors, errwidth = 1, capsize=0.1)
+
+    # Add mean values as text annotations
+    for i, bench in enumerate(frames['bench'].unique()):
+        #mean_val = mean_values[bench]
+        mean_val = base[bench] * 1000 # ms
+        bp.text(
+            x=i,  # X position (bar index)
+            #y=-5,  # Y position (below the bars)
+            y=-65,  # Y position (below the bars)
+            s=f"{mean_val:.2f} ms",  # Text to display (mean value)
+            ha='center',  # Horizontal alignment
+            va='top',  # Vertical alignment
+            fontsize=10,
+            color='black'
+        )
+
+
+    plt.xlabel(None)
+    plt.ylabel(None)
+    # plt.ylabel('% Performance Degradation')
+    plt.xticks(None)
+    _, labels = plt.xticks()
+    labels = [l.get_text().replace('-','\n') for l in labels]
+    plt.xticks(np.arange(len(labels)), labels)
+    # plt.xticks(rotation=90)
+    plt.legend(loc = 'upper right', ncol=2).set_title(None)
+    # plt.legend(bbox_to_anchor =(0.65, 1.25)).set_title(None)
+    # plt.ylim(bottom=1.0)
+    plt.grid(which='both', axis='y', linestyle='--')
+    # plt.yticks(np.arange(0,9,1))
+    plt.tight_layout()
+    # plt.get_current_fig_manager().window.showMaximized()
+
+    plt.title(f"Performance Degradation across benchmarks: {analysis} config")
+    # plt.get_current_fig_manager().window.showMaximized()
+
+    return fig
+
+def plot_event_delta(tmp, colors, g):
+    """Per-instruction event count above the baremetal case"""
+    fig = plt.figure(figsize=(8,3))
+    sns.barplot(data=tmp,x='bench', y='value', hue='hyp', edgecolor='black', palette=colors)
+    # Formatting
+    plt.legend(loc = 'upper right').set_title(None)
+    # plt.legend().remove()
+    plt.ylabel("Guest L2 Cache Misses\nper Instruction")
+    plt.xlabel(None)
+    plt.xticks(None)
+    _, labels = plt.xticks()
+    labels = [l.get_text().replace('-','\n') for l in labels]
+    plt.xticks(np.arange(len(labels)), labels)
+    plt.grid(which='both', axis='y', linestyle='--')
+    plt.xticks([])
+    # plt.legend().remove()
+    plt.tight_layout()
+    plt.subplots_adjust(left=0.0975, right=0.995, top=0.990, bottom=0.05)
+    fig.canvas.manager.set_window_title(g['ylabel'])
+    return fig
+
+parser = argparse.ArgumentParser(description="MiBench performance degradation and event analysis")
+figures.add_arguments(parser, formats=('pdf',), output_dir='plots')
+plots = figures.from_args(parser.parse_args())
 
 # ## base mibench ###############################################################
 directory = "mibench-base"
@@ -139,52 +284,11 @@ frames = [f for h in hypervisors for f in process_benchmark(directory,h, base)]
 frames = pd.DataFrame(frames, columns = ['hyp', 'bench', 'val'])
 frames = frames[[x in benchs for x in frames['bench']]]
 
-fig = plt.figure(figsize=(12,3))
-fig.canvas.manager.set_window_title(directory)
-bp = sns.barplot(data=frames,x='bench', y='val', hue='hyp', edgecolor='black', palette=colors, errwidth = 1, capsize=0.1)
-
 print("-- Data frames")
 print(frames)
 
-# Add mean values as text annotations
-for i, bench in enumerate(frames['bench'].unique()):
-    #mean_val = mean_values[bench]
-    mean_val = base[bench] * 1000 # ms
-    bp.text(
-        x=i,  # X position (bar index)
-        y=-11.5,  # Y position (below the bars)
-        #y=5,  # Y position (below the bars)
-        # s=f"{mean_val:.2f}\nms",  # Text to display (mean value)
-        s=f"{mean_val:.2f} ms",  # Text to display (mean value)
-        ha='center',  # Horizontal alignment
-        va='top',  # Vertical alignment
-        fontsize=9,
-        color='black'
-    )
-
-
-plt.xlabel(None)
-plt.ylabel(None)
-# plt.ylabel('% Performance Degradation')
-_, labels = plt.xticks()
-labels = [l.get_text().replace('-','\n') for l in labels]
-plt.xticks(np.arange(len(labels)), labels)
-plt.legend(loc = 'upper right').set_title(None)
-plt.grid(which='both', axis='y', linestyle='--')
-plt.yticks(np.arange(-3,9,1))
-# plt.tight_layout()
-
 analysis="Base"
-plt.title(f"Performance Degradation (%) across benchmarks: {analysis} config")
-# plt.get_current_fig_manager().window.showMaximized()
-
-# Save figure
-filename = f"plot-performDeg-{analysis}.pdf"
-save_path = os.path.join(output_dir, filename)
-plt.savefig(save_path, dpi=300, bbox_inches='tight')
-print_clr(BLUE, f"Saved: {save_path}")
-# Close figure to free memory
-plt.close(fig)
+plots.add(f"plot-performDeg-{analysis}", plot_base_degradation, frames, base, colors, analysis)
 
 hyp_events = []
 for hyp in hypervisors:
@@ -234,9 +338,6 @@ print(evt_df)
 
 correlations = []
 for idx, (e, b, g) in enumerate(graphs):
-    # Create figure
-    fig = plt.figure(figsize=(12,3))
-    
     # Data processing
     tmp = evt_df[evt_df['event'] == e].drop(columns=['event'])
     data = []
@@ -245,7 +346,7 @@ for idx, (e, b, g) in enumerate(graphs):
         if b is not None:
             value /= int(evt_df[(evt_df['event'] == b) & 
                               (evt_df['bench'] == r['bench']) & 
-                              (evt_df['hyp'] == r['hyp'])]['value'])
+                              (evt_df['hyp'] == r['hyp'])]['value'].iloc[0])
         data.append([r['hyp'], r['bench'], value])
         # print(f"i: {i}, r: {r}, value: {value}")
     
@@ -255,41 +356,7 @@ for idx, (e, b, g) in enumerate(graphs):
     # print(f"frames[val] = {frames['val']}")
     
     # Plotting
-    # sns.barplot(data=tmp, x='bench', y='value', hue='hyp', 
-    #             edgecolor='black', palette=colors)
-    
-    sns.barplot(data=frames,x='bench', y='val', hue='hyp', edgecolor='black', palette=colors, errwidth = 1, capsize=0.1)
-        # sns.barplot(data=tmp,x='bench', y='value', hue='hyp', edgecolor='black', palette=colors, errwidth = 1, capsize=0.1) # WRONG
-
-    
-    # Formatting
-    plt.legend().set_title(None)
-    #plt.legend(loc = 'upper right').set_title(None)
-    plt.ylabel(None)
-    plt.xlabel(None)
-    plt.xticks(None)
-    plt.grid(which='both', axis='y', linestyle='--')
-    _, labels = plt.xticks()
-    labels = [l.get_text().replace('-','\n') for l in labels]
-    plt.xticks(np.arange(len(labels)), labels)
-    plt.yticks(np.arange(0,9,1))
-    plt.tight_layout()
-    plt.subplots_adjust(left=0.2, right=0.995, top=0.995, bottom=0.05)
-    
-    # Set window title
-    fig.canvas.manager.set_window_title(g['ylabel'])
-
-
-    #plt.title(f"Event analysis: {e.replace(':', '-')}")
-    plt.title(f"Event analysis: {g['ylabel']}")
-    # Save figure
-    filename = f"plot_{analysis}_{idx+1}_{e.replace(':', '_')}.pdf"
-    save_path = os.path.join(output_dir, filename)
-    plt.savefig(save_path, dpi=300, bbox_inches='tight')
-    print_clr(BLUE, f"Saved: {save_path}")
-    
-    # Close figure to free memory
-    plt.close(fig)
+    plots.add(f"plot_{analysis}_{idx+1}_{e.replace(':', '_')}", plot_events, frames, colors, g)
     
     for h in ['bao', 'jailhouse', 'xen', 'sel4']:
         x = pd.Series([frames[(frames['hyp'] == h) & (frames['bench'] == b)]['val'].mean() for b in benchs])
@@ -342,57 +409,8 @@ frames = [f for h in hypervisors for f in process_benchmark(directory,h, base)]
 frames = pd.DataFrame(frames, columns = ['hyp', 'bench', 'val'])
 frames = frames[[x in benchs for x in frames['bench']]]
 
-fig = plt.figure(figsize=(12,3))
-fig.canvas.manager.set_window_title(directory)
-
-# print("-- Data frames")
-# print(frames)
-
-bp = sns.barplot(data=frames,x='bench', y='val', hue='hyp', edgecolor='black', palette=colors, errwidth = 1, capsize=0.1)
-
-# Add mean values as text annotations
-for i, bench in enumerate(frames['bench'].unique()):
-    #mean_val = mean_values[bench]
-    mean_val = base[bench] * 1000 # ms
-    bp.text(
-        x=i,  # X position (bar index)
-        #y=-5,  # Y position (below the bars)
-        y=-65,  # Y position (below the bars)
-        s=f"{mean_val:.2f} ms",  # Text to display (mean value)
-        ha='center',  # Horizontal alignment
-        va='top',  # Vertical alignment
-        fontsize=10,
-        color='black'
-    )
-
-
-plt.xlabel(None)
-plt.ylabel(None)
-# plt.ylabel('% Performance Degradation')
-plt.xticks(None)
-_, labels = plt.xticks()
-labels = [l.get_text().replace('-','\n') for l in labels]
-plt.xticks(np.arange(len(labels)), labels)
-# plt.xticks(rotation=90)
-plt.legend(loc = 'upper right', ncol=2).set_title(None)
-# plt.legend(bbox_to_anchor =(0.65, 1.25)).set_title(None)
-# plt.ylim(bottom=1.0)
-plt.grid(which='both', axis='y', linestyle='--')
-# plt.yticks(np.arange(0,9,1))
-plt.tight_layout()
-# plt.get_current_fig_manager().window.showMaximized()
-
 analysis="Interf"
-plt.title(f"Performance Degradation across benchmarks: {analysis} config")
-# plt.get_current_fig_manager().window.showMaximized()
-
-# Save figure
-filename = f"plot-performDeg-{analysis}.pdf"
-save_path = os.path.join(output_dir, filename)
-plt.savefig(save_path, dpi=300, bbox_inches='tight')
-print_clr(BLUE, f"Saved: {save_path}")
-# Close figure to free memory
-plt.close(fig)
+plots.add(f"plot-performDeg-{analysis}", plot_interf_degradation, frames, base, colors, analysis)
 
 
 hyp_events = []
@@ -439,52 +457,21 @@ print("-- Events data frames")
 print(evt_df)
 correlations = []
 for idx, (e, b, g) in enumerate(graphs):
-    fig_count=1
-    fig = plt.figure(figsize=(8,3))
     tmp = evt_df[evt_df['event'] == e]
     tmp = tmp.drop(columns=['event'])
     data = []
     for i, r in tmp.iterrows():
         value = int(r['value'])
-        base_value = int(evt_df[(evt_df['event'] == e) & (evt_df['bench'] == r['bench']) & (evt_df['hyp'] == base_case)]['value'])
+        base_value = int(evt_df[(evt_df['event'] == e) & (evt_df['bench'] == r['bench']) & (evt_df['hyp'] == base_case)]['value'].iloc[0])
         if b is not None:
-            value /= int(evt_df[(evt_df['event'] == b) & (evt_df['bench'] == r['bench']) & (evt_df['hyp'] == r['hyp'])]['value'])
-            base_value /= int(evt_df[(evt_df['event'] == b) & (evt_df['bench'] == r['bench']) & (evt_df['hyp'] == base_case)]['value'])
+            value /= int(evt_df[(evt_df['event'] == b) & (evt_df['bench'] == r['bench']) & (evt_df['hyp'] == r['hyp'])]['value'].iloc[0])
+            base_value /= int(evt_df[(evt_df['event'] == b) & (evt_df['bench'] == r['bench']) & (evt_df['hyp'] == base_case)]['value'].iloc[0])
             # print(f"value {value}; base_value {base_value}")
             value -= base_value
         data.append([r['hyp'],r['bench'], value])
     tmp = pd.DataFrame(columns=['hyp','bench','value'], data=data)  
     tmp.sort_values(by=['bench'])
     colors = [colors[-1]] + colors[:-1]
-    sns.barplot(data=tmp,x='bench', y='value', hue='hyp', edgecolor='black', palette=colors)
-    fig_count+=1
-    # Formatting
-    plt.legend(loc = 'upper right').set_title(None)
-    # plt.legend().remove()
-    plt.ylabel("Guest L2 Cache Misses\nper Instruction")
-    plt.xlabel(None)
-    plt.xticks(None)
-    _, labels = plt.xticks()
-    labels = [l.get_text().replace('-','\n') for l in labels]
-    plt.xticks(np.arange(len(labels)), labels)
-    title = e
-    if b is not None:
-        title += "/" + b
-    plt.grid(which='both', axis='y', linestyle='--')
-    plt.xticks([])
-    # plt.legend().remove()
-    plt.tight_layout()
-    plt.subplots_adjust(left=0.0975, right=0.995, top=0.990, bottom=0.05)
-    fig.canvas.manager.set_window_title(g['ylabel'])
-
-    # plt.title(f"{title}")
-    # Save figure
-    filename = f"plot_{analysis}_{idx+1}_{e.replace(':', '_')}.pdf"
-    save_path = os.path.join(output_dir, filename)
-    plt.savefig(save_path, dpi=300, bbox_inches='tight')
-    print_clr(BLUE, f"Saved: {save_path}")
-    
-    # Close figure to free memory
-    plt.close(fig)
+    plots.add(f"plot_{analysis}_{idx+1}_{e.replace(':', '_')}", plot_event_delta, tmp, colors, g)
 
-plt.show()
+plots.render()
@@ -0,0 +1,196 @@
+#!/usr/bin/python3
+# Generator of the synthetic top/perf captures in this directory
+#
+# The recorded work queue captures predate `top once` and `perf` in the
+# harness queries, so px4perf.py and the runtime attribution of the means
+# scripts have nothing to read in them. This script cuts the first QUERIES
+# queries of the first RUNS runs out of a recorded capture, stamps them with
+# ">> Query I T" markers and appends generated `top once` and `perf` blocks
+# to every query. The numbers are made up around typical RPi4 values
+# (TOP_TASKS, PERF_MODULES); under Bao the module runtimes and the CPU
+# shares of the work queue threads are scaled by BAO_SLOWDOWN. The output is
+# deterministic for a given --seed and says in its first lines that it is
+# not a measurement. Run from px4/:
+#
+#   python fixtures/make_synthetic.py
+
+import argparse
+import os
+
+import numpy as np
+
+RUNS = 3
+QUERIES = 8
+QUERY_INTERVAL = 10  # s
+RUN_INTERVAL = 240  # s between the first queries of consecutive runs
+START_EPOCH = 1718031200
+FIRST_WINDOW = 3  # s of counting before the first query of a run
+
+# (recorded capture, output, Bao) per case
+CASES = (
+    ('px4-bare-wq-run.txt', 'fixtures/synthetic-bare-perf.txt', False),
+    ('px4-bao-wq-run.txt', 'fixtures/synthetic-bao-perf.txt', True),
+)
+
+# Module runtime scale under Bao, drawn per module in this range
+BAO_SLOWDOWN = (1.03, 1.07)
+
+# top once: (pid, name, CPU %, stack used, stack size, priority, state, fds);
+# the Idle Task gets the remaining CPU share
+TOP_TASKS = (
+    (0, 'Idle Task', None, 358, 1024, 0, 'READY', 3),
+    (1, 'init', 0.0, 1268, 2984, 100, 'w:sem', 4),
+    (12, 'wq:rate_ctrl', 6.8, 1008, 2016, 255, 'w:sig', 3),
+    (13, 'wq:SPI0', 2.3, 1375, 2392, 253, 'w:sig', 4),
+    (14, 'wq:I2C1', 2.4, 1518, 2336, 251, 'w:sig', 5),
+    (15, 'wq:INS0', 5.9, 2100, 6000, 250, 'w:sig', 6),
+    (16, 'wq:nav_and_controllers', 5.9, 952, 2240, 242, 'w:sig', 3),
+    (17, 'wq:ttyUnknown', 0.8, 864, 1728, 232, 'w:sig', 4),
+    (18, 'wq:lp_default', 0.3, 1104, 1920, 205, 'w:sig', 5),
+    (21, 'commander', 1.2, 1356, 3192, 140, 'w:sem', 4),
+    (24, 'logger', 3.4, 2365, 3640, 230, 'w:sem', 3),
+    (27, 'mavlink_if0', 1.9, 1448, 2896, 100, 'w:sem', 6),
+)
+# Other processes (shell, ...) that top does not list
+OTHER_CPU_PCT = 1.2
+
+# perf cycle counters: (module, rate [Hz], mean runtime [us])
+PERF_MODULES = (
+    ('control_allocator', 400, 52.2),
+    ('ekf2', 200, 261.0),
+    ('flight_mode_manager', 50, 38.3),
+    ('icm42605', 399, 57.5),
+    ('mc_pos_control', 100, 71.4),
+    ('mc_rate_control', 400, 96.1),
+    ('pca9685_pwm_out', 50, 309.5),
+    ('sensors', 200, 43.8),
+    ('vehicle_angular_velocity', 400, 30.9),
+    ('vehicle_imu', 200, 27.0),
+)
+# Plain event counters printed after the cycle counter of their module
+PERF_EVENTS = {'icm42605': ('bad register', 'FIFO empty')}
+
+
+def echo(command):
+    """The pxh echo of a typed command, one prompt per keystroke as in the captures"""
+    return 'pxh> ' + ''.join(f'{command[:i]}pxh> ' for i in range(1, len(command))) + command
+
+
+def is_tree(line):
+    """Whether a line belongs to a work_queue status tree"""
+    return line.startswith(('Work Queue:', '|', '\\', '    ')) or not line.strip()
+
+
+def split_runs(lines):
+    """Lines of every run of a capture, each starting with its >> Run line"""
+    runs = []
+    for line in lines:
+        if line.startswith('>> Run '):
+            runs.append([])
+        if runs:
+            runs[-1].append(line)
+    return runs
+
+
+def split_queries(run):
+    """(head, [(query lines up to its tree end, lines after it)]) of a run"""
+    starts = [i for i, line in enumerate(run)
+              if line.startswith('pxh>') and 'work_queue status' in line]
+    queries = []
+    for k, start in enumerate(starts):
+        end = start + 1
+        while end < len(run) and is_tree(run[end]):
+            end += 1
+        stop = starts[k + 1] if k + 1 < len(starts) else len(run)
+        queries.append((run[start:end], run[end:stop]))
+    return run[:starts[0]] if starts else run, queries
+
+
+class Counters:
+    """Cumulative top and perf counters of one run"""
+
+    def __init__(self, rng, slowdown):
+        self.rng = rng
+        # Per module; the work queue threads take the mean
+        self.slowdown = slowdown
+        self.thread_slowdown = np.mean(list(slowdown.values()))
+        self.cpu_ms = np.zeros(len(TOP_TASKS))
+        self.events = {name: 0 for name, _, _ in PERF_MODULES}
+        self.elapsed = {name: 0 for name, _, _ in PERF_MODULES}
+        self.plain = {(name, counter): 0 for name, counters in PERF_EVENTS.items()
+                      for counter in counters}
+
+    def top(self, window):
+        """top once output over the last window seconds"""
+        pct = np.array([share or 0.0 for _, _, share, *_ in TOP_TASKS])
+        pct *= self.rng.normal(1, 0.04, len(pct))
+        # Work queue threads run the slowed-down modules
+        pct *= [self.thread_slowdown if name.startswith('wq:') else 1 for _, name, *_ in TOP_TASKS]
+        pct[0] = 100 - OTHER_CPU_PCT - pct[1:].sum()
+        self.cpu_ms += pct / 100 * window * 1000
+        lines = [' PID COMMAND                   CPU(ms) CPU(%)  USED/STACK PRIO(BASE) STATE FD']
+        for (pid, name, _, used, size, prio, state, fds), ms, share in zip(TOP_TASKS, self.cpu_ms, pct):
+            lines.append(f'{pid:4d} {name:<26}{int(ms):>9d} {share:6.3f} {used:5d}/{size:5d} '
+                         f'{prio:3d} ({prio:3d}) {state:<6} {fds}')
+        return lines
+
+    def perf(self, window):
+        """perf output over the last window seconds"""
+        lines = []
+        for name, rate, runtime in PERF_MODULES:
+            events = int(round(rate * window * self.rng.normal(1, 0.002)))
+            mean = runtime * self.slowdown[name] * self.rng.normal(1, 0.005)
+            self.events[name] += events
+            self.elapsed[name] += int(round(events * mean))
+            avg = self.elapsed[name] / self.events[name]
+            low = int(avg * self.rng.uniform(0.53, 0.56))
+            high = int(avg * self.rng.uniform(8, 18))
+            rms = avg * self.rng.uniform(0.25, 0.8)
+            lines.append(f'{name}: cycle: {self.events[name]} events, {self.elapsed[name]}us elapsed, '
+                         f'{avg:.2f}us avg, min {low}us max {high}us {rms:.3f}us rms')
+            for counter in PERF_EVENTS.get(name, ()):
+                if counter == 'FIFO empty':
+                    self.plain[(name, counter)] += int(self.rng.poisson(0.1 * window))
+                lines.append(f'{name}: {counter}: {self.plain[(name, counter)]} events')
+        return lines
+
+
+def synthesize(capture, bao, rng):
+    """The lines of the synthetic capture made from a recorded one"""
+    with open(capture) as f:
+        lines = f.read().splitlines()
+    slowdown = {name: rng.uniform(*BAO_SLOWDOWN) if bao else 1.0 for name, _, _ in PERF_MODULES}
+    out = [
+        f'# SYNTHETIC FIXTURE - not a measurement. The work_queue status blocks are the first {QUERIES}',
+        f'# queries of runs 1-{RUNS} of {os.path.basename(capture)}; the top once and perf blocks were',
+        '# generated by fixtures/make_synthetic.py (Bao module runtimes set a few % longer) to',
+        '# exercise px4perf.py and the runtime attribution.',
+    ]
+    for r, run in enumerate(split_runs(lines)[:RUNS]):
+        head, queries = split_queries(run)
+        out.extend(line.replace(f'Queries = {len(queries)} ', f'Queries = {QUERIES} ')
+                   if line.startswith('=========== Starting PX4') else line for line in head)
+        counters = Counters(rng, slowdown)
+        for q, (tree, after) in enumerate(queries[:QUERIES]):
+            window = FIRST_WINDOW if q == 0 else QUERY_INTERVAL
+            stamp = START_EPOCH + r * RUN_INTERVAL + q * QUERY_INTERVAL + rng.uniform(0, 0.004)
+            out.append(f'>> Query {q + 1} {stamp:.9f}')
+            out.extend(tree)
+            out.append(echo('top once'))
+            out.extend(counters.top(window))
+            out.append(echo('perf'))
+            out.extend(counters.perf(window))
+            # The rest of the run follows the last query kept
+            out.extend(after if q + 1 < QUERIES else queries[-1][1])
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write the synthetic top/perf captures")
+    parser.add_argument('--seed', type=int, default=0, help="random seed (default: 0)")
+    args = parser.parse_args()
+    for capture, output, bao in CASES:
+        rng = np.random.default_rng([args.seed, bao])
+        with open(output, 'w') as f:
+            f.write('\n'.join(synthesize(capture, bao, rng)) + '\n')
+        print(f"Wrote {output}")
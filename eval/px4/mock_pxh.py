@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+# Stand-in for ./bin/px4 that replays recorded shell output
+#
+# Reads commands from stdin like pxh and answers `work_queue status`, `top
+# once` and `perf` with the next block of that kind from a recorded capture
+# (px4_wq_run.sh output), cycling through them; other commands get pxh's
+# "not found" message and `shutdown` exits. The echo and prompts are written
+# the way PX4 does when its stdin is not a terminal (the prompt is redrawn
+# after every character), so common/px4shell.py can be run end to end
+# without PX4 or the RPi:
+#   python px4_shell_run.py --px4 "python mock_pxh.py px4-bare-wq-run.txt" --runs 2 --queries 3 --interval 1
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import px4perf, workqueue
+from common.px4shell import PROMPT
+
+
+def recorded_blocks(path):
+    """Blocks of work_queue status, top and perf output in a capture, by command"""
+    blocks = {'work_queue status': [], 'top once': [], 'perf': []}
+    command = None
+    with open(path, errors='replace') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if workqueue.HEADER in line:
+                command = 'work_queue status'
+                blocks[command].append([line[line.find(workqueue.HEADER):]])
+            elif px4perf.TOP_HEADER in line:
+                command = 'top once'
+                blocks[command].append([line])
+            elif ' events' in line and px4perf.PERF_LINE.match(line):
+                if command != 'perf':
+                    command = 'perf'
+                    blocks[command].append([])
+                blocks[command][-1].append(line[line.rfind(PROMPT) + len(PROMPT):] if PROMPT in line else line)
+            elif command != 'perf' and command and line.strip() and not line.startswith(('pxh', '>')):
+                blocks[command][-1].append(line)
+            else:
+                command = None
+    return blocks
+
+
+def echo(command):
+    """Command echo of pxh on a non-terminal stdin"""
+    return ''.join(PROMPT + command[:i] for i in range(1, len(command) + 1)) + '\n'
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock PX4 shell replaying a recorded capture")
+    parser.add_argument('capture', help="recorded work_queue status capture")
+    parser.add_argument('--latency', type=float, default=0.01,
+                        help="seconds before every response (default: 0.01)")
+    parser.add_argument('--stall', type=int, nargs='*', default=[],
+                        help="numbers of the commands (from 1) left unanswered, to exercise timeouts")
+    args = parser.parse_args()
+
+    blocks = recorded_blocks(args.capture)
+    served = {command: 0 for command in blocks}
+    out = sys.stdout
+    out.write("\npx4 starting.\n\nINFO  [px4] mock pxh replaying " + args.capture + "\n" + PROMPT)
+    out.flush()
+    for n, line in enumerate(sys.stdin, 1):
+        command = line.strip()
+        out.write(echo(command))
+        out.flush()
+        if command == 'shutdown':
+            out.write("Exiting NOW.\n")
+            break
+        if n in args.stall:
+            continue
+        time.sleep(args.latency)
+        if blocks.get(command):
+            block = blocks[command][served[command] % len(blocks[command])]
+            served[command] += 1
+            out.write(''.join(row + '\n' for row in block))
+        else:
+            out.write(f"Command '{command.split()[0] if command else ''}' not found\n")
+        out.write(PROMPT)
+        out.flush()
@@ -0,0 +1,68 @@
+#!/usr/bin/python3
+# Work queue harness on the asyncio PX4 shell driver
+#
+# Same runs as px4_wq_run.sh (REPS runs of QUERIES queries, UPDATE_INTERVAL
+# seconds apart), driven by common/px4shell.py instead of a FIFO and sleep:
+# queries follow the monotonic clock, every response is timed and checked
+# against --timeout, and the session is streamed to a text capture (for
+# px4_wq_means.py / px4_wq_overhead.py) and to JSON-line records with the
+# send and receive times. Run from the PX4 build directory, or against the
+# mock shell:
+#   python px4_shell_run.py -o px4-bao-wq-run.txt
+#   python px4_shell_run.py --px4 "python mock_pxh.py px4-bare-wq-run.txt" --runs 2 --queries 3 --interval 1 -o /tmp/mock.txt
+
+import argparse
+import asyncio
+import os
+import shlex
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import px4shell, workqueue
+
+PX4 = './bin/px4 -s pilotpi_mc.config'
+QUERIES = 18
+REPS = 20
+
+
+async def main(args):
+    argv = shlex.split(args.px4)
+    recorder = px4shell.Recorder(args.output, args.records, 'a' if args.append else 'w')
+    timeouts = 0
+    try:
+        for run in range(args.first_run, args.first_run + args.runs):
+            print(f"Run {run}: {args.queries} queries every {args.interval} s")
+            timeouts += await px4shell.run_session(argv, recorder, run, args.queries, args.interval,
+                                                   args.commands, args.timeout, args.startup)
+            if args.run_delay and run < args.first_run + args.runs - 1:
+                await asyncio.sleep(args.run_delay)
+    finally:
+        recorder.close()
+    print(f"Capture saved to {args.output}, records to {args.records} ({timeouts} timeouts)")
+    return timeouts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the PX4 shell on a fixed schedule and record the output")
+    parser.add_argument('--px4', default=PX4, help=f"PX4 command line (default: {PX4})")
+    parser.add_argument('--runs', type=int, default=REPS, help=f"PX4 starts (default: {REPS})")
+    parser.add_argument('--first-run', type=int, default=1, help="number of the first run (default: 1)")
+    parser.add_argument('--queries', type=int, default=QUERIES, help=f"queries per run (default: {QUERIES})")
+    parser.add_argument('--interval', type=float, default=workqueue.QUERY_INTERVAL,
+                        help=f"seconds between queries (default: {workqueue.QUERY_INTERVAL})")
+    parser.add_argument('--commands', nargs='+', default=list(px4shell.COMMANDS),
+                        help=f"shell commands of every query (default: {', '.join(px4shell.COMMANDS)})")
+    parser.add_argument('--timeout', type=float, default=px4shell.TIMEOUT,
+                        help=f"seconds to wait for a response (default: {px4shell.TIMEOUT})")
+    parser.add_argument('--startup', type=float, default=px4shell.STARTUP,
+                        help=f"seconds PX4 is given to start before the first query (default: {px4shell.STARTUP})")
+    parser.add_argument('--run-delay', type=float, default=0,
+                        help="seconds between runs (default: 0)")
+    parser.add_argument('-o', '--output', default='px4-wq-run.txt',
+                        help="text capture (default: px4-wq-run.txt)")
+    parser.add_argument('--records', help="JSON-line records (default: the capture with .jsonl)")
+    parser.add_argument('--append', action='store_true', help="append to the capture and records")
+    args = parser.parse_args()
+    args.records = args.records or os.path.splitext(args.output)[0] + '.jsonl'
+
+    sys.exit(1 if asyncio.run(main(args)) else 0)
@@ -0,0 +1,180 @@
+#!/usr/bin/python3
+# Benchmark of the work_queue status parsers
+#
+# The capture is scaled up by repeating its runs (renumbered) --scale times,
+# then parsed into the per-benchmark DataFrame px4_wq_means.py works on, by
+# the former regex/nested-dict parser and by the streaming parser in
+# common/workqueue.py. Each parser runs in a fresh interpreter so that peak
+# RSS is measured independently. Run from this directory:
+#   python px4_wq_bench.py --scale 100
+
+import argparse
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import workqueue
+
+CAPTURE = 'px4-bao-wq-run.txt'
+BENCHMARK_ORDER = [
+    'control_allocator',
+    'mc_rate_control',
+    'pca9685_pwm_out',
+    'flight_mode_manager',
+    'mc_pos_control',
+    'sensors'
+]
+
+
+def peak_rss_mb():
+    """Peak resident set size of the current process in MB"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def scale_capture(source, scale, path):
+    """Write the runs of source scale times to path, renumbering them"""
+    with open(source) as f:
+        runs = re.split(r'^>> Run \d+\n', f.read(), flags=re.MULTILINE)[1:]
+    n = 0
+    with open(path, 'w') as out:
+        for _ in range(scale):
+            for run in runs:
+                n += 1
+                out.write(f">> Run {n}\n{run}")
+    return n
+
+
+# Former parser of px4_wq_means.py: three regexes per line, nested dicts
+def legacy_parse_workqueue_file(file_path):
+    run_pattern = re.compile(r'^>> Run (\d+)')
+    wq_pattern = re.compile(r'^\|__ \d+\) (wq:\w+)')
+    child_pattern = re.compile(
+        r'^\|   [|\\]__ \d+\) (\w+)'          # Child name
+        r'\s+\d+\.\d+ Hz'                     # Rate (ignored)
+        r'\s+(\d+) us'                        # Interval
+        r'(?:\s+\((\d+) us\))?'               # Expected interval (optional)
+    )
+
+    results = defaultdict(list)
+    current_run = None
+    current_block = None
+    in_work_queue = False
+
+    with open(file_path, 'r') as f:
+        for line in f:
+            line = line.rstrip()
+            run_match = run_pattern.match(line)
+            if run_match:
+                current_run = int(run_match.group(1))
+                continue
+            if not current_run:
+                continue
+            if line.startswith('Work Queue: 8  threads'):
+                in_work_queue = True
+                current_block = {'work_queues': [], 'run_number': current_run}
+                continue
+            if not in_work_queue:
+                continue
+            wq_match = wq_pattern.match(line)
+            if wq_match:
+                current_block['work_queues'].append({'name': wq_match.group(1), 'children': []})
+                continue
+            if current_block and current_block['work_queues']:
+                child_match = child_pattern.match(line)
+                if child_match:
+                    name = child_match.group(1)
+                    interval = int(child_match.group(2))
+                    expected = int(child_match.group(3)) if child_match.group(3) else interval
+                    current_block['work_queues'][-1]['children'].append({
+                        'name': name, 'interval': interval, 'expected_interval': expected})
+                elif line.startswith('pxh>') or not line:
+                    results[current_run].append(current_block)
+                    current_block = None
+                    in_work_queue = False
+        if current_block:
+            results[current_run].append(current_block)
+    return dict(results)
+
+
+def legacy_process_case_data(parsed_data, case_name):
+    results = []
+    for run_number, blocks in parsed_data.items():
+        for block in blocks:
+            for wq in block['work_queues']:
+                for child in wq['children']:
+                    if child['name'] in BENCHMARK_ORDER:
+                        results.append({'case': case_name, 'benchmark': child['name'],
+                                        'interval': child['interval'],
+                                        'expected': child['expected_interval']})
+    return pd.DataFrame(results)
+
+
+def streaming_process_case_data(parsed_data, case_name):
+    rows = workqueue.to_frame(parsed_data)
+    rows = rows[rows['task'].isin(BENCHMARK_ORDER)]
+    return pd.DataFrame({'case': case_name, 'benchmark': rows['task'].astype(str),
+                         'interval': rows['interval'],
+                         'expected': rows['expected'].where(rows['expected'] > 0, rows['interval'])})
+
+
+PARSERS = {
+    'legacy': (legacy_parse_workqueue_file, legacy_process_case_data),
+    'streaming': (workqueue.parse_workqueue_file, streaming_process_case_data),
+}
+
+
+def parser_child(mode, capture):
+    parse, process = PARSERS[mode]
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    parsed = parse(capture)
+    parse_s = time.perf_counter() - start
+    df = process(parsed, 'Bao')
+    wall = time.perf_counter() - start
+    stats = df.groupby('benchmark')['interval'].agg(['count', 'mean', 'sem'])
+    return {'parse_s': parse_s, 'wall_s': wall, 'rss_mb': peak_rss_mb() - rss_before,
+            'stats': stats.to_dict('index')}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="work_queue status parser benchmark")
+    parser.add_argument('--scale', type=int, default=100,
+                        help=f"times the runs of {CAPTURE} are repeated (default: 100)")
+    parser.add_argument('--tmp-dir', default=tempfile.gettempdir(),
+                        help="where the scaled capture is written (removed afterwards)")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--capture', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(parser_child(args.child, args.capture)))
+        sys.exit()
+
+    fd, capture = tempfile.mkstemp(suffix='.txt', dir=args.tmp_dir)
+    os.close(fd)
+    try:
+        runs = scale_capture(CAPTURE, args.scale, capture)
+        with open(capture) as f:
+            lines = sum(1 for _ in f)
+        print(f"Parsing {CAPTURE} x{args.scale}: {runs} runs, {lines} lines, "
+              f"{os.path.getsize(capture) >> 20} MB")
+        results = {}
+        for mode in PARSERS:
+            out = subprocess.run([sys.executable, __file__, '--child', mode, '--capture', capture],
+                                 check=True, capture_output=True, text=True).stdout
+            results[mode] = r = json.loads(out.splitlines()[-1])
+            print(f"  {mode:<9} parse: {r['parse_s']:7.2f} s  to DataFrame: {r['wall_s']:7.2f} s  "
+                  f"({lines / r['wall_s'] / 1e6:.2f} M lines/s)  peak RSS increase: {r['rss_mb']:7.1f} MB")
+        print(f"  speedup: {results['legacy']['wall_s'] / results['streaming']['wall_s']:.1f}x  "
+              f"identical statistics: {results['legacy']['stats'] == results['streaming']['stats']}")
+    finally:
+        os.remove(capture)
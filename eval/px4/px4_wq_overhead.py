@@ -0,0 +1,263 @@
+#!/usr/bin/python3
+# Scheduling overhead of any number of configurations against a baseline
+#
+# Every capture is a work_queue status log of one configuration (px4_wq_run.sh
+# / px4_wq_uspfs.sh output), given as NAME=PATH or as PATH, named after the
+# file (px4-sspfs-col.log -> sspfs-col). All captures are parsed into one
+# table, the warm-up queries are dropped (see common/workqueue.py) and the
+# (cases x tasks) overhead matrix against the baseline is computed in one
+# pass, so sweeps over e.g. cache colours or CPU counts cost one parse per
+# capture. CIs come from a hierarchical bootstrap (runs, then queries within
+# runs) of all cells at once (see common/bootstrap.py). Examples:
+#   python px4_wq_overhead.py Baremetal=px4-bare-wq-run.txt Bao=px4-bao-wq-run.txt
+#   python px4_wq_overhead.py --baseline uspfs ../uspfs/px4-*.log
+#
+# report() is the analysis the px4_wq_means.py scripts share (warm-up and
+# drift, overhead with and without the warm-up, interval tails, thread load
+# and perf attribution); they only bring their cases and their figures.
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import bootstrap, figures, px4perf, workqueue
+
+# Tasks compared by default and by the px4_wq_means.py scripts; --tasks all for every task
+BENCHMARK_ORDER = [
+    'control_allocator',
+    'mc_rate_control',
+    'pca9685_pwm_out',
+    'flight_mode_manager',
+    'mc_pos_control',
+    'sensors'
+]
+
+
+def case_name(capture):
+    """Case name of a NAME=PATH or PATH argument, and its path"""
+    name, sep, path = capture.partition('=')
+    if sep:
+        return name, path
+    name = os.path.splitext(os.path.basename(capture))[0]
+    for prefix in ('px4-', 'px4_'):
+        if name.startswith(prefix) and len(name) > len(prefix):
+            name = name[len(prefix):]
+    return name, capture
+
+
+def load_captures(captures, workers=1):
+    """to_frame() rows of every (name, path) capture, with a case column"""
+    paths = [path for _, path in captures]
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+            parsed = list(pool.map(workqueue.parse_workqueue_file, paths))
+    else:
+        parsed = [workqueue.parse_workqueue_file(path) for path in paths]
+    frames = []
+    for (name, path), data in zip(captures, parsed):
+        frame = workqueue.to_frame(data)
+        print(f"  {name:<16} {path}: {frame['run'].nunique()} runs, {len(frame)} samples")
+        frames.append(frame.assign(case=name))
+    samples = pd.concat(frames, ignore_index=True)
+    samples['case'] = pd.Categorical(samples['case'], categories=[name for name, _ in captures])
+    return samples
+
+
+def compute_overhead(samples, baseline, tasks=BENCHMARK_ORDER, resamples=bootstrap.RESAMPLES,
+                     seed=bootstrap.SEED, level=workqueue.CI_LEVEL):
+    """case_statistics() of samples and their overhead_matrix() against baseline.
+
+    Standard errors and CIs come from a hierarchical bootstrap over runs and
+    queries, or from error propagation with resamples=0.
+    """
+    stats = workqueue.case_statistics(samples, tasks)
+    means = None
+    if resamples:
+        means = workqueue.bootstrap_means(samples, stats, resamples, seed)
+        stats['sem'] = np.nanstd(means, axis=1, ddof=1)
+    return stats, workqueue.overhead_matrix(stats, baseline, level, means)
+
+
+def add_arguments(parser):
+    """Warm-up and bootstrap options shared with the px4_wq_means.py scripts"""
+    parser.add_argument('--keep-warmup', action='store_true',
+                        help="keep the warm-up queries detected at the start of each run")
+    parser.add_argument('--resamples', type=int, default=bootstrap.RESAMPLES,
+                        help="hierarchical bootstrap resamples of the CIs; 0 for error propagation "
+                             f"over pooled samples (default: {bootstrap.RESAMPLES})")
+    parser.add_argument('--seed', type=int, default=bootstrap.SEED,
+                        help=f"bootstrap seed (default: {bootstrap.SEED})")
+    parser.add_argument('--level', type=float, default=workqueue.CI_LEVEL,
+                        help=f"confidence level of the overhead intervals (default: {workqueue.CI_LEVEL})")
+
+
+def case_option(name):
+    """Command-line option of the capture of a case: SSPFS+col -> --sspfs-col"""
+    return '--' + name.lower().replace('+', '-')
+
+
+def add_report_arguments(parser, cases):
+    """Options of report(): a capture option per (name, default path) case and add_arguments()"""
+    for name, path in cases:
+        parser.add_argument(case_option(name), metavar='PATH', default=path,
+                            help=f"{name} capture (default: {path})")
+    parser.add_argument('--query-interval', type=float, default=workqueue.QUERY_INTERVAL,
+                        help="seconds between queries of captures without query timestamps "
+                             f"(default: {workqueue.QUERY_INTERVAL})")
+    add_arguments(parser)
+
+
+def report(cases, args, plots, tasks=BENCHMARK_ORDER):
+    """Analysis of the px4_wq_means.py scripts; the first case is the baseline.
+
+    cases are (name, default path) pairs, the captures are taken from the
+    add_report_arguments() options in args. Prints and saves, in
+    args.figure_dir, the warm-up and drift (wq_stability.csv), the overhead
+    with and without the warm-up, the interval tails (wq_task_stats.csv),
+    the thread load (wq_thread_load.csv) and, for captures with perf output,
+    the runtime attribution (wq_runtime_attribution.csv), adding their
+    figures to plots. Returns compute_overhead() of the analysed samples,
+    for the scripts' figures.
+    """
+    os.makedirs(args.figure_dir, exist_ok=True)
+    captures = [(name, getattr(args, case_option(name)[2:].replace('-', '_'))) for name, _ in cases]
+    names = [name for name, _ in captures]
+    baseline = names[0]
+    print(f"Parsing {len(captures)} captures:")
+    all_samples = load_captures(captures)
+
+    # Warm-up at the start of each run and drift over the rest of it
+    warmup = workqueue.detect_warmup(all_samples)
+    steady = workqueue.drop_warmup(all_samples, warmup)
+    drift = workqueue.task_drift(steady, args.query_interval)
+    stability = warmup.merge(drift, on=['case', 'wq', 'task'], how='left')
+    output = os.path.join(args.figure_dir, 'wq_stability.csv')
+    stability.to_csv(output, index=False)
+    print(f"Per-task warm-up and drift saved to {output}")
+    print(f"\nWarm-up: {len(all_samples) - len(steady)} of {len(all_samples)} samples in the detected warm-up queries")
+    with pd.option_context('display.width', 160, 'display.max_rows', None):
+        print(stability[(stability['warmup'] > 0) | stability['drifting'].eq(True)]
+              [['case', 'wq', 'task', 'warmup', 'shift', 'slope', 'drift', 'drifting']]
+              .to_string(index=False, float_format=lambda v: f'{v:.4g}'))
+    plots.add('wq_query_profiles', workqueue.plot_query_profiles, all_samples, warmup, names)
+    samples = all_samples if args.keep_warmup else steady
+
+    stats, matrix = compute_overhead(samples, baseline, tasks, args.resamples, args.seed, args.level)
+
+    # Effect of the warm-up on the overhead: only the other sample set is bootstrapped
+    other = steady if args.keep_warmup else all_samples
+    other = compute_overhead(other, baseline, tasks, args.resamples, args.seed, args.level)[1]
+    overhead_all, overhead_steady = (matrix, other) if args.keep_warmup else (other, matrix)
+    overhead_all = overhead_all.set_index(['case', 'task'])
+    overhead_steady = overhead_steady.set_index(['case', 'task'])
+    print(f"\nOverhead vs {baseline} (%) with all queries and without the warm-up:")
+    print(pd.DataFrame({'all': overhead_all['overhead'], 'all_se': overhead_all['se'],
+                        'steady': overhead_steady['overhead'], 'steady_se': overhead_steady['se'],
+                        'change': overhead_steady['overhead'] - overhead_all['overhead']})
+          .to_string(float_format=lambda v: f'{v:.2f}'))
+
+    # Tail latency and jitter of every task in every thread
+    task_stats = workqueue.task_statistics(samples)
+    output = os.path.join(args.figure_dir, 'wq_task_stats.csv')
+    task_stats.to_csv(output, index=False)
+    print(f"\nPer-task interval statistics saved to {output}")
+    print("\nTask interval tails (us; overrun: share of samples above the expected interval):")
+    with pd.option_context('display.width', 160, 'display.max_rows', None):
+        print(task_stats[['case', 'wq', 'task', 'p50', 'p99', 'max', 'cv', 'overrun_ratio']]
+              .to_string(index=False, float_format=lambda v: f'{v:.6g}'))
+    plots.add('wq_task_ecdf', workqueue.plot_task_ecdfs, samples, names)
+
+    # Per-thread scheduled load and co-stretching (thread starvation)
+    load = workqueue.thread_load(samples, baseline=baseline)
+    thread_stats = workqueue.thread_summary(load)
+    output = os.path.join(args.figure_dir, 'wq_thread_load.csv')
+    thread_stats.to_csv(output, index=False)
+    print(f"\nPer-thread load saved to {output}")
+    print(f"Thread load against {baseline} nominal intervals (co-stretch: share of queries with "
+          "all children stretched):")
+    with pd.option_context('display.width', 160, 'display.max_rows', None):
+        print(thread_stats[['case', 'wq', 'children', 'rate', 'nominal_rate', 'delivery',
+                            'delivery_min', 'co_stretch_ratio', 'starved']]
+              .to_string(index=False, float_format=lambda v: f'{v:.4f}'))
+    plots.add('wq_thread_load', workqueue.plot_thread_load, thread_stats, names)
+
+    # Module runtime (perf) against scheduling delay (interval jitter), with top's CPU share
+    top, perf = px4perf.load_cases(captures)
+    if len(perf) and baseline not in perf['case'].unique():
+        print(f"\nNo perf output in the {baseline} capture, the baseline of the runtime change: "
+              "runtime attribution skipped")
+    elif len(perf):
+        windows = px4perf.perf_windows(perf)
+        attribution = px4perf.runtime_attribution(samples, windows, baseline, top)
+        output = os.path.join(args.figure_dir, 'wq_runtime_attribution.csv')
+        attribution.to_csv(output, index=False)
+        print(f"\nRuntime attribution saved to {output}")
+        print(f"Change against {baseline} (us; runtime: perf mean runtime, delay: p99 - p50 interval):")
+        with pd.option_context('display.width', 160, 'display.max_rows', None):
+            print(attribution[[column for column in ('case', 'task', 'runtime', 'jitter', 'cpu_pct',
+                                                     'runtime_change', 'delay_change', 'source')
+                               if column in attribution]]
+                  .to_string(index=False, float_format=lambda v: f'{v:.4g}'))
+    else:
+        print("\nNo perf output in the captures (recorded by the harness since `top once`/`perf` were "
+              "added to its queries): runtime attribution skipped")
+    return stats, matrix
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Work queue interval overhead of N configurations vs a baseline")
+    parser.add_argument('captures', nargs='+', metavar='[NAME=]PATH',
+                        help="work_queue status captures, one per configuration")
+    parser.add_argument('--baseline',
+                        help="case the others are compared against (default: the first)")
+    parser.add_argument('--tasks', nargs='+', default=BENCHMARK_ORDER,
+                        help="tasks to compare, or 'all' (default: the px4_wq_means.py benchmarks)")
+    add_arguments(parser)
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help="processes used to parse captures (0 = all cores; default: 1)")
+    parser.add_argument('-o', '--output',
+                        help="overhead table (default: wq_overhead_matrix.csv in --figure-dir)")
+    figures.add_arguments(parser)
+    args = parser.parse_args()
+    plots = figures.from_args(args)
+
+    captures = [case_name(capture) for capture in args.captures]
+    names = [name for name, _ in captures]
+    if len(set(names)) != len(names):
+        parser.error(f"duplicate case names: {', '.join(names)} (use NAME=PATH)")
+    baseline = args.baseline or names[0]
+    if baseline not in names:
+        parser.error(f"baseline {baseline} is not one of: {', '.join(names)}")
+    tasks = None if args.tasks == ['all'] else args.tasks
+    workers = args.workers if args.workers > 0 else os.cpu_count()
+
+    print(f"Parsing {len(captures)} captures:")
+    samples = load_captures(captures, workers)
+    if not args.keep_warmup:
+        warmup = workqueue.detect_warmup(samples)
+        steady = workqueue.drop_warmup(samples, warmup)
+        print(f"Dropped {len(samples) - len(steady)} of {len(samples)} samples in warm-up queries")
+        samples = steady
+
+    _, matrix = compute_overhead(samples, baseline, tasks, args.resamples, args.seed, args.level)
+    output = args.output or os.path.join(args.figure_dir, 'wq_overhead_matrix.csv')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    matrix.to_csv(output, index=False)
+    print(f"\nOverhead matrix saved to {output}")
+
+    print(f"\nInterval overhead vs {baseline} (%, ± half {args.level:.0%} CI; *: CI excludes 0):")
+    cells = matrix.assign(cell=[f"{o:+.2f} ± {(h - l) / 2:.2f}{'*' if s else ' '}" for o, l, h, s in
+                                matrix[['overhead', 'ci_low', 'ci_high', 'significant']].itertuples(index=False)])
+    table = cells.pivot(index='task', columns='case', values='cell')
+    table = table.reindex(index=list(dict.fromkeys(matrix['task'])),
+                          columns=[name for name in names if name != baseline])
+    with pd.option_context('display.width', 200, 'display.max_rows', None, 'display.max_columns', None):
+        print(table.to_string())
+
+    plots.add('wq_overhead_matrix', workqueue.plot_overhead_matrix, matrix, baseline)
+    plots.render()
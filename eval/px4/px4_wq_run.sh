@@ -1,6 +1,8 @@
 #!/bin/sh
 QUERIES="${1:-${QUERIES:-18}}"  # Default to 30 if unset
 CMD="work_queue status"
+TOP_CMD="${TOP_CMD-top once}"  # Per-task CPU share and stack use; empty to skip
+PERF_CMD="${PERF_CMD-perf}"  # Per-module runtime counters; empty to skip
 FIFO_PATH="/tmp/px4_fifo" # FIFO Path
 UPDATE_INTERVAL=10 # 10 secs
 WARM_UP=5
@@ -26,7 +28,10 @@ wq_run(){
 	# For i in QUERIES, run $CMD
 	i=0
 	while [ "$i" -lt "$QUERIES" ]; do
+		echo ">> Query $((i + 1)) $(date +%s.%N)"  # Query timestamp for the analysis
 		echo "$CMD" >&3  # Write to the FIFO via file descriptor 3
+		[ -n "$TOP_CMD" ] && echo "$TOP_CMD" >&3
+		[ -n "$PERF_CMD" ] && echo "$PERF_CMD" >&3
 		sleep "$UPDATE_INTERVAL"
 		i=$((i + 1))
 	done
@@ -1,120 +1,132 @@
+import argparse
+import os
+import sys
+
 import matplotlib.pyplot as plt
 import numpy as np
+import pandas as pd
 from scipy import stats
 
-def parse_file(filename):
-    """Parse log file and return list of all FPS values per run"""
-    runs = []
-    current_run = []
-    
-    with open(filename, 'r') as f:
-        for line in f:
-            if line.startswith(">> TEST ->"):
-                if current_run:
-                    runs.append(current_run)
-                    current_run = []
-                continue
-                
-            if 'current: ' in line:
-                fps = float(line.split('current: ')[1].split(',')[0])
-                current_run.append(fps)
-    
-    if current_run:
-        runs.append(current_run)
-    
-    return runs
-
-# Load raw FPS data for all configurations
-uspfs_runs = parse_file("cam-uspfs.log")    # Baseline
-sspfs_runs = parse_file("cam-sspfs.log")
-sspfs_col_runs = parse_file("cam-sspfs-col.log")
-
-# Verify equal number of runs
-print(f"Runs: USPFS = {len(uspfs_runs)} | SSPFS = {len(sspfs_runs)} | SSPFS+COL = {len(sspfs_col_runs)}")
-n_runs = len(uspfs_runs)
-assert len(sspfs_runs) == n_runs, "Mismatched number of runs between USPFS and SSPFS"
-assert len(sspfs_col_runs) == n_runs, "Mismatched number of runs between USPFS and SSPFS+col"
-
-# Collect results for plotting
-run_numbers = []
-degradations_sspfs = []
-degradations_col = []
-cis_sspfs = []
-cis_col = []
-
-for i in range(n_runs):
-    uspfs_data = uspfs_runs[i]
-    sspfs_data = sspfs_runs[i]
-    sspfs_col_data = sspfs_col_runs[i]
-    
-    # Calculate baseline mean
-    uspfs_mean = np.mean(uspfs_data)
-    
-    # SSPFS vs USPFS
-    sspfs_mean = np.mean(sspfs_data)
-    degradation_sspfs = ((uspfs_mean - sspfs_mean) / uspfs_mean) * 100
-    ci_sspfs = 1.96 * np.sqrt(
-        (np.std(uspfs_data, ddof=1)**2/len(uspfs_data)) + 
-        (np.std(sspfs_data, ddof=1)**2/len(sspfs_data))
-    ) * 100 / uspfs_mean
-    
-    # SSPFS+col vs USPFS
-    sspfs_col_mean = np.mean(sspfs_col_data)
-    degradation_col = ((uspfs_mean - sspfs_col_mean) / uspfs_mean) * 100
-    ci_col = 1.96 * np.sqrt(
-        (np.std(uspfs_data, ddof=1)**2/len(uspfs_data)) + 
-        (np.std(sspfs_col_data, ddof=1)**2/len(sspfs_col_data))
-    ) * 100 / uspfs_mean
-    
-    run_numbers.append(i+1)
-    degradations_sspfs.append(degradation_sspfs)
-    degradations_col.append(degradation_col)
-    cis_sspfs.append(ci_sspfs)
-    cis_col.append(ci_col)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import bootstrap, figures, gstfps
 
 # Plot parameters
 BAR_WIDTH = 0.35
-x = np.arange(n_runs)
+
+def plot_degradation(run_numbers, degradations_sspfs, cis_sspfs, degradations_col, cis_col,
+                     overall_sspfs, overall_col):
+    """Grouped bars of the per-run FPS degradation of both SSPFS configurations, and the overall ones"""
+    x = np.arange(len(run_numbers))
+
+    # Create the plot
+    fig = plt.figure(figsize=(14, 7))
+    ax = plt.gca()
+
+    # Plot bars for both configurations
+    ax.bar(x - BAR_WIDTH/2, degradations_sspfs, BAR_WIDTH,
+           yerr=cis_sspfs, capsize=5, color='tab:blue',
+           label='SSPFS', edgecolor='black')
+
+    ax.bar(x + BAR_WIDTH/2, degradations_col, BAR_WIDTH,
+           yerr=cis_col, capsize=5, color='tab:orange',
+           label='SSPFS+col', edgecolor='black')
+
+    # Overall degradation and its CI
+    for overall, color, label in ((overall_sspfs, 'tab:blue', 'SSPFS'), (overall_col, 'tab:orange', 'SSPFS+col')):
+        ax.axhline(overall[0], color=color, linestyle='--', linewidth=1,
+                   label=f'{label}, all runs: {overall[0]:.2f}%')
+        ax.axhspan(overall[1], overall[2], color=color, alpha=0.2)
+
+    # Formatting
+    ax.set_title('FPS Performance Degradation: SSPFS Configurations vs USPFS Baseline', fontsize=14)
+    ax.set_xlabel('Run Number', fontsize=12)
+    ax.set_ylabel('Performance Degradation (%)', fontsize=12)
+    ax.set_xticks(x)
+    ax.set_xticklabels(run_numbers)
+    ax.set_yticks(np.arange(-44,2,2))
+    # ax.grid(axis='y', linestyle='--', alpha=0.7)
+    ax.axhline(0, color='black', linewidth=0.8)
+    ax.legend()
+
+    # Add value labels
+    for i, (deg_sspfs, ci_sspfs, deg_col, ci_col) in enumerate(zip(degradations_sspfs, cis_sspfs.mean(axis=0),
+                                                                  degradations_col, cis_col.mean(axis=0))):
+        y = -42.2
+        # SSPFS labels
+        ax.text(x[i] - BAR_WIDTH/2,
+                y, 
+               f'{deg_sspfs:.1f} ± {ci_sspfs:.1f}',
+               ha='center', va='bottom', fontsize=9, rotation=90)
+
+        # SSPFS+col labels
+        ax.text(x[i] + BAR_WIDTH/2,
+               y, 
+               f'{deg_col:.1f} ± {ci_col:.1f}',
+               ha='center', va='bottom', fontsize=9, rotation=90)
+
+    plt.tight_layout()
+    return fig
+
+parser = argparse.ArgumentParser(description="FPS performance degradation: SSPFS configurations vs USPFS")
+parser.add_argument('--resamples', type=int, default=bootstrap.RESAMPLES,
+                    help=f"bootstrap resamples of the CIs (default: {bootstrap.RESAMPLES})")
+parser.add_argument('--seed', type=int, default=bootstrap.SEED,
+                    help=f"bootstrap seed (default: {bootstrap.SEED})")
+parser.add_argument('--block', type=int, default=bootstrap.FPS_BLOCK,
+                    help=f"consecutive FPS readings resampled together (default: {bootstrap.FPS_BLOCK})")
+parser.add_argument('--startup-frames', type=int, default=gstfps.STARTUP_FRAMES,
+                    help="readings up to this many rendered frames are pipeline start-up "
+                         f"and left out (default: {gstfps.STARTUP_FRAMES})")
+parser.add_argument('-o', '--output',
+                    help="per-run delivery table (default: fps_run_metrics.csv in --figure-dir)")
+figures.add_arguments(parser)
+args = parser.parse_args()
+plots = figures.from_args(args)
+
+# Load raw FPS data for all configurations: steady-state TEST runs
+samples = {'USPFS': gstfps.parse_fps_log("cam-uspfs.log", args.startup_frames),    # Baseline
+           'SSPFS': gstfps.parse_fps_log("cam-sspfs.log", args.startup_frames),
+           'SSPFS+col': gstfps.parse_fps_log("cam-sspfs-col.log", args.startup_frames)}
+readings = {case: gstfps.phase_runs(case_samples) for case, case_samples in samples.items()}
+
+# Pair the runs by run number
+print(f"Runs: USPFS = {len(readings['USPFS'])} | SSPFS = {len(readings['SSPFS'])} | "
+      f"SSPFS+COL = {len(readings['SSPFS+col'])}")
+run_numbers = gstfps.paired_runs(*readings.values())
+n_runs = len(run_numbers)
+readings = {case: {run: runs[run] for run in run_numbers} for case, runs in readings.items()}
+uspfs_runs, sspfs_runs, sspfs_col_runs = ([runs[run]['current'] for run in run_numbers]
+                                          for runs in readings.values())
+
+# Degradation per run (block bootstrap within the run) and over all runs
+# (hierarchical bootstrap: runs, then blocks within runs)
+degradations_sspfs, cis_sspfs, overall_sspfs = bootstrap.degradation(uspfs_runs, sspfs_runs, args.resamples, args.seed, args.block)
+degradations_col, cis_col, overall_col = bootstrap.degradation(uspfs_runs, sspfs_col_runs, args.resamples, args.seed, args.block)
+for label, overall in (('SSPFS', overall_sspfs), ('SSPFS+col', overall_col)):
+    print(f"{label} FPS degradation over {n_runs} runs: {overall[0]:.2f}% "
+          f"(95% CI {overall[1]:.2f}% to {overall[2]:.2f}%)")
 
 # Create the plot
-plt.figure(figsize=(14, 7))
-ax = plt.gca()
-
-# Plot bars for both configurations
-bars_sspfs = ax.bar(x - BAR_WIDTH/2, degradations_sspfs, BAR_WIDTH,
-                   yerr=cis_sspfs, capsize=5, color='tab:blue',
-                   label='SSPFS', edgecolor='black')
-
-bars_col = ax.bar(x + BAR_WIDTH/2, degradations_col, BAR_WIDTH,
-                 yerr=cis_col, capsize=5, color='tab:orange',
-                 label='SSPFS+col', edgecolor='black')
-
-# Formatting
-ax.set_title('FPS Performance Degradation: SSPFS Configurations vs USPFS Baseline', fontsize=14)
-ax.set_xlabel('Run Number', fontsize=12)
-ax.set_ylabel('Performance Degradation (%)', fontsize=12)
-ax.set_xticks(x)
-ax.set_xticklabels(run_numbers)
-ax.set_yticks(np.arange(-44,2,2))
-# ax.grid(axis='y', linestyle='--', alpha=0.7)
-ax.axhline(0, color='black', linewidth=0.8)
-ax.legend()
-
-# Add value labels
-for i, (deg_sspfs, ci_sspfs, deg_col, ci_col) in enumerate(zip(degradations_sspfs, cis_sspfs,
-                                                              degradations_col, cis_col)):
-    y = -42.2
-    # SSPFS labels
-    ax.text(x[i] - BAR_WIDTH/2,
-            y, 
-           f'{deg_sspfs:.1f} ± {ci_sspfs:.1f}',
-           ha='center', va='bottom', fontsize=9, rotation=90)
-    
-    # SSPFS+col labels
-    ax.text(x[i] + BAR_WIDTH/2,
-           y, 
-           f'{deg_col:.1f} ± {ci_col:.1f}',
-           ha='center', va='bottom', fontsize=9, rotation=90)
-
-plt.tight_layout()
-plt.show()
+plots.add('fps_degradation', plot_degradation, run_numbers,
+          degradations_sspfs, cis_sspfs, degradations_col, cis_col, overall_sspfs, overall_col)
+
+# Frames delivered and dropped, and frame-interval jitter, from all fpsdisplaysink fields
+metrics = pd.concat([gstfps.run_metrics(runs, case) for case, runs in readings.items()], ignore_index=True)
+output = args.output or os.path.join(args.figure_dir, 'fps_run_metrics.csv')
+os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+metrics.to_csv(output, index=False)
+summary = gstfps.case_summary(metrics, 'USPFS')
+print(f"\nPer-run delivery saved to {output}")
+print("Frame delivery (delivered: rendered frames / time; drop ratio over all frames; jitter: SD of the frame interval):")
+with pd.option_context('display.width', 160):
+    print(summary.to_string(index=False, float_format=lambda v: f'{v:.4g}'))
+plots.add('fps_delivery', gstfps.plot_run_metrics, metrics, ['USPFS', 'SSPFS', 'SSPFS+col'])
+
+# Warm-up runs, kept out of the comparison
+warmup = pd.concat([gstfps.run_metrics(gstfps.phase_runs(case_samples, gstfps.WARMUP_PHASE), case)
+                    for case, case_samples in samples.items()], ignore_index=True)
+if len(warmup):
+    print("\nWarm-up runs (not compared):")
+    print(gstfps.case_summary(warmup)[['case', 'runs', 'delivered_fps', 'current_fps', 'drop_ratio', 'jitter_ms']]
+          .to_string(index=False, float_format=lambda v: f'{v:.4g}'))
+plots.render()
@@ -2,6 +2,8 @@
 #QUERIES="${1:-${QUERIES:-18}}"  # Default to 18 if unset
 QUERIES=18  # Default to 18 if unset
 CMD="work_queue status"
+TOP_CMD="${TOP_CMD-top once}"  # Per-task CPU share and stack use; empty to skip
+PERF_CMD="${PERF_CMD-perf}"  # Per-module runtime counters; empty to skip
 FIFO_PATH="/tmp/px4_fifo" # FIFO Path
 UPDATE_INTERVAL=10 # 10 secs
 WARM_UP=5 # 5 
@@ -32,7 +34,10 @@ wq_run(){
     # Send queries
     i=0
     while [ "$i" -lt "$QUERIES" ]; do
+        echo ">> Query $((i + 1)) $(date +%s.%N)" >> "$log_file"  # Query timestamp for the analysis
         echo "$CMD" >&3
+        [ -n "$TOP_CMD" ] && echo "$TOP_CMD" >&3
+        [ -n "$PERF_CMD" ] && echo "$PERF_CMD" >&3
         sleep "$UPDATE_INTERVAL"
         i=$((i + 1))
     done